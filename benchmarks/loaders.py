@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+Time and peak memory of the COVERAGE_LOADER choices on a large report written
+to disk:
+
+    python -m benchmarks.loaders --size-mb 600
+
+Each loader runs in a process of its own, which loads the report then decodes
+--decode of its files, as the comment of a PR touching them would. The page
+cache is warmed by a first read of the report, so that no loader pays for the
+disk alone. The peak RSS of mmap includes the pages of the mapping, which are
+those of the page cache rather than memory of its own.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import pathlib
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.synthetic import synthetic_report
+from codecov import coverage as coverage_module
+
+LOADERS = ('json', 'stream', 'mmap')
+# Number of distinct files generated, the report repeats them under other paths
+BATCH_SIZE = 1000
+
+
+def write_report(path: pathlib.Path, size: int, num_lines: int, branches: bool) -> int:
+    """
+    Write a report of at least size bytes, one file entry at a time so that it
+    never has to be held in memory. Returns its number of files. The totals are
+    those of the first batch only, which doesn't matter to the loaders.
+    """
+    batch = synthetic_report(num_files=BATCH_SIZE, num_lines=num_lines, branches=branches)
+    entries = [json.dumps(file_data) for file_data in batch['files'].values()]
+    written = index = 0
+    with path.open('w') as report:
+        report.write(f'{{"meta": {json.dumps(batch["meta"])}, "files": {{')
+        while written < size:
+            separator = ', ' if index else ''
+            entry = f'{separator}"src/package_{index // 100}/module_{index}.py": {entries[index % BATCH_SIZE]}'
+            written += report.write(entry)
+            index += 1
+        report.write(f'}}, "totals": {json.dumps(batch["totals"])}}}')
+    return index
+
+
+def run_loader(path: pathlib.Path, loader: str, decode: int) -> dict[str, float]:
+    start = time.perf_counter()
+    coverage = coverage_module.get_coverage_info(coverage_path=path, loader=loader)
+    loaded = time.perf_counter()
+    paths = list(coverage.files)
+    file_coverages = [coverage.files[file_path] for file_path in paths[:: max(len(paths) // decode, 1)][:decode]]
+    decoded = time.perf_counter()
+    return {
+        'load': loaded - start,
+        'decode': decoded - loaded,
+        'decoded_files': len(file_coverages),
+        # Kilobytes on Linux
+        'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size-mb', type=int, default=600, help='Size of the report')
+    parser.add_argument('--lines', type=int, default=500, help='Number of lines per file')
+    parser.add_argument('--branches', action='store_true')
+    parser.add_argument('--decode', type=int, default=25, help='Number of files decoded after the load')
+    parser.add_argument('--only', nargs='+', choices=LOADERS, default=list(LOADERS))
+    parser.add_argument('--run', nargs=2, metavar=('LOADER', 'PATH'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        loader, path = args.run
+        print(json.dumps(run_loader(path=pathlib.Path(path), loader=loader, decode=args.decode)))
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = pathlib.Path(directory) / 'coverage.json'
+        num_files = write_report(path=path, size=args.size_mb * 2**20, num_lines=args.lines, branches=args.branches)
+        with path.open('rb') as report:
+            while report.read(2**24):
+                pass
+        print(f'Synthetic report: {num_files} files x {args.lines} lines ({path.stat().st_size / 2**20:.0f} MiB)')
+        print(f'{"loader":<10} {"load":>10} {"decode":>10} {"peak RSS":>12}')
+        command = [sys.executable, '-m', 'benchmarks.loaders', '--decode', str(args.decode), '--run']
+        for loader in args.only:
+            arguments = [*command, loader, str(path)]
+            result = subprocess.run(arguments, capture_output=True, text=True, check=False)  # noqa: S603
+            if result.returncode:
+                print(f'{loader:<10} failed: {result.stderr.strip().splitlines()[-1:]}')
+                continue
+            timings = json.loads(result.stdout)
+            print(
+                f'{loader:<10} {timings["load"]:9.2f}s {timings["decode"]:9.3f}s {timings["max_rss_mb"]:9.0f} MiB',
+                flush=True,
+            )
+
+
+if __name__ == '__main__':
+    main()
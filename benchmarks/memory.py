@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""
+Memory used by the parsed Coverage model on a synthetic report.
+
+Compares the compact Lines storage of FileCoverage with the plain
+list[int] storage it replaced:
+
+    python -m benchmarks.memory --files 30000 --lines 500
+"""
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import tracemalloc
+from collections.abc import Callable
+
+from benchmarks.synthetic import synthetic_report
+from codecov import coverage as coverage_module
+
+
+def decode_all(coverage: coverage_module.Coverage) -> coverage_module.Coverage:
+    """Decode every file of the lazily loaded report, dropping the raw JSON data."""
+    for _ in coverage.files.values():
+        pass
+    return coverage
+
+
+def as_lists(coverage: coverage_module.Coverage) -> coverage_module.Coverage:
+    """Put the line numbers back in plain lists, as stored before Lines existed."""
+    for file_coverage in coverage.files.values():
+        file_coverage.executed_lines = list(file_coverage.executed_lines)  # type: ignore[assignment]
+        file_coverage.missing_lines = list(file_coverage.missing_lines)  # type: ignore[assignment]
+        file_coverage.excluded_lines = list(file_coverage.excluded_lines)  # type: ignore[assignment]
+    return coverage
+
+
+def retained_memory(build: Callable[[], object]) -> int:
+    """Bytes still allocated once `build` returned, with its result kept alive."""
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return current
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--files', type=int, default=10000)
+    parser.add_argument('--lines', type=int, default=500)
+    args = parser.parse_args()
+
+    report = json.dumps(synthetic_report(num_files=args.files, num_lines=args.lines))
+    before = retained_memory(lambda: as_lists(coverage_module.extract_info(json.loads(report))))
+    after = retained_memory(lambda: decode_all(coverage_module.extract_info(json.loads(report))))
+
+    print(f'Synthetic report: {args.files} files x {args.lines} lines ({len(report) / 2**20:.1f} MiB of JSON)')
+    print(f'list[int] storage: {before / 2**20:10.1f} MiB')
+    print(f'Lines storage:     {after / 2**20:10.1f} MiB ({after / before:.0%})')
+
+
+if __name__ == '__main__':
+    main()
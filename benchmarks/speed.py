@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+"""
+Time the main steps of the action on synthetic reports and diffs, and keep the
+results per commit to spot regressions:
+
+    python -m benchmarks.speed --sizes 1000 10000 50000
+    python -m benchmarks.speed --compare 1a2b3c4
+
+Each benchmark runs --repeat times on a fresh input and the fastest run is
+kept. The results are stored in --results, keyed by the current commit; with
+--compare, the run fails when a benchmark got slower than --threshold times
+its duration at the given commit.
+"""
+from __future__ import annotations
+
+import argparse
+import copy
+import dataclasses
+import decimal
+import functools
+import json
+import pathlib
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import weakref
+from collections.abc import Callable
+
+from benchmarks.synthetic import synthetic_diff, synthetic_report
+from codecov import coverage as coverage_module, coverage_cache, diff_grouper, groups, template
+
+# Kept between runs to compare commits, ignored by git
+RESULTS_PATH = pathlib.Path(__file__).parent / 'results.json'
+
+
+@dataclasses.dataclass
+class Case:
+    """Inputs of the benchmarks for one report size."""
+
+    report: dict
+    diff: str
+
+    def coverage(self) -> coverage_module.Coverage:
+        return coverage_module.extract_info(copy.deepcopy(self.report))
+
+    def diff_coverage(self, coverage: coverage_module.Coverage) -> coverage_module.DiffCoverage:
+        return coverage_module.get_diff_coverage_info(
+            added_lines=coverage_module.parse_diff_output(self.diff), coverage=coverage
+        )
+
+
+def bench_extract_info(case: Case) -> Callable[[], object]:
+    report = copy.deepcopy(case.report)
+    # The files are decoded lazily, decode them all to time the whole report
+    return lambda: list(coverage_module.extract_info(report).files.values())
+
+
+def bench_cache_read(case: Case) -> Callable[[], object]:
+    cache = coverage_cache.CoverageCache(path=pathlib.Path(tempfile.mkdtemp()))
+    # Removed once the benchmark is done with the cache
+    weakref.finalize(cache, shutil.rmtree, cache.path, ignore_errors=True)
+    cache.write('key', case.coverage())
+    # The files are decoded lazily, decode them all to compare with extract_info
+    return lambda: list(cache.read('key').files.values())
+
+
+def bench_parse_diff_output(case: Case) -> Callable[[], object]:
+    return lambda: coverage_module.parse_diff_output(case.diff)
+
+
+def bench_get_diff_coverage_info(case: Case) -> Callable[[], object]:
+    coverage = case.coverage()
+    added_lines = coverage_module.parse_diff_output(case.diff)
+    return lambda: coverage_module.get_diff_coverage_info(added_lines=added_lines, coverage=coverage)
+
+
+def bench_compute_contiguous_groups(case: Case) -> Callable[[], object]:
+    coverage = case.coverage()
+
+    def run():
+        for file_coverage in coverage.files.values():
+            separators = groups.LineUnion(file_coverage.executed_lines, file_coverage.excluded_lines)
+            groups.compute_contiguous_groups(
+                values=file_coverage.missing_lines,
+                separators=separators,
+                joiners=groups.LineComplement(start=1, stop=file_coverage.info.num_statements, excluded=separators),
+                max_gap=diff_grouper.MAX_ANNOTATION_GAP,
+            )
+
+    return run
+
+
+def bench_group_branches(case: Case) -> Callable[[], object] | None:
+    if not case.report['meta']['branch_coverage']:
+        return None
+    coverage = case.coverage()
+    # The files are grouped as they are decoded, decode them all
+    return lambda: list(diff_grouper.group_branches(coverage=coverage).files.values())
+
+
+def bench_get_comment_markdown(case: Case) -> Callable[[], object]:
+    coverage = case.coverage()
+    diff_coverage = case.diff_coverage(coverage)
+    files, count_files, _ = template.select_changed_files(coverage=coverage, diff_coverage=diff_coverage, max_files=25)
+    base_template = template.read_template_file('comment.md.j2')
+
+    def run():
+        # The grouping is cached on the coverage object, start afresh every time
+        coverage.groups_cache.clear()
+        template.get_comment_markdown(
+            coverage=coverage,
+            diff_coverage=diff_coverage,
+            files=files,
+            count_files=count_files,
+            coverage_files=[],
+            count_coverage_files=0,
+            max_files=25,
+            minimum_green=decimal.Decimal('100'),
+            minimum_orange=decimal.Decimal('70'),
+            repo_name='org/repo',
+            pr_number=1,
+            base_ref='main',
+            base_template=base_template,
+            marker='<!-- marker -->',
+            branch_coverage=bool(coverage.meta.branch_coverage),
+        )
+
+    return run
+
+
+BENCHMARKS: dict[str, Callable[[Case], Callable[[], object] | None]] = {
+    'extract_info': bench_extract_info,
+    'cache_read': bench_cache_read,
+    'parse_diff_output': bench_parse_diff_output,
+    'get_diff_coverage_info': bench_get_diff_coverage_info,
+    'compute_contiguous_groups': bench_compute_contiguous_groups,
+    'group_branches': bench_group_branches,
+    'get_comment_markdown': bench_get_comment_markdown,
+}
+
+
+def time_benchmark(setup: Callable[[], Callable[[], object] | None], repeat: int) -> float | None:
+    durations = []
+    for _ in range(repeat):
+        run = setup()
+        if run is None:
+            return None
+        start = time.perf_counter()
+        run()
+        durations.append(time.perf_counter() - start)
+    return min(durations)
+
+
+def run_benchmarks(sizes: list[int], num_lines: int, repeat: int, names: list[str]) -> dict[str, float]:
+    results = {}
+    for size in sizes:
+        for branches in (False, True):
+            report = synthetic_report(num_files=size, num_lines=num_lines, branches=branches)
+            case = Case(report=report, diff=synthetic_diff(report))
+            for name in names:
+                duration = time_benchmark(functools.partial(BENCHMARKS[name], case), repeat=repeat)
+                if duration is None:
+                    continue
+                key = f'{name}[{size} files{", branches" if branches else ""}]'
+                results[key] = duration
+                print(f'{key:<60} {duration:10.4f}s', flush=True)
+    return results
+
+
+def get_commit() -> str:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],  # noqa: S603, S607
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def compare(results: dict[str, float], reference: dict[str, float], threshold: float) -> list[str]:
+    """Benchmarks slower than threshold times their reference duration."""
+    regressions = []
+    for key, duration in results.items():
+        if key not in reference:
+            continue
+        ratio = duration / reference[key]
+        print(f'{key:<60} {ratio:8.2f}x')
+        if ratio > threshold:
+            regressions.append(key)
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 50000], help='Numbers of files')
+    parser.add_argument('--lines', type=int, default=200, help='Lines per file')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--only', nargs='+', choices=list(BENCHMARKS), default=list(BENCHMARKS))
+    parser.add_argument('--results', type=pathlib.Path, default=RESULTS_PATH)
+    parser.add_argument('--compare', metavar='COMMIT', help='Commit to compare the results with')
+    parser.add_argument('--threshold', type=float, default=1.2)
+    args = parser.parse_args()
+
+    results = run_benchmarks(sizes=args.sizes, num_lines=args.lines, repeat=args.repeat, names=args.only)
+
+    history = json.loads(args.results.read_text()) if args.results.exists() else {}
+    reference = history.get(args.compare) if args.compare else None
+    commit = get_commit()
+    history[commit] = history.get(commit, {}) | results
+    args.results.write_text(json.dumps(history, indent=2, sort_keys=True))
+    print(f'Results of {commit} saved to {args.results}')
+
+    if args.compare:
+        if reference is None:
+            sys.exit(f'No results for {args.compare} in {args.results}')
+        if regressions := compare(results, reference, threshold=args.threshold):
+            sys.exit(f'{len(regressions)} benchmark(s) slower than {args.threshold}x {args.compare}')
+
+
+if __name__ == '__main__':
+    main()
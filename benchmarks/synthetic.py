@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""
+Synthetic coverage.json reports and matching PR diffs, for the benchmarks.
+"""
+from __future__ import annotations
+
+import random
+
+
+def summarize(executed: list[int], missing: list[int], excluded: list[int], branches: dict | None) -> dict:
+    num_statements = len(executed) + len(missing)
+    percent_covered = 100 * len(executed) / num_statements if num_statements else 100.0
+    summary = {
+        'covered_lines': len(executed),
+        'num_statements': num_statements,
+        'percent_covered': percent_covered,
+        'percent_covered_display': str(round(percent_covered)),
+        'missing_lines': len(missing),
+        'excluded_lines': len(excluded),
+    }
+    if branches is not None:
+        summary |= branches
+    return summary
+
+
+def synthetic_report(num_files: int, num_lines: int, seed: int = 0, branches: bool = False) -> dict:
+    """
+    A report of num_files files of num_lines lines each, 70% of them executed,
+    20% missing and 2% excluded, the rest being blank lines or comments.
+    With branches, one line out of ten is a branch, taken or not.
+    """
+    rng = random.Random(seed)  # noqa: S311
+    totals: dict[str, int] = {}
+    files = {}
+    for index in range(num_files):
+        executed, missing, excluded = [], [], []
+        executed_branches, missing_branches = [], []
+        for line in range(1, num_lines + 1):
+            bucket = rng.random()
+            if bucket < 0.7:
+                executed.append(line)
+            elif bucket < 0.9:
+                missing.append(line)
+            elif bucket < 0.92:
+                excluded.append(line)
+            if branches and bucket < 0.9 and line % 10 == 0 and line < num_lines:
+                (executed_branches if rng.random() < 0.8 else missing_branches).append([line, line + 1])
+
+        file_branches = None
+        if branches:
+            file_branches = {
+                'num_branches': len(executed_branches) + len(missing_branches),
+                'num_partial_branches': 0,
+                'covered_branches': len(executed_branches),
+                'missing_branches': len(missing_branches),
+            }
+        file_data = {
+            'executed_lines': executed,
+            'missing_lines': missing,
+            'excluded_lines': excluded,
+            'summary': summarize(executed, missing, excluded, file_branches),
+        }
+        if branches:
+            file_data['executed_branches'] = executed_branches
+            file_data['missing_branches'] = missing_branches
+        files[f'src/package_{index // 100}/module_{index}.py'] = file_data
+
+        for key, value in file_data['summary'].items():
+            if isinstance(value, int):
+                totals[key] = totals.get(key, 0) + value
+
+    percent_covered = 100 * totals.get('covered_lines', 0) / (totals.get('num_statements') or 1)
+    return {
+        'meta': {
+            'version': '7.4.0',
+            'timestamp': '2024-01-01T00:00:00',
+            'branch_coverage': branches,
+            'show_contexts': False,
+        },
+        'files': files,
+        'totals': totals | {'percent_covered': percent_covered, 'percent_covered_display': str(round(percent_covered))},
+    }
+
+
+def synthetic_diff(report: dict, changed_files: float = 0.1, seed: int = 0) -> str:
+    """
+    A unified diff of the files of the report, as returned by the GitHub API:
+    a share of the files gets a few hunks of added, removed and context lines.
+    """
+    rng = random.Random(seed)  # noqa: S311
+    chunks = []
+    for path, file_data in report['files'].items():
+        if rng.random() >= changed_files:
+            continue
+        num_lines = max(file_data['executed_lines'][-1:] + file_data['missing_lines'][-1:] + [1])
+        chunks.append(f'diff --git a/{path} b/{path}\nindex 1234567..89abcde 100644\n--- a/{path}\n+++ b/{path}\n')
+        line = 1
+        while line < num_lines:
+            line += rng.randint(1, 50)
+            added = rng.randint(1, 20)
+            if line + added > num_lines:
+                break
+            chunks.append(f'@@ -{line},4 +{line},{3 + added} @@ def function():\n')
+            chunks.append(' context\n' * 2)
+            chunks.append('-removed\n')
+            chunks.append('+added\n' * added)
+            chunks.append(' context\n')
+            line += added + 3
+    return ''.join(chunks)
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+"""
+Directories of cache entries bounded in size, shared by the HTTP cache and the
+coverage cache: reading an entry refreshes its mtime, and the least recently
+used entries are evicted once the directory grows over its maximum size.
+"""
+from __future__ import annotations
+
+import contextlib
+import os
+import pathlib
+
+
+def touch(path: pathlib.Path) -> None:
+    """Mark the entry as recently used. It may have been evicted meanwhile, by another process."""
+    with contextlib.suppress(OSError):
+        os.utime(path)
+
+
+def evict(path: pathlib.Path, suffix: str, max_size: int) -> None:
+    """Remove the least recently used entries (files ending with suffix) until they fit in max_size bytes."""
+    entries = []
+    for entry in os.scandir(path):
+        if not entry.name.endswith(suffix):
+            continue
+        with contextlib.suppress(FileNotFoundError):
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+    entries.sort()
+
+    size = sum(entry_size for _, entry_size, _ in entries)
+    for _, entry_size, entry_path in entries:
+        if size <= max_size:
+            break
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(entry_path)
+        size -= entry_size
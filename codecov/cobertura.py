@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""
+Read Cobertura XML reports (as written by coverage xml, JaCoCo converters,
+gcovr, ...) with iterparse: every <class> element is dropped once read, so
+the document is never held in memory as a whole.
+
+    <coverage version="..." timestamp="1700000000000">
+        <sources><source>/home/user/project</source></sources>
+        <packages><package name="pkg"><classes>
+            <class filename="pkg/mod.py">
+                <lines>
+                    <line number="1" hits="1"/>
+                    <line number="2" hits="1" branch="true" condition-coverage="50% (1/2)"/>
+                </lines>
+            </class>
+        </classes></package></packages>
+    </coverage>
+"""
+from __future__ import annotations
+
+import datetime
+import pathlib
+import re
+import xml.etree.ElementTree as ET
+from typing import BinaryIO
+
+from codecov import coverage as coverage_module, log
+
+CONDITION_COVERAGE = re.compile(r'\((\d+)/(\d+)\)')
+
+
+class InvalidCoberturaReport(Exception):
+    pass
+
+
+def get_path(filename: str, sources: list[str], root: pathlib.Path) -> pathlib.Path:
+    # File names are relative to one of the sources, which are absolute
+    for source in sources:
+        path = coverage_module.get_relative_path(str(pathlib.Path(source) / filename), root=root)
+        if not path.is_absolute():
+            return path
+    return coverage_module.get_relative_path(filename, root=root)
+
+
+def add_class_hits(element: ET.Element, line_hits: dict[int, int], branch_hits: dict[int, tuple[int, int]]) -> bool:
+    """Add the hits of the <class> to those of its file, and tell whether it has branch coverage."""
+    has_branches = False
+    # The lines of the <methods> are repeated in the <lines> of the class
+    for line in element.iterfind('lines/line'):
+        number = int(line.get('number', 0))
+        line_hits[number] = max(line_hits.get(number, 0), int(line.get('hits', 0)))
+        if line.get('branch') != 'true':
+            continue
+        if match := CONDITION_COVERAGE.search(line.get('condition-coverage', '')):
+            has_branches = True
+            covered, total = int(match.group(1)), int(match.group(2))
+            branch_hits[number] = max(branch_hits.get(number, (0, 0)), (covered, total))
+    return has_branches
+
+
+def read_cobertura(
+    xml_data: BinaryIO, root: pathlib.Path
+) -> tuple[dict[pathlib.Path, coverage_module.FileCoverage], bool, dict[str, str]]:
+    """The files of the report, whether it has branch coverage, and the attributes of <coverage>."""
+    # Several classes can share a file (e.g. nested classes in Java)
+    line_hits_by_path: dict[pathlib.Path, dict[int, int]] = {}
+    branch_hits_by_path: dict[pathlib.Path, dict[int, tuple[int, int]]] = {}
+    has_branches = False
+    root_element: ET.Element | None = None
+    parents: list[ET.Element] = []
+    sources: list[str] = []
+    # The report comes from the workflow itself, not from an untrusted source
+    for event, element in ET.iterparse(xml_data, events=('start', 'end')):  # noqa: S314
+        if event == 'start':
+            if root_element is None:
+                if element.tag != 'coverage':
+                    raise InvalidCoberturaReport(f'Unexpected root element <{element.tag}>')
+                root_element = element
+            parents.append(element)
+            continue
+
+        parents.pop()
+        if element.tag == 'source' and element.text:
+            sources.append(element.text.strip())
+        if element.tag != 'class':
+            continue
+
+        path = get_path(element.get('filename', ''), sources=sources, root=root)
+        class_has_branches = add_class_hits(
+            element=element,
+            line_hits=line_hits_by_path.setdefault(path, {}),
+            branch_hits=branch_hits_by_path.setdefault(path, {}),
+        )
+        has_branches = has_branches or class_has_branches
+        # Done with the class, drop it so that the tree never grows
+        parents[-1].remove(element)
+
+    files = {
+        path: coverage_module.get_file_coverage_from_hits(
+            path=path, line_hits=line_hits, branch_hits=branch_hits_by_path[path] if has_branches else None
+        )
+        for path, line_hits in line_hits_by_path.items()
+    }
+    return files, has_branches, dict(root_element.attrib) if root_element is not None else {}
+
+
+def get_timestamp(attributes: dict[str, str], coverage_path: pathlib.Path) -> datetime.datetime:
+    # Milliseconds since the epoch
+    if timestamp := attributes.get('timestamp', ''):
+        try:
+            return datetime.datetime.fromtimestamp(int(timestamp) / 1000)
+        except ValueError:
+            pass
+    return datetime.datetime.fromtimestamp(coverage_path.stat().st_mtime)
+
+
+def get_coverage_info(coverage_path: pathlib.Path, root: pathlib.Path | None = None) -> coverage_module.Coverage:
+    root = (root or pathlib.Path.cwd()).resolve()
+    try:
+        with coverage_path.open('rb') as xml_data:
+            files, has_branches, attributes = read_cobertura(xml_data=xml_data, root=root)
+    except (ET.ParseError, ValueError, InvalidCoberturaReport):
+        log.error('Invalid Cobertura coverage report file: %s', coverage_path)
+        raise
+
+    return coverage_module.Coverage(
+        meta=coverage_module.CoverageMetadata(
+            version=attributes.get('version', ''),
+            timestamp=get_timestamp(attributes=attributes, coverage_path=coverage_path),
+            branch_coverage=has_branches,
+            show_contexts=False,
+        ),
+        files=files,
+        info=coverage_module.get_total_summary(files=files.values(), branch_coverage=has_branches),
+    )
@@ -1,15 +1,27 @@
 # -*- coding: utf-8 -*-
 from __future__ import annotations
 
+import array
+import bisect
 import dataclasses
 import datetime
 import decimal
+import functools
+import heapq
 import json
+import mmap
+import os
 import pathlib
-from collections import deque
-from collections.abc import Sequence
+import re
+from collections.abc import Callable, Iterable, Iterator, MutableMapping, Sequence
+from typing import Any, TextIO
 
-from codecov import log
+from codecov import groups, log
+
+# Number of characters read at once from the report when streaming it
+STREAM_CHUNK_SIZE = 1024 * 1024
+# The braces and the strings of a JSON document, the strings being skipped as a whole
+JSON_BRACE_OR_STRING = re.compile(rb'(\{)|(\})|"(?:[^"\\]|\\.)*"', re.DOTALL)
 
 
 @dataclasses.dataclass
@@ -20,7 +32,53 @@ class CoverageMetadata:
     show_contexts: bool
 
 
-@dataclasses.dataclass
+class Lines(array.array):
+    """
+    Compact storage for a sorted list of line numbers.
+
+    Line numbers are stored as unsigned machine ints (4 bytes each) rather than
+    as a list of boxed Python ints, which matters on reports with tens of
+    thousands of files. The object still behaves like a list: it can be
+    iterated, indexed, sliced, appended to, and compares equal to a list holding
+    the same values.
+    """
+
+    TYPECODE = 'I'
+
+    def __new__(cls, lines: Iterable[int] | bytes = ()):
+        # Older typeshed stubs only declare array.__init__
+        return super().__new__(cls, cls.TYPECODE, lines)  # type: ignore[call-arg]
+
+    def __getitem__(self, index):
+        # Slices of an array are plain arrays, which don't compare equal to lists
+        if isinstance(index, slice):
+            return type(self)(super().__getitem__(index).tobytes())
+        return super().__getitem__(index)
+
+    def __eq__(self, other):
+        if isinstance(other, list):
+            return len(self) == len(other) and self.tolist() == other
+        return super().__eq__(other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def __repr__(self) -> str:
+        return f'{type(self).__name__}({self.tolist()!r})'
+
+    def __reduce__(self):
+        return type(self), (self.tobytes(),)
+
+    def __copy__(self) -> Lines:
+        return type(self)(self.tobytes())
+
+    def __deepcopy__(self, memo) -> Lines:
+        return self.__copy__()
+
+
+@dataclasses.dataclass(slots=True)
 class CoverageInfo:  # pylint: disable=too-many-instance-attributes
     covered_lines: int
     num_statements: int
@@ -34,22 +92,91 @@ class CoverageInfo:  # pylint: disable=too-many-instance-attributes
     missing_branches: int | None
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class FileCoverage:
     path: pathlib.Path
-    executed_lines: list[int]
-    missing_lines: list[int]
-    excluded_lines: list[int]
+    executed_lines: Lines
+    missing_lines: Lines
+    excluded_lines: Lines
     executed_branches: list[list[int]] | None
     missing_branches: list[list[int]] | None
     info: CoverageInfo
 
+    def __post_init__(self) -> None:
+        for field in ('executed_lines', 'missing_lines', 'excluded_lines'):
+            lines = getattr(self, field)
+            if not isinstance(lines, Lines):
+                setattr(self, field, Lines(lines))
+
+
+class LazyFiles(MutableMapping[pathlib.Path, FileCoverage]):
+    """
+    Files of a coverage report, turned into FileCoverage objects on first access.
+
+    The index holds the raw data of every file, keyed by path, so iterating,
+    counting or looking up paths never decodes anything: a PR touching a dozen
+    files of a huge report only pays for those. Transforms registered with apply
+    run on each file once it is decoded.
+    """
+
+    def __init__(self, index: dict[pathlib.Path, Any], decode: Callable[[pathlib.Path, Any], FileCoverage]):
+        self.index = index
+        self.decode = decode
+        self.decoded: dict[pathlib.Path, FileCoverage] = {}
+        self.transforms: list[Callable[[FileCoverage], object]] = []
+
+    def __getitem__(self, path: pathlib.Path) -> FileCoverage:
+        try:
+            return self.decoded[path]
+        except KeyError:
+            pass
+        data = self.index[path]
+        try:
+            file_coverage = self.decode(path, data)
+        except KeyError as exc:
+            # Not to be mistaken for a path missing from the report
+            raise ValueError(f'Invalid coverage of {path}: missing {exc}') from exc
+        for transform in self.transforms:
+            transform(file_coverage)
+        self.decoded[path] = file_coverage
+        # The raw data is not needed anymore
+        self.index[path] = None
+        return file_coverage
+
+    def __setitem__(self, path: pathlib.Path, file_coverage: FileCoverage) -> None:
+        self.index[path] = None
+        self.decoded[path] = file_coverage
+
+    def __delitem__(self, path: pathlib.Path) -> None:
+        del self.index[path]
+        self.decoded.pop(path, None)
+
+    def __iter__(self) -> Iterator[pathlib.Path]:
+        return iter(self.index)
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __contains__(self, path: object) -> bool:
+        return path in self.index
+
+    def __repr__(self) -> str:
+        return f'{type(self).__name__}({len(self.index)} files, {len(self.decoded)} decoded)'
+
+    def apply(self, transform: Callable[[FileCoverage], object]) -> None:
+        """Run transform on the files decoded so far, and on the others when they are."""
+        for file_coverage in self.decoded.values():
+            transform(file_coverage)
+        self.transforms.append(transform)
+
 
 @dataclasses.dataclass
 class Coverage:
     meta: CoverageMetadata
     info: CoverageInfo
-    files: dict[pathlib.Path, FileCoverage]
+    files: MutableMapping[pathlib.Path, FileCoverage]
+    # Results of diff_grouper, so that the same file is never grouped twice in a run
+    groups_cache: dict = dataclasses.field(default_factory=dict, repr=False, compare=False)
 
 
 @dataclasses.dataclass
@@ -84,9 +211,116 @@ def compute_coverage(num_covered: int, num_total: int) -> decimal.Decimal:
     return decimal.Decimal(num_covered) / decimal.Decimal(num_total)
 
 
-def get_coverage_info(coverage_path: pathlib.Path) -> Coverage:
+def get_display_percent(percent: float) -> str:
+    # Like coverage.py, never round up to 100% nor down to 0%
+    if 0 < percent < 1:
+        percent = 1
+    elif 99 < percent < 100:
+        percent = 99
+    return str(round(percent))
+
+
+def get_summary(
+    num_statements: int,
+    num_missing: int,
+    num_excluded: int,
+    branches: tuple[int, int, int] | None,
+) -> CoverageInfo:
+    """Summary of the counts, branches being (number, partial, missing) with branch coverage."""
+    num_branches, num_partial_branches, num_missing_branches = branches or (0, 0, 0)
+    covered_lines = num_statements - num_missing
+    covered_branches = num_branches - num_missing_branches
+    total = num_statements + num_branches
+    percent_covered = 100 * (covered_lines + covered_branches) / total if total else 100.0
+    return CoverageInfo(
+        covered_lines=covered_lines,
+        num_statements=num_statements,
+        percent_covered=percent_covered,  # type: ignore[arg-type]
+        percent_covered_display=get_display_percent(percent_covered),
+        missing_lines=num_missing,
+        excluded_lines=num_excluded,
+        num_branches=num_branches if branches else None,
+        num_partial_branches=num_partial_branches if branches else None,
+        covered_branches=covered_branches if branches else None,
+        missing_branches=num_missing_branches if branches else None,
+    )
+
+
+def get_total_summary(files: Iterable[FileCoverage], branch_coverage: bool) -> CoverageInfo:
+    """Summary of the whole report, from the summaries of its files."""
+    infos = [file.info for file in files]
+    return get_summary(
+        num_statements=sum(info.num_statements for info in infos),
+        num_missing=sum(info.missing_lines for info in infos),
+        num_excluded=sum(info.excluded_lines for info in infos),
+        branches=(
+            (
+                sum(info.num_branches or 0 for info in infos),
+                sum(info.num_partial_branches or 0 for info in infos),
+                sum(info.missing_branches or 0 for info in infos),
+            )
+            if branch_coverage
+            else None
+        ),
+    )
+
+
+def get_file_coverage_from_hits(
+    path: pathlib.Path,
+    line_hits: dict[int, int],
+    branch_hits: dict[int, tuple[int, int]] | None,
+) -> FileCoverage:
+    """
+    FileCoverage of a report that only gives the hits of each line, and with
+    branch coverage the number of (covered, total) branches of the lines that
+    have some. Such reports don't tell where a branch goes: each branch is
+    stored as going from its line to the same line.
+    """
+    executed = sorted(line for line, hits in line_hits.items() if hits)
+    missing = sorted(line for line, hits in line_hits.items() if not hits)
+
+    executed_branches: list[list[int]] | None = None
+    missing_branches: list[list[int]] | None = None
+    branches = None
+    if branch_hits is not None:
+        executed_branches, missing_branches = [], []
+        for line, (covered, total) in sorted(branch_hits.items()):
+            executed_branches.extend([line, line] for _ in range(covered))
+            missing_branches.extend([line, line] for _ in range(total - covered))
+        branches = (
+            sum(total for _, total in branch_hits.values()),
+            sum(1 for covered, total in branch_hits.values() if 0 < covered < total),
+            len(missing_branches),
+        )
+
+    return FileCoverage(
+        path=path,
+        executed_lines=Lines(executed),
+        missing_lines=Lines(missing),
+        excluded_lines=Lines(),
+        executed_branches=executed_branches,
+        missing_branches=missing_branches,
+        info=get_summary(num_statements=len(line_hits), num_missing=len(missing), num_excluded=0, branches=branches),
+    )
+
+
+def get_relative_path(path: str, root: pathlib.Path) -> pathlib.Path:
+    # Files are measured with absolute paths, reports show them relative to the project
+    if not os.path.isabs(path):
+        return pathlib.Path(path)
+    relative = os.path.relpath(path, root)
+    if relative.startswith(os.pardir):
+        return pathlib.Path(path)
+    return pathlib.Path(relative)
+
+
+def get_coverage_info(coverage_path: pathlib.Path, loader: str = 'json') -> Coverage:
     try:
+        if loader == 'mmap':
+            return map_info(coverage_path=coverage_path)
         with coverage_path.open() as coverage_data:
+            if loader == 'stream':
+                return stream_info(coverage_data=coverage_data)
             json_coverage = json.loads(coverage_data.read())
     except FileNotFoundError:
         log.error('Coverage report file not found: %s', coverage_path)
@@ -141,52 +375,283 @@ def extract_info(data: dict) -> Coverage:
             "missing_branches": 1,
         },
     }
+
+    The files are decoded lazily, when they are accessed (see LazyFiles).
     """
     return Coverage(
-        meta=CoverageMetadata(
-            version=data['meta']['version'],
-            timestamp=datetime.datetime.fromisoformat(data['meta']['timestamp']),
-            branch_coverage=data['meta']['branch_coverage'],
-            show_contexts=data['meta']['show_contexts'],
+        meta=extract_metadata(data=data['meta']),
+        files=LazyFiles(
+            index={pathlib.Path(path): file_data for path, file_data in data['files'].items()},
+            decode=lambda path, file_data: extract_file_info(path=str(path), data=file_data),
         ),
-        files={
-            pathlib.Path(path): FileCoverage(
-                path=pathlib.Path(path),
-                excluded_lines=file_data['excluded_lines'],
-                missing_lines=file_data['missing_lines'],
-                executed_lines=file_data['executed_lines'],
-                executed_branches=file_data.get('executed_branches'),
-                missing_branches=file_data.get('missing_branches'),
-                info=CoverageInfo(
-                    covered_lines=file_data['summary']['covered_lines'],
-                    num_statements=file_data['summary']['num_statements'],
-                    percent_covered=file_data['summary']['percent_covered'],
-                    percent_covered_display=file_data['summary']['percent_covered_display'],
-                    missing_lines=file_data['summary']['missing_lines'],
-                    excluded_lines=file_data['summary']['excluded_lines'],
-                    num_branches=file_data['summary'].get('num_branches'),
-                    num_partial_branches=file_data['summary'].get('num_partial_branches'),
-                    covered_branches=file_data['summary'].get('covered_branches'),
-                    missing_branches=file_data['summary'].get('missing_branches'),
-                ),
-            )
-            for path, file_data in data['files'].items()
-        },
-        info=CoverageInfo(
-            covered_lines=data['totals']['covered_lines'],
-            num_statements=data['totals']['num_statements'],
-            percent_covered=data['totals']['percent_covered'],
-            percent_covered_display=data['totals']['percent_covered_display'],
-            missing_lines=data['totals']['missing_lines'],
-            excluded_lines=data['totals']['excluded_lines'],
-            num_branches=data['totals'].get('num_branches'),
-            num_partial_branches=data['totals'].get('num_partial_branches'),
-            covered_branches=data['totals'].get('covered_branches'),
-            missing_branches=data['totals'].get('missing_branches'),
+        info=extract_coverage_info(data=data['totals']),
+    )
+
+
+def extract_metadata(data: dict) -> CoverageMetadata:
+    return CoverageMetadata(
+        version=data['version'],
+        timestamp=datetime.datetime.fromisoformat(data['timestamp']),
+        branch_coverage=data['branch_coverage'],
+        show_contexts=data['show_contexts'],
+    )
+
+
+def extract_file_info(path: str, data: dict) -> FileCoverage:
+    return FileCoverage(
+        path=pathlib.Path(path),
+        excluded_lines=data['excluded_lines'],
+        missing_lines=data['missing_lines'],
+        executed_lines=data['executed_lines'],
+        executed_branches=data.get('executed_branches'),
+        missing_branches=data.get('missing_branches'),
+        info=extract_coverage_info(data=data['summary']),
+    )
+
+
+def extract_coverage_info(data: dict) -> CoverageInfo:
+    return CoverageInfo(
+        covered_lines=data['covered_lines'],
+        num_statements=data['num_statements'],
+        percent_covered=data['percent_covered'],
+        percent_covered_display=data['percent_covered_display'],
+        missing_lines=data['missing_lines'],
+        excluded_lines=data['excluded_lines'],
+        num_branches=data.get('num_branches'),
+        num_partial_branches=data.get('num_partial_branches'),
+        covered_branches=data.get('covered_branches'),
+        missing_branches=data.get('missing_branches'),
+    )
+
+
+def stream_info(coverage_data: TextIO, chunk_size: int = STREAM_CHUNK_SIZE) -> Coverage:
+    """
+    Same as extract_info, but reads the report incrementally: the "files"
+    object is walked one entry at a time and every entry is turned into a
+    FileCoverage as soon as it is decoded, so the raw JSON of the whole report
+    never has to be held in memory.
+    """
+    reader = JsonStreamReader(stream=coverage_data, chunk_size=chunk_size)
+    data: dict = {}
+    files: dict[pathlib.Path, FileCoverage] = {}
+    for key in reader.iter_object():
+        if key != 'files':
+            data[key] = reader.decode()
+            continue
+        for path in reader.iter_object():
+            files[pathlib.Path(path)] = extract_file_info(path=path, data=reader.decode())
+
+    return Coverage(
+        meta=extract_metadata(data=data['meta']),
+        files=files,
+        info=extract_coverage_info(data=data['totals']),
+    )
+
+
+def map_info(coverage_path: pathlib.Path) -> Coverage:
+    """
+    Same as extract_info, but the report is memory-mapped rather than read into
+    a str: the bytes of every file are located in the mapping by index_json_report,
+    and only decoded from there when the file is accessed (see LazyFiles).
+
+    The mapping is owned by the returned LazyFiles, and unmapped when they are
+    garbage collected. It is closed right away when the report is invalid.
+    """
+    with coverage_path.open('rb') as coverage_data:
+        try:
+            buffer = mmap.mmap(coverage_data.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError as exc:
+            # Empty file
+            raise json.JSONDecodeError('Expecting value', '', 0) from exc
+
+    try:
+        sections, files = index_json_report(buffer=buffer)
+        meta, totals = (json.loads(buffer[start:end]) for start, end in (sections[b'"meta"'], sections[b'"totals"']))
+    except KeyError as exc:
+        buffer.close()
+        raise json.JSONDecodeError(f'Expecting property {exc}', '', 0) from exc
+    except BaseException:
+        buffer.close()
+        raise
+
+    return Coverage(
+        meta=extract_metadata(data=meta),
+        # The mapping stays open as long as the files that are decoded from it
+        files=LazyFiles(
+            index={pathlib.Path(json.loads(path)): span for path, span in files.items()},
+            decode=functools.partial(decode_mapped_file, buffer),
         ),
+        info=extract_coverage_info(data=totals),
     )
 
 
+def index_json_report(buffer: bytes | mmap.mmap) -> tuple[dict[bytes, tuple[int, int]], dict[bytes, tuple[int, int]]]:
+    """
+    Byte spans of the top-level values of a report, and of the entries of its
+    "files" object, keyed by their raw JSON keys. Only the braces outside of
+    strings are looked at, which is enough since all those values are objects:
+    the numbers, which make most of a report, are never decoded.
+    """
+    sections: dict[bytes, tuple[int, int]] = {}
+    files: dict[bytes, tuple[int, int]] = {}
+    depth = section_start = file_start = 0
+    key = path = b''
+    in_files = False
+    # Without escaped characters, the strings can be told apart by counting quotes, which is much faster
+    braces = iter_braces(buffer) if buffer.find(b'\\') == -1 else iter_escaped_braces(buffer)
+    for position, is_open, previous_string in braces:
+        if is_open:
+            depth += 1
+            if depth == 2:
+                key = previous_string
+                section_start = position
+                in_files = key == b'"files"'
+            elif depth == 3 and in_files:
+                path = previous_string
+                file_start = position
+            continue
+        if depth == 2:
+            sections[key] = (section_start, position + 1)
+        elif depth == 3 and in_files:
+            files[path] = (file_start, position + 1)
+        depth -= 1
+        if depth < 0:
+            raise json.JSONDecodeError('Unexpected "}"', '', position)
+    if depth:
+        raise json.JSONDecodeError('Unterminated object', '', len(buffer))
+    return sections, files
+
+
+def iter_braces(buffer: bytes | mmap.mmap) -> Iterator[tuple[int, bool, bytes]]:
+    """
+    Position of the braces outside of the strings of a JSON document without
+    backslashes, whether they open an object, and for an opening brace the
+    string before it (the key of the object).
+    """
+    next_open, next_close = buffer.find(b'{'), buffer.find(b'}')
+    quotes = counted = 0
+    while next_open != -1 or next_close != -1:
+        is_open = next_close == -1 or -1 < next_open < next_close
+        if is_open:
+            position, next_open = next_open, buffer.find(b'{', next_open + 1)
+        else:
+            position, next_close = next_close, buffer.find(b'}', next_close + 1)
+        # mmap has no count(), each part of the buffer is copied once
+        quotes += buffer[counted:position].count(b'"')
+        counted = position
+        if quotes % 2:
+            continue
+        previous_string = b''
+        if is_open and (end := buffer.rfind(b'"', 0, position)) != -1:
+            previous_string = buffer[buffer.rfind(b'"', 0, end) : end + 1]
+        yield position, is_open, previous_string
+
+
+def iter_escaped_braces(buffer: bytes | mmap.mmap) -> Iterator[tuple[int, bool, bytes]]:
+    """Same as iter_braces, for any JSON document."""
+    previous_string = b''
+    for match in JSON_BRACE_OR_STRING.finditer(buffer):
+        if match.lastindex is None:
+            previous_string = match[0]
+        elif match.lastindex == 1:
+            yield match.start(), True, previous_string
+        else:
+            yield match.start(), False, b''
+
+
+def decode_mapped_file(buffer: mmap.mmap, path: pathlib.Path, span: tuple[int, int]) -> FileCoverage:
+    start, end = span
+    return extract_file_info(path=str(path), data=json.loads(buffer[start:end]))
+
+
+class JsonStreamReader:
+    """
+    Minimal pull parser over a JSON text stream.
+
+    Only objects can be walked key by key (see iter_object), any other value is
+    decoded at once with the standard decoder. The internal buffer only ever
+    holds the value being decoded, plus at most one chunk of look-ahead.
+    """
+
+    WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+    def __init__(self, stream: TextIO, chunk_size: int = STREAM_CHUNK_SIZE):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def fill(self) -> bool:
+        """
+        Read the next chunk, dropping what has already been consumed. The read
+        size grows with the pending data so that a value spanning many chunks
+        is not re-decoded a quadratic number of times.
+        """
+        if self.eof:
+            return False
+        pending = self.buffer[self.pos :]
+        chunk = self.stream.read(max(self.chunk_size, len(pending)))
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = pending + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        while True:
+            self.pos = self.WHITESPACE.match(self.buffer, self.pos).end()  # type: ignore[union-attr]
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.fill():
+                raise json.JSONDecodeError('Expecting value', self.buffer, self.pos)
+
+    def expect(self, char: str) -> None:
+        if self.peek() != char:
+            raise json.JSONDecodeError(f'Expecting {char!r}', self.buffer, self.pos)
+        self.pos += 1
+
+    def decode(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if self.fill():
+                    continue
+                raise
+            # A number ending exactly at the end of the buffer may continue in
+            # the next chunk.
+            if end == len(self.buffer) and self.fill():
+                continue
+            self.pos = end
+            return value
+
+    def iter_object(self) -> Iterator[str]:
+        """
+        Yield the keys of the object at the current position. The caller must
+        consume the matching value (with decode or iter_object) before asking
+        for the next key.
+        """
+        self.expect('{')
+        if self.peek() == '}':
+            self.pos += 1
+            return
+        while True:
+            key = self.decode()
+            if not isinstance(key, str):
+                raise json.JSONDecodeError('Expecting property name', self.buffer, self.pos)
+            self.expect(':')
+            yield key
+            if self.peek() == ',':
+                self.pos += 1
+                continue
+            self.expect('}')
+            return
+
+
 # pylint: disable=too-many-locals
 def get_diff_coverage_info(added_lines: dict[pathlib.Path, list[int]], coverage: Coverage) -> DiffCoverage:
     files = {}
@@ -202,13 +667,15 @@ def get_diff_coverage_info(added_lines: dict[pathlib.Path, list[int]], coverage:
         except KeyError:
             continue
 
-        executed = set(file.executed_lines) & set(added_lines_for_file)
+        # Coverage.py reports and parsed diffs are both sorted, so the
+        # statements can be matched with a merge instead of set operations.
+        executed = intersect_sorted(file.executed_lines, added_lines_for_file)
         count_executed = len(executed)
 
-        missing = set(file.missing_lines) & set(added_lines_for_file)
+        missing = intersect_sorted(file.missing_lines, added_lines_for_file)
         count_missing = len(missing)
 
-        added = executed | missing
+        added = list(heapq.merge(executed, missing))
         count_total = len(added)
 
         total_num_lines += count_total
@@ -219,9 +686,9 @@ def get_diff_coverage_info(added_lines: dict[pathlib.Path, list[int]], coverage:
         files[path] = FileDiffCoverage(
             path=path,
             percent_covered=percent_covered,
-            covered_statements=sorted(executed),
-            missing_statements=sorted(missing),
-            added_statements=sorted(added),
+            covered_statements=executed,
+            missing_statements=missing,
+            added_statements=added,
             added_lines=added_lines_for_file,
         )
     final_percentage = compute_coverage(
@@ -238,64 +705,156 @@ def get_diff_coverage_info(added_lines: dict[pathlib.Path, list[int]], coverage:
     )
 
 
+def intersect_sorted(left: Sequence[int], right: Sequence[int]) -> list[int]:
+    """
+    Return the values present in both ascending sequences, in ascending order
+    and without duplicates.
+
+    When one side is much shorter than the other (a handful of added lines in
+    a large file), its values are looked up by bisection; otherwise both sides
+    are walked once in a linear merge.
+    """
+    if len(left) > len(right):
+        left, right = right, left
+    left, right = groups.indexable(left), groups.indexable(right)
+    result: list[int] = []
+    if not left:
+        return result
+
+    if len(left) * len(right).bit_length() < len(right):
+        lo = 0
+        for value in left:
+            lo = bisect.bisect_left(right, value, lo)
+            if lo == len(right):
+                break
+            if right[lo] == value and (not result or result[-1] != value):
+                result.append(value)
+        return result
+
+    i = j = 0
+    while i < len(left) and j < len(right):
+        a, b = left[i], right[j]
+        if a < b:
+            i += 1
+        elif b < a:
+            j += 1
+        else:
+            if not result or result[-1] != a:
+                result.append(a)
+            i += 1
+            j += 1
+    return result
+
+
 def parse_diff_output(diff: str) -> dict[pathlib.Path, list[int]]:
-    current_file: pathlib.Path | None = None
-    added_filename_prefix = '+++ b/'
-    result: dict[pathlib.Path, list[int]] = {}
-    diff_lines: deque[str] = deque()
-    diff_lines.extend(diff.splitlines())
-    while diff_lines:
-        line = diff_lines.popleft()
-        if line.startswith(added_filename_prefix):
-            current_file = pathlib.Path(line.removeprefix(added_filename_prefix))
-            continue
-        if line.startswith('@@'):
+    return parse_diff_chunks(chunks=[diff])
 
-            def parse_line_number_diff_line(diff_line: str) -> Sequence[int]:
-                """
-                Parse the "added" part of the line number diff text:
-                    @@ -60,0 +61 @@ def compute_files(  -> [64]
-                    @@ -60,0 +61,9 @@ def compute_files(  -> [64, 65, 66]
-
-                Github API returns default context lines 3 at start and end, we need to remove them.
-                """
-                start, _ = (int(i) for i in (diff_line.split()[2][1:] + ',1').split(',')[:2])
-
-                line_start = line_end = start
-                while diff_lines:
-                    next_line = diff_lines.popleft()
-                    if next_line.startswith(' '):
-                        line_start += 1
-                        line_end += 1
-                        continue
-
-                    if next_line.startswith('-'):
-                        continue
-
-                    diff_lines.appendleft(next_line)
-                    break
-
-                last_added_line = line_end
-                while diff_lines:
-                    next_line = diff_lines.popleft()
-                    if next_line.startswith(' ') or next_line.startswith('+'):
-                        line_end += 1
-                        if next_line.startswith('+'):
-                            last_added_line = line_end
-                        continue
-
-                    if next_line.startswith('-'):
-                        continue
-
-                    diff_lines.appendleft(next_line)
-                    break
-
-                return range(line_start, last_added_line)
-
-            lines = parse_line_number_diff_line(diff_line=line)
-            if len(lines) > 0:
-                if current_file is None:
-                    raise ValueError(f'Unexpected diff output format: \n{diff}')
-                result.setdefault(current_file, []).extend(lines)
 
+def parse_diff_chunks(chunks: Iterable[str]) -> dict[pathlib.Path, list[int]]:
+    result: dict[pathlib.Path, list[int]] = {}
+    for path, lines in iter_diff_ranges(chunks=chunks):
+        result.setdefault(path, []).extend(lines)
     return result
+
+
+def iter_diff_ranges(chunks: Iterable[str]) -> Iterator[tuple[pathlib.Path, range]]:
+    parser = DiffParser()
+    for chunk in chunks:
+        yield from parser.feed(chunk)
+    yield from parser.close()
+
+
+class DiffParser:
+    """
+    Single-pass, incremental parser for the unified diff returned by GitHub.
+
+    Text is given to feed() in arbitrary chunks and walked once, line by line,
+    without splitting it: inside a hunk only the first character of each line
+    is looked at. Every hunk yields the (path, range) of the lines it adds in
+    the new file, trimmed of the context lines GitHub puts around the changes:
+
+        @@ -60,0 +61 @@ def compute_files(  -> range(61, 62)
+        @@ -60,0 +61,9 @@ def compute_files(  -> range(61, 70)
+
+    Files without a "+++ b/" target (deletions, binary files, pure renames)
+    produce nothing. feed() and close() are generators and must be exhausted
+    before the parser is fed again.
+    """
+
+    TARGET_PREFIX = '+++ '
+    TARGET_PATH_PREFIX = 'b/'
+    CONTEXT_RUN = re.compile(r'(?: [^\n]*\n)+')
+    ADDED_RUN = re.compile(r'(?:\+[^\n]*\n)+')
+
+    def __init__(self) -> None:
+        self.current_file: pathlib.Path | None = None
+        self.pending = ''
+        self.in_hunk = False
+        self.next_line = 0
+        self.first_added: int | None = None
+        self.last_added = 0
+
+    def feed(self, data: str) -> Iterator[tuple[pathlib.Path, range]]:
+        if self.pending:
+            data = self.pending + data
+            self.pending = ''
+        pos = 0
+        while (end := data.find('\n', pos)) != -1:
+            if self.in_hunk:
+                char = data[pos] if pos < end else ''
+                if char == ' ':
+                    # Skip the whole run of context lines at once
+                    run_end = self.CONTEXT_RUN.match(data, pos).end()  # type: ignore[union-attr]
+                    self.next_line += data.count('\n', pos, run_end)
+                    pos = run_end
+                    continue
+                if char == '+':
+                    if self.first_added is None:
+                        self.first_added = self.next_line
+                    run_end = self.ADDED_RUN.match(data, pos).end()  # type: ignore[union-attr]
+                    self.next_line += data.count('\n', pos, run_end)
+                    self.last_added = self.next_line
+                    pos = run_end
+                    continue
+                if char in ('-', '\\'):
+                    pos = end + 1
+                    continue
+                if lines := self.end_hunk():
+                    yield lines
+            self.parse_header(data[pos:end])
+            pos = end + 1
+        self.pending = data[pos:]
+
+    def close(self) -> Iterator[tuple[pathlib.Path, range]]:
+        if self.pending:
+            yield from self.feed('\n')
+        if lines := self.end_hunk():
+            yield lines
+
+    def parse_header(self, line: str) -> None:
+        if line.startswith('@@'):
+            # "@@ -60,0 +61,9 @@ ..." -> 61
+            target = line.split(maxsplit=3)[2]
+            self.next_line = int(target[1:].partition(',')[0])
+            self.in_hunk = True
+        elif line.startswith(self.TARGET_PREFIX):
+            path = line[len(self.TARGET_PREFIX) :].rstrip('\r')
+            if path.startswith(self.TARGET_PATH_PREFIX):
+                self.current_file = pathlib.Path(path[len(self.TARGET_PATH_PREFIX) :])
+            else:
+                # "+++ /dev/null": the file is deleted
+                self.current_file = None
+        elif line.startswith('diff '):
+            self.current_file = None
+
+    def end_hunk(self) -> tuple[pathlib.Path, range] | None:
+        first_added = self.first_added
+        self.in_hunk = False
+        self.first_added = None
+        if first_added is None:
+            return None
+        if self.current_file is None:
+            raise ValueError(
+                f'Unexpected diff output format: lines {first_added}-{self.last_added - 1} added to no file'
+            )
+        return self.current_file, range(first_added, self.last_added)
@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+"""
+On-disk cache of parsed coverage reports, so that the jobs of the subprojects
+of a repository, or the re-runs of a job, don't parse the same report again.
+
+Each entry is one file named after the hash of the report:
+
+    header      magic, schema version and size of the index (HEADER)
+    index       JSON: metadata, summaries, and where the lines of each file are
+    padding     up to a multiple of ITEM_SIZE
+    data        the lines and branches of every file, as native 32-bit ints
+
+A cached report is memory-mapped: only the index is parsed up front, and the
+lines of a file are copied out of the mapping when the file is first accessed.
+"""
+from __future__ import annotations
+
+import array
+import datetime
+import decimal
+import functools
+import hashlib
+import json
+import mmap
+import os
+import pathlib
+import struct
+import sys
+import tempfile
+
+from codecov import cache_dir, coverage as coverage_module, log
+
+COVERAGE_CACHE_MAX_SIZE = 200 * 1024 * 1024
+# Bump when the layout of the entries changes, older entries are then ignored
+SCHEMA_VERSION = 2
+MAGIC = b'COVCACHE'
+HEADER = struct.Struct('<8sIQ')
+ITEM_TYPECODE = 'i'
+ITEM_SIZE = struct.calcsize(ITEM_TYPECODE)
+# Number of bytes of the report hashed at once
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def get_data_start(index_size: int) -> int:
+    # The data is aligned on the size of its items
+    return -(-(HEADER.size + index_size) // ITEM_SIZE) * ITEM_SIZE
+
+
+def encode_info(info: coverage_module.CoverageInfo) -> list:
+    return [
+        info.covered_lines,
+        info.num_statements,
+        # A Decimal is kept as a string, a float (read from a JSON report) as is
+        str(info.percent_covered) if isinstance(info.percent_covered, decimal.Decimal) else info.percent_covered,
+        info.percent_covered_display,
+        info.missing_lines,
+        info.excluded_lines,
+        info.num_branches,
+        info.num_partial_branches,
+        info.covered_branches,
+        info.missing_branches,
+    ]
+
+
+def decode_info(values: list) -> coverage_module.CoverageInfo:
+    (
+        covered_lines,
+        num_statements,
+        percent_covered,
+        percent_covered_display,
+        missing_lines,
+        excluded_lines,
+        num_branches,
+        num_partial_branches,
+        covered_branches,
+        missing_branches,
+    ) = values
+    return coverage_module.CoverageInfo(
+        covered_lines=covered_lines,
+        num_statements=num_statements,
+        percent_covered=decimal.Decimal(percent_covered) if isinstance(percent_covered, str) else percent_covered,
+        percent_covered_display=percent_covered_display,
+        missing_lines=missing_lines,
+        excluded_lines=excluded_lines,
+        num_branches=num_branches,
+        num_partial_branches=num_partial_branches,
+        covered_branches=covered_branches,
+        missing_branches=missing_branches,
+    )
+
+
+def encode_branches(branches: list[list[int]] | None) -> array.array | None:
+    if branches is None:
+        return None
+    return array.array(ITEM_TYPECODE, [line for branch in branches for line in branch])
+
+
+def decode_branches(data: bytes | None) -> list[list[int]] | None:
+    if data is None:
+        return None
+    values = iter(array.array(ITEM_TYPECODE, data).tolist())
+    return list(map(list, zip(values, values)))
+
+
+def decode_file(buffer: mmap.mmap, data_start: int, path: pathlib.Path, entry: list) -> coverage_module.FileCoverage:
+    _, info, offset, counts = entry
+    position = data_start + offset * ITEM_SIZE
+    sections: list[bytes | None] = []
+    # A count of -1 stands for branches that weren't measured
+    for count in counts:
+        if count < 0:
+            sections.append(None)
+            continue
+        sections.append(buffer[position : position + count * ITEM_SIZE])
+        position += count * ITEM_SIZE
+    # One section per count
+    # pylint: disable-next=unbalanced-tuple-unpacking
+    executed, missing, excluded, executed_branches, missing_branches = sections
+    return coverage_module.FileCoverage(
+        path=path,
+        # Line numbers are never negative, the bytes are the same as those of unsigned ints
+        executed_lines=coverage_module.Lines(executed or b''),
+        missing_lines=coverage_module.Lines(missing or b''),
+        excluded_lines=coverage_module.Lines(excluded or b''),
+        executed_branches=decode_branches(executed_branches),
+        missing_branches=decode_branches(missing_branches),
+        info=decode_info(info),
+    )
+
+
+class CoverageCache:
+    """
+    Cache of the Coverage read from reports, keyed by the hash of their content.
+
+    Reading an entry refreshes its mtime, and the least recently used entries
+    are evicted once the directory grows over max_size bytes.
+    """
+
+    def __init__(self, path: pathlib.Path, max_size: int = COVERAGE_CACHE_MAX_SIZE):
+        self.path = path
+        self.max_size = max_size
+        self.path.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def get_key(coverage_path: pathlib.Path, reader_name: str) -> str:
+        digest = hashlib.sha256()
+        # Some readers make the paths relative to the working directory, and the data is in native byte order
+        digest.update(json.dumps([SCHEMA_VERSION, reader_name, str(pathlib.Path.cwd()), sys.byteorder]).encode())
+        with coverage_path.open('rb') as report:
+            for chunk in iter(functools.partial(report.read, HASH_CHUNK_SIZE), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def get_file(self, key: str) -> pathlib.Path:
+        return self.path / f'{key}.coverage-cache'
+
+    def read(self, key: str) -> coverage_module.Coverage | None:
+        try:
+            with self.get_file(key).open('rb') as cache_file:
+                buffer = mmap.mmap(cache_file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+
+        try:
+            magic, schema_version, index_size = HEADER.unpack_from(buffer)
+            if magic != MAGIC or schema_version != SCHEMA_VERSION:
+                raise ValueError(f'Unsupported cache entry {self.get_file(key)}')
+            index = json.loads(buffer[HEADER.size : HEADER.size + index_size])
+        except (struct.error, ValueError):
+            log.warning('Ignoring invalid coverage cache entry %s', self.get_file(key))
+            buffer.close()
+            return None
+        cache_dir.touch(self.get_file(key))
+
+        meta = index['meta']
+        # The mapping stays open as long as the files that are decoded from it
+        files = coverage_module.LazyFiles(
+            index={pathlib.Path(entry[0]): entry for entry in index['files']},
+            decode=functools.partial(decode_file, buffer, get_data_start(index_size)),
+        )
+        return coverage_module.Coverage(
+            meta=coverage_module.CoverageMetadata(
+                version=meta['version'],
+                timestamp=datetime.datetime.fromisoformat(meta['timestamp']),
+                branch_coverage=meta['branch_coverage'],
+                show_contexts=meta['show_contexts'],
+            ),
+            info=decode_info(index['info']),
+            files=files,
+        )
+
+    def write(self, key: str, coverage: coverage_module.Coverage) -> None:
+        entries = []
+        sections: list[bytes] = []
+        offset = 0
+        for path, file_coverage in coverage.files.items():
+            counts = []
+            for section in (
+                file_coverage.executed_lines,
+                file_coverage.missing_lines,
+                file_coverage.excluded_lines,
+                encode_branches(file_coverage.executed_branches),
+                encode_branches(file_coverage.missing_branches),
+            ):
+                if section is None:
+                    counts.append(-1)
+                    continue
+                counts.append(len(section))
+                sections.append(section.tobytes())
+            entries.append([str(path), encode_info(file_coverage.info), offset, counts])
+            offset += sum(count for count in counts if count > 0)
+
+        index = json.dumps(
+            {
+                'meta': {
+                    'version': coverage.meta.version,
+                    'timestamp': coverage.meta.timestamp.isoformat(),
+                    'branch_coverage': coverage.meta.branch_coverage,
+                    'show_contexts': coverage.meta.show_contexts,
+                },
+                'info': encode_info(coverage.info),
+                'files': entries,
+            }
+        ).encode()
+        try:
+            with tempfile.NamedTemporaryFile('wb', dir=self.path, suffix='.tmp', delete=False) as cache_file:
+                cache_file.write(HEADER.pack(MAGIC, SCHEMA_VERSION, len(index)))
+                cache_file.write(index)
+                cache_file.write(b'\0' * (get_data_start(len(index)) - HEADER.size - len(index)))
+                cache_file.writelines(sections)
+            os.replace(cache_file.name, self.get_file(key))
+        except OSError:
+            log.warning('Cannot write to the coverage cache.', exc_info=True)
+            return
+        self.evict()
+
+    def evict(self) -> None:
+        cache_dir.evict(self.path, suffix='.coverage-cache', max_size=self.max_size)
@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+"""
+Read the data file of coverage.py (.coverage, a SQLite database) directly,
+without exporting it with `coverage json` first.
+
+The database only holds what was measured: the executed lines of each file, or
+the executed arcs with branch coverage. The statements, the excluded lines and
+the possible branches come from the analysis of the source files, done with the
+parser of coverage.py, which must be installed (pip install coverage).
+"""
+from __future__ import annotations
+
+import dataclasses
+import datetime
+import pathlib
+import sqlite3
+from collections.abc import Collection, Iterable
+
+from codecov import coverage as coverage_module, log
+
+SQLITE_HEADER = b'SQLite format 3\x00'
+
+
+class CoverageDataError(Exception):
+    pass
+
+
+@dataclasses.dataclass
+class MeasuredFile:
+    path: pathlib.Path
+    lines: set[int]
+    arcs: set[tuple[int, int]] | None
+
+
+@dataclasses.dataclass
+class CoverageData:
+    meta: coverage_module.CoverageMetadata
+    files: dict[pathlib.Path, MeasuredFile]
+
+
+def is_coverage_database(path: pathlib.Path) -> bool:
+    try:
+        with path.open('rb') as data_file:
+            return data_file.read(len(SQLITE_HEADER)) == SQLITE_HEADER
+    except FileNotFoundError:
+        return False
+
+
+def numbits_to_lines(numbits: bytes) -> list[int]:
+    """Line numbers of a numbits blob: bit n of byte m is set when line 8 * m + n was executed."""
+    return [index * 8 + bit for index, byte in enumerate(numbits) if byte for bit in range(8) if byte & (1 << bit)]
+
+
+def read_coverage_data(
+    coverage_path: pathlib.Path,
+    paths: Collection[pathlib.Path] | None = None,
+    root: pathlib.Path | None = None,
+) -> CoverageData:
+    """
+    Read the measured lines and arcs from the file, line_bits and arc tables,
+    merging all the contexts. With paths, only the files relative to root
+    (the current directory by default) that are in paths are read.
+    """
+    root = (root or pathlib.Path.cwd()).resolve()
+    connection = sqlite3.connect(f'{coverage_path.resolve().as_uri()}?mode=ro', uri=True)
+    try:
+        meta = dict(connection.execute('SELECT key, value FROM meta'))
+        has_arcs = meta.get('has_arcs') == '1'
+        files = read_measured_files(connection=connection, has_arcs=has_arcs, paths=paths, root=root)
+    except sqlite3.DatabaseError as exc:
+        log.error('Invalid coverage data file: %s', coverage_path)
+        raise CoverageDataError(f'Cannot read the coverage data file {coverage_path}: {exc}') from exc
+    finally:
+        connection.close()
+
+    timestamp = meta.get('when')
+    return CoverageData(
+        meta=coverage_module.CoverageMetadata(
+            version=meta.get('version', ''),
+            timestamp=(
+                datetime.datetime.fromisoformat(timestamp)
+                if timestamp
+                else datetime.datetime.fromtimestamp(coverage_path.stat().st_mtime)
+            ),
+            branch_coverage=has_arcs,
+            show_contexts=False,
+        ),
+        files={measured.path: measured for measured in files.values()},
+    )
+
+
+def read_measured_files(
+    connection: sqlite3.Connection, has_arcs: bool, paths: Collection[pathlib.Path] | None, root: pathlib.Path
+) -> dict[int, MeasuredFile]:
+    """The measured files by their id in the database, with their lines and arcs."""
+    files: dict[int, MeasuredFile] = {}
+    for file_id, path in connection.execute('SELECT id, path FROM file'):
+        relative_path = coverage_module.get_relative_path(path, root=root)
+        if paths is None or relative_path in paths:
+            files[file_id] = MeasuredFile(path=relative_path, lines=set(), arcs=set() if has_arcs else None)
+
+    if has_arcs:
+        for file_id, from_line, to_line in connection.execute('SELECT file_id, fromno, tono FROM arc'):
+            if (measured := files.get(file_id)) is not None:
+                measured.arcs.add((from_line, to_line))  # type: ignore[union-attr]
+                measured.lines.update(line for line in (from_line, to_line) if line > 0)
+    else:
+        for file_id, numbits in connection.execute('SELECT file_id, numbits FROM line_bits'):
+            if (measured := files.get(file_id)) is not None:
+                measured.lines.update(numbits_to_lines(numbits))
+    return files
+
+
+def join_regex(regexes: Iterable[str]) -> str:
+    return '|'.join(f'(?:{regex})' for regex in regexes)
+
+
+def get_regexes(config, option: str) -> list[str]:
+    """The regexes of a list option of coverage.py, whose values are typed as any option."""
+    value = config.get_option(option)
+    return [str(regex) for regex in value] if isinstance(value, list) else []
+
+
+@dataclasses.dataclass
+class Analyzer:
+    """Analysis of the source files with the parser and the report options of coverage.py."""
+
+    root: pathlib.Path
+    exclude: str
+    partial_branches: str
+
+    @classmethod
+    def from_config(cls, root: pathlib.Path) -> Analyzer:
+        try:
+            import coverage  # pylint: disable=import-outside-toplevel
+        except ImportError as exc:
+            raise CoverageDataError(
+                'Reading a .coverage data file requires the coverage package (pip install coverage).'
+            ) from exc
+
+        # The options of the project ([tool.coverage.report], .coveragerc, ...) apply as with `coverage json`
+        config = coverage.Coverage(data_file=None)
+        exclude = get_regexes(config, 'report:exclude_lines')
+        try:
+            exclude += get_regexes(config, 'report:exclude_also')
+        except coverage.CoverageException:
+            # Before coverage 7.2
+            pass
+        return cls(
+            root=root,
+            exclude=join_regex(exclude),
+            partial_branches=join_regex(get_regexes(config, 'report:partial_branches')),
+        )
+
+    def analyze_branches(
+        self, parser, arcs: set[tuple[int, int]]
+    ) -> tuple[list[list[int]], list[list[int]], tuple[int, int, int]]:
+        """The executed and missing branches of the file, and its (number, partial, missing) branch counts."""
+        possible_arcs = set(parser.arcs())
+        executed_arcs = set(parser.translate_arcs(arcs))
+        no_branch = parser.lines_matching(self.partial_branches)
+        exit_counts = parser.exit_counts()
+        branch_lines = {line for line, count in exit_counts.items() if count > 1}
+        executed_branches = sorted(
+            [start, end] for start, end in executed_arcs & possible_arcs if start in branch_lines
+        )
+        missing_branches = sorted(
+            [start, end]
+            for start, end in possible_arcs - executed_arcs
+            if start in branch_lines and start not in no_branch and end not in parser.excluded
+        )
+        missing_per_line: dict[int, int] = {}
+        for start, _ in missing_branches:
+            missing_per_line[start] = missing_per_line.get(start, 0) + 1
+        branches = (
+            sum(exit_counts[line] for line in branch_lines),
+            sum(1 for line, count in missing_per_line.items() if count < exit_counts[line]),
+            len(missing_branches),
+        )
+        return executed_branches, missing_branches, branches
+
+    def analyze(self, measured: MeasuredFile) -> coverage_module.FileCoverage:
+        import coverage  # pylint: disable=import-outside-toplevel
+        from coverage.parser import PythonParser  # pylint: disable=import-outside-toplevel
+
+        try:
+            # The source is read by the constructor
+            parser = PythonParser(filename=str(self.root / measured.path), exclude=self.exclude)
+            parser.parse_source()
+        except (OSError, coverage.CoverageException) as exc:
+            raise CoverageDataError(f'Cannot analyze {measured.path}: {exc}') from exc
+        # Lines of excluded code or of the module start (line 0) may be measured too
+        executed = parser.translate_lines(measured.lines) & parser.statements
+        missing = parser.statements - executed
+
+        executed_branches = missing_branches = None
+        branches = None
+        if measured.arcs is not None:
+            executed_branches, missing_branches, branches = self.analyze_branches(parser, arcs=measured.arcs)
+
+        return coverage_module.FileCoverage(
+            path=measured.path,
+            executed_lines=coverage_module.Lines(sorted(executed)),
+            missing_lines=coverage_module.Lines(sorted(missing)),
+            excluded_lines=coverage_module.Lines(sorted(parser.excluded)),
+            executed_branches=executed_branches,
+            missing_branches=missing_branches,
+            info=coverage_module.get_summary(
+                num_statements=len(parser.statements),
+                num_missing=len(missing),
+                num_excluded=len(parser.excluded),
+                branches=branches,
+            ),
+        )
+
+
+def get_coverage_info(
+    coverage_path: pathlib.Path,
+    paths: Collection[pathlib.Path] | None = None,
+    root: pathlib.Path | None = None,
+) -> coverage_module.Coverage:
+    """
+    Same as coverage.get_coverage_info, from a .coverage data file. With paths,
+    only those files are analyzed, and the totals only count them.
+    Files whose source cannot be analyzed are left out, with a warning.
+    """
+    root = (root or pathlib.Path.cwd()).resolve()
+    data = read_coverage_data(coverage_path=coverage_path, paths=paths, root=root)
+    analyzer = Analyzer.from_config(root=root)
+
+    files: dict[pathlib.Path, coverage_module.FileCoverage] = {}
+    for path, measured in data.files.items():
+        try:
+            files[path] = analyzer.analyze(measured)
+        except CoverageDataError as exc:
+            log.warning('%s, the file is left out of the report.', exc)
+
+    return coverage_module.Coverage(
+        meta=data.meta,
+        files=files,
+        info=coverage_module.get_total_summary(files=files.values(), branch_coverage=data.meta.branch_coverage),
+    )
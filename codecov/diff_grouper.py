@@ -1,40 +1,69 @@
 # -*- coding: utf-8 -*-
 from __future__ import annotations
 
-from collections.abc import Iterable
+import functools
+import itertools
+import pathlib
+from collections.abc import Callable, Hashable, Iterable
 
 from codecov import coverage as coverage_module, groups
 
 MAX_ANNOTATION_GAP = 3
 
 
+def cached_groups(
+    coverage: coverage_module.Coverage,
+    key: Hashable,
+    compute: Callable[[], list[groups.Group]],
+    source: object = None,
+) -> list[groups.Group]:
+    """
+    Return the groups stored under `key` in the coverage's cache, computing
+    them on the first call. `source` is the object the groups were derived
+    from besides the coverage (e.g. a FileDiffCoverage): a cached entry built
+    from another object is recomputed.
+    """
+    cached = coverage.groups_cache.get(key)
+    if cached is None or cached[0] is not source:
+        cached = coverage.groups_cache[key] = (source, compute())
+    return cached[1]
+
+
 def get_missing_groups(
     coverage: coverage_module.Coverage,
+    paths: Iterable[pathlib.Path] | None = None,
 ) -> Iterable[groups.Group]:
-    for path, coverage_file in coverage.files.items():
-        # Lines that are covered or excluded should not be considered for
-        # filling a gap between violation groups.
-        # (so, lines that can appear in a gap are lines that are missing, or
-        # lines that do not contain code: blank lines or lines containing comments)
-        separators = {
-            *coverage_file.executed_lines,
-            *coverage_file.excluded_lines,
-        }
-        # Lines that should be considered for filling a gap, unless
-        # they are separators.
-        joiners = set(range(1, coverage_file.info.num_statements)) - separators
-
+    """Groups of missing lines of the given files, all the files by default."""
+    for path in coverage.files if paths is None else paths:
+        coverage_file = coverage.files[path]
+        if not coverage_file.missing_lines:
+            continue
+        yield from cached_groups(
+            coverage=coverage,
+            key=('missing', path, MAX_ANNOTATION_GAP),
+            compute=functools.partial(group_missing_lines, path=path, coverage_file=coverage_file),
+        )
+
+
+def group_missing_lines(path: pathlib.Path, coverage_file: coverage_module.FileCoverage) -> list[groups.Group]:
+    # Lines that are covered or excluded should not be considered for
+    # filling a gap between violation groups.
+    # (so, lines that can appear in a gap are lines that are missing, or
+    # lines that do not contain code: blank lines or lines containing comments)
+    separators = groups.LineUnion(coverage_file.executed_lines, coverage_file.excluded_lines)
+    # Lines that should be considered for filling a gap, unless
+    # they are separators.
+    joiners = groups.LineComplement(start=1, stop=coverage_file.info.num_statements, excluded=separators)
+
+    return [
+        groups.Group(file=path, line_start=start, line_end=end)
         for start, end in groups.compute_contiguous_groups(
             values=coverage_file.missing_lines,
             separators=separators,
             joiners=joiners,
             max_gap=MAX_ANNOTATION_GAP,
-        ):
-            yield groups.Group(
-                file=path,
-                line_start=start,
-                line_end=end,
-            )
+        )
+    ]
 
 
 def flatten_branches(branches: list[list[int]] | None) -> list[int]:
@@ -66,45 +95,66 @@ def get_branch_missing_groups(
 
 
 def group_branches(coverage: coverage_module.Coverage) -> coverage_module.Coverage:
+    if isinstance(coverage.files, coverage_module.LazyFiles):
+        # Files that are never accessed are not decoded just to be grouped
+        coverage.files.apply(group_file_branches)
+        return coverage
+
     for file_coverage in coverage.files.values():
-        separators = {
-            *flatten_branches(file_coverage.executed_branches),
-            *file_coverage.excluded_lines,
-        }
-        joiners = set(range(1, file_coverage.info.num_statements)) - separators
-
-        file_coverage.missing_branches = [
-            [start, end]
-            for start, end in groups.compute_contiguous_groups(
-                values=flatten_branches(branches=file_coverage.missing_branches),
-                separators=separators,
-                joiners=joiners,
-                max_gap=MAX_ANNOTATION_GAP,
-            )
-        ]
+        group_file_branches(file_coverage=file_coverage)
     return coverage
 
 
+def group_file_branches(file_coverage: coverage_module.FileCoverage) -> None:
+    if not file_coverage.missing_branches:
+        file_coverage.missing_branches = []
+        return
+
+    separators = groups.SortedLines(
+        itertools.chain(flatten_branches(file_coverage.executed_branches), file_coverage.excluded_lines)
+    )
+    joiners = groups.LineComplement(start=1, stop=file_coverage.info.num_statements, excluded=separators)
+
+    file_coverage.missing_branches = [
+        [start, end]
+        for start, end in groups.compute_contiguous_groups(
+            values=flatten_branches(branches=file_coverage.missing_branches),
+            separators=separators,
+            joiners=joiners,
+            max_gap=MAX_ANNOTATION_GAP,
+        )
+    ]
+
+
 def get_diff_missing_groups(
     coverage: coverage_module.Coverage,
     diff_coverage: coverage_module.DiffCoverage,
 ) -> Iterable[groups.Group]:
     for path, diff_file in diff_coverage.files.items():
-        coverage_file = coverage.files[path]
-        separators = {
-            *coverage_file.executed_lines,
-            *coverage_file.excluded_lines,
-        }
-        joiners = set(diff_file.added_lines) - separators
-
+        if not diff_file.missing_statements:
+            continue
+        yield from cached_groups(
+            coverage=coverage,
+            key=('diff_missing', path, MAX_ANNOTATION_GAP),
+            compute=functools.partial(
+                group_diff_missing_lines, path=path, coverage_file=coverage.files[path], diff_file=diff_file
+            ),
+            source=diff_file,
+        )
+
+
+def group_diff_missing_lines(
+    path: pathlib.Path, coverage_file: coverage_module.FileCoverage, diff_file: coverage_module.FileDiffCoverage
+) -> list[groups.Group]:
+    separators = groups.LineUnion(coverage_file.executed_lines, coverage_file.excluded_lines)
+    joiners = groups.SortedLines(line for line in diff_file.added_lines if line not in separators)
+
+    return [
+        groups.Group(file=path, line_start=start, line_end=end)
         for start, end in groups.compute_contiguous_groups(
             values=diff_file.missing_statements,
             separators=separators,
             joiners=joiners,
             max_gap=MAX_ANNOTATION_GAP,
-        ):
-            yield groups.Group(
-                file=path,
-                line_start=start,
-                line_end=end,
-            )
+        )
+    ]
@@ -3,12 +3,16 @@ import base64
 import dataclasses
 import json
 import pathlib
-from collections.abc import Iterable
+from collections.abc import AsyncIterator, Iterable, Iterator
 
 from codecov import github_client, groups, log, settings
 
 GITHUB_CODECOV_LOGIN = 'CI-codecov[bot]'
 COMMIT_MESSAGE = 'Update annotations data'
+# Maximum length of an issue comment body accepted by the GitHub API
+MAX_COMMENT_LENGTH = 65536
+# Maximum page size of the GitHub API listings
+COMMENTS_PER_PAGE = 100
 
 
 class CannotGetBranch(Exception):
@@ -70,18 +74,30 @@ class User:
 def get_my_login(github: github_client.GitHub) -> User:
     try:
         response = github.user.get()
-        user = User(
-            name=response.name,
-            email=response.email or f'{response.id}+{response.login}@users.noreply.github.com',
-            login=response.login,
-        )
     except github_client.Forbidden:
         # The GitHub actions user cannot access its own details
         # and I'm not sure there's a way to see that we're using
         # the GitHub actions user except noting that it fails
         return User(name=GITHUB_CODECOV_LOGIN, email='', login=GITHUB_CODECOV_LOGIN)
 
-    return user
+    return user_from_response(response)
+
+
+async def get_my_login_async(github: github_client.AsyncGitHub) -> User:
+    try:
+        response = await github.user.get()
+    except github_client.Forbidden:
+        return User(name=GITHUB_CODECOV_LOGIN, email='', login=GITHUB_CODECOV_LOGIN)
+
+    return user_from_response(response)
+
+
+def user_from_response(response: github_client.JsonObject) -> User:
+    return User(
+        name=response.name,
+        email=response.email or f'{response.id}+{response.login}@users.noreply.github.com',
+        login=response.login,
+    )
 
 
 def get_pr_number(github: github_client.GitHub, config: settings.Config) -> int:
@@ -132,6 +148,84 @@ def get_pr_diff(github: github_client.GitHub, repository: str, pr_number: int) -
     return pull_request_diff
 
 
+async def stream_pr_diff_async(
+    github: github_client.AsyncGitHub, repository: str, pr_number: int
+) -> AsyncIterator[str]:
+    """Same as stream_pr_diff, with the asynchronous client."""
+    try:
+        async for chunk in (
+            github.repos(repository)
+            .pulls(pr_number)
+            .get(use_stream=True, headers={'Accept': 'application/vnd.github.v3.diff'})
+        ):
+            yield chunk
+    except github_client.Forbidden as exc:
+        raise CannotGetPullRequest from exc
+    except github_client.NotFound as exc:
+        raise CannotGetPullRequest from exc
+
+
+def stream_pr_diff(github: github_client.GitHub, repository: str, pr_number: int) -> Iterator[str]:
+    """
+    Same as get_pr_diff, but yields the diff in chunks as they are downloaded
+    so that it can be parsed while the download goes on.
+    """
+    try:
+        yield from (
+            github.repos(repository)
+            .pulls(pr_number)
+            .get(use_stream=True, headers={'Accept': 'application/vnd.github.v3.diff'})
+        )
+    except github_client.Forbidden as exc:
+        raise CannotGetPullRequest from exc
+    except github_client.NotFound as exc:
+        raise CannotGetPullRequest from exc
+
+
+def find_comment(
+    github: github_client.GitHub,
+    user: User,
+    repository: str,
+    pr_number: int,
+    marker: str,
+) -> int | None:
+    """
+    Look for our own comment on the PR, newest first, going through as few
+    pages of comments as possible.
+    """
+    return find_comments(github=github, user=user, repository=repository, pr_number=pr_number, markers=[marker]).get(
+        marker
+    )
+
+
+def find_comments(
+    github: github_client.GitHub,
+    user: User,
+    repository: str,
+    pr_number: int,
+    markers: Iterable[str],
+) -> dict[str, int]:
+    """
+    Same as find_comment, for several markers in a single pass over the
+    comments, which stops once they are all found.
+    """
+    missing = set(markers)
+    comment_ids: dict[str, int] = {}
+    if not missing:
+        return comment_ids
+    issue_comments_path = github.repos(repository).issues(pr_number).comments
+    for page in issue_comments_path.get(per_page=COMMENTS_PER_PAGE, use_pages=True, reverse_pages=True):
+        for comment in reversed(page):
+            if comment.user.login != user.login:
+                continue
+            for marker in [marker for marker in missing if marker in comment.body]:
+                comment_ids[marker] = comment.id
+                missing.discard(marker)
+        if not missing:
+            break
+    return comment_ids
+
+
 def post_comment(  # pylint: disable=too-many-arguments
     github: github_client.GitHub,
     user: User,
@@ -139,29 +233,129 @@ def post_comment(  # pylint: disable=too-many-arguments
     pr_number: int,
     contents: str,
     marker: str,
-) -> None:
-    if len(contents) > 65536:
-        raise CannotPostComment('Comment exceeds allowed size(65536)')
+    comment_id: int | None = None,
+    search_comments: bool = True,
+) -> int:
+    """
+    Create or update our comment on the PR, and return its id.
+    When the id of the comment is already known, the comments aren't listed.
+    Without search_comments, the comments have already been looked up: a new
+    comment is created when comment_id is unknown or can't be updated.
+    """
+    if len(contents) > MAX_COMMENT_LENGTH:
+        raise CannotPostComment(f'Comment exceeds allowed size({MAX_COMMENT_LENGTH})')
 
-    issue_comments_path = github.repos(repository).issues(pr_number).comments
     comments_path = github.repos(repository).issues.comments
 
-    for comment in issue_comments_path.get():
-        if comment.user.login == user.login and marker in comment.body:
-            log.info('Update previous comment')
-            try:
-                comments_path(comment.id).patch(body=contents)
-            except github_client.Forbidden as exc:
-                raise CannotPostComment from exc
-            except github_client.ApiError as exc:
-                raise CannotPostComment from exc
-            break
-    else:
-        log.info('Adding new comment')
+    if comment_id is not None:
+        log.info('Update previous comment')
         try:
-            issue_comments_path.post(body=contents)
+            comments_path(comment_id).patch(body=contents)
+            return comment_id
+        except (github_client.NotFound, github_client.Forbidden):
+            # The comment was deleted, or isn't ours anymore
+            log.info('Cannot update comment %s, looking for it again', comment_id)
+        except github_client.ApiError as exc:
+            raise CannotPostComment from exc
+
+    comment_id = None
+    if search_comments:
+        try:
+            comment_id = find_comment(
+                github=github, user=user, repository=repository, pr_number=pr_number, marker=marker
+            )
+        except github_client.ApiError as exc:
+            raise CannotPostComment from exc
+
+    if comment_id is not None:
+        log.info('Update previous comment')
+        try:
+            comments_path(comment_id).patch(body=contents)
         except github_client.Forbidden as exc:
             raise CannotPostComment from exc
+        except github_client.ApiError as exc:
+            raise CannotPostComment from exc
+        return comment_id
+
+    log.info('Adding new comment')
+    try:
+        comment = github.repos(repository).issues(pr_number).comments.post(body=contents)
+    except github_client.Forbidden as exc:
+        raise CannotPostComment from exc
+    return comment.id
+
+
+def get_comment_id_file_name(pr_number: int, subproject_id: str | None) -> str:
+    return f'{pr_number}-{subproject_id}-comment.json' if subproject_id else f'{pr_number}-comment.json'
+
+
+def get_cached_comment_id(github: github_client.GitHub, pr_number: int, config: settings.Config) -> int | None:
+    """
+    Read the id of our comment, saved in the annotations data branch by a
+    previous run. Failing to read it is not an error: the comment is then
+    looked up on the PR.
+    """
+    if not config.ANNOTATIONS_DATA_BRANCH:
+        return None
+
+    file_name = get_comment_id_file_name(pr_number=pr_number, subproject_id=config.SUBPROJECT_ID)
+    try:
+        file = github.repos(config.GITHUB_REPOSITORY).contents(file_name).get(ref=config.ANNOTATIONS_DATA_BRANCH)
+        return json.loads(base64.b64decode(file.content))['comment_id']
+    except github_client.ApiError:
+        log.debug('No cached comment id', exc_info=True)
+    except (ValueError, KeyError, TypeError, AttributeError):
+        log.warning(f'Invalid cached comment id in "{file_name}", ignoring it.')
+    return None
+
+
+def write_cached_comment_id(  # pylint: disable=too-many-arguments
+    github: github_client.GitHub,
+    user: User,
+    pr_number: int,
+    config: settings.Config,
+    comment_id: int,
+    cached: bool = True,
+) -> None:
+    """
+    Save the id of our comment in the annotations data branch, so that the next
+    runs don't need to list the comments of the PR. Without cached, no id could
+    be read before: the file is created right away, and only looked up when it
+    turns out to exist.
+    """
+    if not config.ANNOTATIONS_DATA_BRANCH:
+        return
+
+    file_name = get_comment_id_file_name(pr_number=pr_number, subproject_id=config.SUBPROJECT_ID)
+    contents_path = github.repos(config.GITHUB_REPOSITORY).contents(file_name)
+
+    def put(file_sha: str | None) -> None:
+        contents_path.put(
+            message=COMMIT_MESSAGE,
+            branch=config.ANNOTATIONS_DATA_BRANCH,
+            sha=file_sha,
+            committer={
+                'name': user.name,
+                'email': user.email,
+            },
+            content=base64.b64encode(json.dumps({'comment_id': comment_id}).encode()).decode(),
+        )
+
+    try:
+        if not cached:
+            try:
+                put(file_sha=None)
+                return
+            except (github_client.Conflict, github_client.ValidationFailed):
+                # The file exists after all, its sha is needed to update it
+                pass
+        try:
+            file_sha = contents_path.get(ref=config.ANNOTATIONS_DATA_BRANCH).sha
+        except github_client.NotFound:
+            file_sha = None
+        put(file_sha=file_sha)
+    except github_client.ApiError:
+        log.warning('Cannot save the comment id to the annotations data branch.', exc_info=True)
 
 
 def create_missing_coverage_annotations(
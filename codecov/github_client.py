@@ -1,14 +1,36 @@
 # -*- coding: utf-8 -*-
 from __future__ import annotations
 
+import asyncio
+import codecs
+import contextlib
+import dataclasses
+import functools
+import hashlib
+import importlib.util
+import itertools
+import json
+import os
+import pathlib
+import random
+import tempfile
+import time
+from collections.abc import AsyncIterator, Callable, Iterable, Iterator, Mapping
+from typing import IO
+
 import httpx
 
+from codecov import cache_dir, log, timing
+
 TIMEOUT = 60
 BASE_URL = 'https://api.github.com'
+HTTP_CACHE_MAX_SIZE = 50 * 1024 * 1024
+# Size of the chunks a cached body is streamed back in
+HTTP_CACHE_CHUNK_SIZE = 64 * 1024
 
 
 class _Executable:
-    def __init__(self, _gh: GitHub, _method: str, _path: str):
+    def __init__(self, _gh: GitHub | AsyncGitHub, _method: str, _path: str):
         self._gh = _gh
         self._method = _method
         self._path = _path
@@ -35,56 +57,709 @@ class _Callable:
         return _Callable(self._gh, name)
 
 
+def session_options(  # pylint: disable=too-many-arguments
+    token: str,
+    *,
+    max_connections: int = 10,
+    keepalive_expiry: float = 5.0,
+    http2: bool = False,
+    compression: bool = False,
+) -> dict:
+    """
+    Options of the HTTP session used by the GitHub client. Connections are pooled
+    and kept alive between the API calls of a run; with http2 they are also
+    multiplexed over a single connection, which requires the optional h2 package.
+    Compressed responses are only asked for with compression.
+    """
+    if http2 and importlib.util.find_spec('h2') is None:
+        log.warning('HTTP/2 requires the h2 package (pip install httpx[http2]), falling back to HTTP/1.1.')
+        http2 = False
+
+    headers = {'Authorization': f'token {token}'}
+    if not compression:
+        headers['Accept-Encoding'] = 'identity'
+
+    return {
+        'base_url': BASE_URL,
+        'follow_redirects': True,
+        'headers': headers,
+        'http2': http2,
+        'limits': httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+            keepalive_expiry=keepalive_expiry,
+        ),
+    }
+
+
+def create_session(token: str, **kw) -> httpx.Client:
+    return httpx.Client(**session_options(token, **kw))
+
+
+def create_async_session(token: str, **kw) -> httpx.AsyncClient:
+    return httpx.AsyncClient(**session_options(token, **kw))
+
+
+def get_request_kwargs(method: str, kw: dict) -> dict:
+    """
+    Turn the keyword arguments of an API call into the query parameters or
+    the JSON body of the request, depending on the method.
+    """
+    requests_kwargs = {'headers': kw.pop('headers', {})}
+    if method == 'get' and kw:
+        requests_kwargs['params'] = kw
+
+    elif method in ['post', 'patch', 'put']:
+        requests_kwargs['json'] = kw
+    return requests_kwargs
+
+
+def read_contents(
+    response: httpx.Response, use_bytes: bool = False, use_text: bool = False
+) -> str | bytes | JsonObject:
+    contents: str | bytes | JsonObject
+    if use_bytes:
+        contents = response.content
+    elif use_text:
+        contents = response.text
+    else:
+        contents = response_contents(response)
+
+    raise_for_status(response=response, contents=contents)
+
+    return contents
+
+
+# Methods that can safely be sent again when the outcome of a request is unknown
+IDEMPOTENT_METHODS = frozenset({'get', 'head', 'options', 'put', 'delete'})
+RETRY_STATUS_CODES = frozenset({500, 502, 503, 504})
+
+
+def is_rate_limited(response: httpx.Response) -> bool:
+    """
+    Primary rate limits answer 403 or 429 with no remaining requests, secondary
+    rate limits answer 403 or 429 with a Retry-After header or an explanation.
+    """
+    if response.status_code not in (403, 429):
+        return False
+    return (
+        response.status_code == 429
+        or response.headers.get('x-ratelimit-remaining') == '0'
+        or 'retry-after' in response.headers
+        or b'rate limit' in response.content.lower()
+    )
+
+
+def get_rate_limit_delay(response: httpx.Response) -> float | None:
+    """Seconds to wait before the rate limit is lifted, when the response says so."""
+    if retry_after := response.headers.get('retry-after'):
+        with contextlib.suppress(ValueError):
+            return max(float(retry_after), 0)
+    if response.headers.get('x-ratelimit-remaining') == '0' and (reset := response.headers.get('x-ratelimit-reset')):
+        with contextlib.suppress(ValueError):
+            # One more second for the clock skew
+            return max(float(reset) - time.time(), 0) + 1
+    return None
+
+
+@dataclasses.dataclass
+class RetryStats:
+    retries: int = 0
+    rate_limited: int = 0
+    waited: float = 0.0
+
+
+@dataclasses.dataclass
+class RetryPolicy:
+    """
+    When and how long to wait before sending a request again.
+
+    Requests rejected by a rate limit are always retried, after the delay given
+    by the response if any. Server errors and transport errors are only retried
+    for idempotent methods, since the first request may have been processed.
+    Otherwise, the delay grows exponentially with the attempts, with jitter so
+    that concurrent jobs don't retry in lockstep. Delays longer than max_wait
+    are not worth waiting for, and the error is raised instead.
+    """
+
+    max_retries: int = 3
+    backoff_factor: float = 1.0
+    max_wait: float = 60.0
+    sleep: Callable[[float], None] = time.sleep
+    stats: RetryStats = dataclasses.field(default_factory=RetryStats)
+
+    def get_delay(self, method: str, attempt: int, response: httpx.Response | None = None) -> float | None:
+        if attempt >= self.max_retries:
+            return None
+
+        if response is not None and is_rate_limited(response):
+            delay = get_rate_limit_delay(response)
+            if delay is None:
+                delay = self.get_backoff(attempt)
+        elif method.lower() in IDEMPOTENT_METHODS and (response is None or response.status_code in RETRY_STATUS_CODES):
+            delay = self.get_backoff(attempt)
+        else:
+            return None
+
+        if delay > self.max_wait:
+            log.warning(f'Not retrying, the GitHub API asks to wait {delay:.0f}s.')
+            return None
+        return delay
+
+    def get_backoff(self, attempt: int) -> float:
+        delay = self.backoff_factor * 2**attempt
+        return delay / 2 + random.uniform(0, delay / 2)  # noqa: S311
+
+    def record(self, delay: float, response: httpx.Response | None) -> None:
+        self.stats.retries += 1
+        self.stats.waited += delay
+        if response is not None and is_rate_limited(response):
+            self.stats.rate_limited += 1
+        reason = f'status {response.status_code}' if response is not None else 'transport error'
+        log.info(f'Retrying GitHub API request in {delay:.1f}s ({reason}).')
+
+
+class HttpCache:
+    """
+    On-disk cache of the GitHub API GET responses, revalidated with conditional
+    requests: the ETag and Last-Modified of a cached response are sent back as
+    If-None-Match and If-Modified-Since, and a 304 Not Modified answer is served
+    from the cache. Such answers don't count against the primary rate limit.
+
+    Each response is one file: a JSON line of metadata followed by the raw body.
+    Reading a file refreshes its mtime, and the least recently used files are
+    evicted once the directory grows over max_size bytes.
+    """
+
+    # Response headers needed to rebuild the response from the cache
+    KEPT_HEADERS = ('content-type', 'etag', 'last-modified', 'link')
+
+    def __init__(self, path: pathlib.Path, max_size: int = HTTP_CACHE_MAX_SIZE):
+        self.path = path
+        self.max_size = max_size
+        self.path.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def get_key(method: str, url: str, kw: dict, session_headers: Mapping[str, str]) -> str | None:
+        if method.lower() != 'get':
+            return None
+        # Responses differ depending on who asks, and in which format
+        headers = httpx.Headers(session_headers)
+        headers.update(kw.get('headers') or {})
+        return hashlib.sha256(
+            json.dumps(
+                [
+                    str(httpx.URL(url, params=kw.get('params'))),
+                    headers.get('Accept', ''),
+                    headers.get('Authorization', ''),
+                ]
+            ).encode()
+        ).hexdigest()
+
+    def get_file(self, key: str) -> pathlib.Path:
+        return self.path / f'{key}.cache'
+
+    def open(self, key: str) -> tuple[dict, IO[bytes]] | None:
+        """The metadata of a cached response, and its file positioned at the start of the body."""
+        try:
+            cache_file = self.get_file(key).open('rb')
+        except OSError:
+            return None
+        try:
+            metadata = json.loads(cache_file.readline())
+        except (OSError, ValueError):
+            cache_file.close()
+            return None
+        cache_dir.touch(self.get_file(key))
+        return metadata, cache_file
+
+    def read(self, key: str) -> tuple[dict, bytes] | None:
+        if (entry := self.open(key)) is None:
+            return None
+        metadata, cache_file = entry
+        with cache_file:
+            try:
+                return metadata, cache_file.read()
+            except OSError:
+                return None
+
+    def prepare(self, key: str | None, kw: dict) -> None:
+        """Add the conditional headers of the cached response, if any, to the request."""
+        if key is None or (entry := self.open(key)) is None:
+            return
+        metadata, cache_file = entry
+        # Only the metadata is needed, not the body
+        cache_file.close()
+        headers = dict(kw.get('headers') or {})
+        if etag := metadata['headers'].get('etag'):
+            headers['If-None-Match'] = etag
+        if last_modified := metadata['headers'].get('last-modified'):
+            headers['If-Modified-Since'] = last_modified
+        kw['headers'] = headers
+
+    @staticmethod
+    def without_validators(kw: dict) -> dict:
+        """
+        The request without its conditional headers: a 304 can't be served when
+        the cached response was evicted after the request was prepared.
+        """
+        headers = {
+            name: value
+            for name, value in (kw.get('headers') or {}).items()
+            if name.lower() not in ('if-none-match', 'if-modified-since')
+        }
+        return {**kw, 'headers': headers}
+
+    def resolve(self, key: str | None, response: httpx.Response) -> httpx.Response:
+        """
+        Return the cached response when the server answered 304 Not Modified,
+        and cache the response otherwise when it can be revalidated later.
+        """
+        if key is None:
+            return response
+        if response.status_code == httpx.codes.NOT_MODIFIED and (cached := self.read(key)):
+            metadata, content = cached
+            return httpx.Response(
+                status_code=metadata['status_code'],
+                headers=metadata['headers'],
+                content=content,
+                request=response.request,
+            )
+        if self.is_cacheable(response):
+            self.write(key, response, [response.content])
+        return response
+
+    @staticmethod
+    def is_cacheable(response: httpx.Response) -> bool:
+        return response.status_code == httpx.codes.OK and (
+            'etag' in response.headers or 'last-modified' in response.headers
+        )
+
+    def write(self, key: str, response: httpx.Response, chunks: Iterable[bytes]) -> None:
+        for _ in self.write_through(key, response, chunks):
+            pass
+
+    def tee(self, key: str | None, response: httpx.Response) -> Iterator[bytes]:
+        """
+        Yield the body of a streamed response, and cache it as it is received.
+        """
+        if key is None or not self.is_cacheable(response):
+            yield from response.iter_bytes()
+            return
+        yield from self.write_through(key, response, response.iter_bytes())
+
+    async def atee(self, key: str | None, response: httpx.Response) -> AsyncIterator[bytes]:
+        """Same as tee, for a response of an AsyncClient."""
+        if key is None or not self.is_cacheable(response):
+            async for chunk in response.aiter_bytes():
+                yield chunk
+            return
+        with CacheEntryWriter(cache=self, key=key, response=response) as writer:
+            async for chunk in response.aiter_bytes():
+                writer.write(chunk)
+                yield chunk
+
+    @staticmethod
+    def iter_body(cache_file: IO[bytes]) -> Iterator[bytes]:
+        """The body of an open cache entry, chunk by chunk, as it would have been from the response."""
+        return iter(functools.partial(cache_file.read, HTTP_CACHE_CHUNK_SIZE), b'')
+
+    @staticmethod
+    def get_encoding(metadata: dict) -> str | None:
+        return httpx.Response(status_code=metadata['status_code'], headers=metadata['headers']).encoding
+
+    def write_through(self, key: str, response: httpx.Response, chunks: Iterable[bytes]) -> Iterator[bytes]:
+        """
+        Yield the chunks of a body while they are written to the cache, see
+        CacheEntryWriter. The body is never held in memory.
+        """
+        with CacheEntryWriter(cache=self, key=key, response=response) as writer:
+            for chunk in chunks:
+                writer.write(chunk)
+                yield chunk
+
+    def evict(self) -> None:
+        cache_dir.evict(self.path, suffix='.cache', max_size=self.max_size)
+
+
+class CacheEntryWriter:
+    """
+    Write a response to a temporary file of the cache, which replaces the
+    cached response once the block completes, and is removed when it raises
+    (e.g. the body wasn't read completely). Failing to write to the cache is
+    logged and the rest of the body is then ignored, the request goes on.
+    """
+
+    def __init__(self, cache: HttpCache, key: str, response: httpx.Response):
+        self.cache = cache
+        self.key = key
+        self.response = response
+        self.stack = contextlib.ExitStack()
+        self.file: IO[bytes] | None = None
+
+    def __enter__(self) -> CacheEntryWriter:
+        metadata = {
+            'status_code': self.response.status_code,
+            'headers': {
+                name: self.response.headers[name] for name in HttpCache.KEPT_HEADERS if name in self.response.headers
+            },
+        }
+        try:
+            self.file = self.stack.enter_context(
+                tempfile.NamedTemporaryFile('wb', dir=self.cache.path, suffix='.tmp', delete=False)
+            )
+        except OSError:
+            log.warning('Cannot write to the HTTP cache.', exc_info=True)
+            return self
+        self.write(json.dumps(metadata).encode() + b'\n')
+        return self
+
+    def write(self, chunk: bytes) -> None:
+        if self.file is None:
+            return
+        try:
+            self.file.write(chunk)
+        except OSError:
+            log.warning('Cannot write to the HTTP cache.', exc_info=True)
+            self.discard()
+
+    def discard(self) -> None:
+        if self.file is None:
+            return
+        with contextlib.suppress(OSError):
+            self.stack.close()
+        with contextlib.suppress(OSError):
+            os.remove(self.file.name)
+        self.file = None
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if self.file is None:
+            return
+        if exc_type is not None:
+            self.discard()
+            return
+        try:
+            self.stack.close()
+            os.replace(self.file.name, self.cache.get_file(self.key))
+        except OSError:
+            log.warning('Cannot write to the HTTP cache.', exc_info=True)
+            self.discard()
+            return
+        self.cache.evict()
+
+
 class GitHub:
     """
     GitHub client.
     """
 
-    def __init__(self, session: httpx.Client):
+    def __init__(
+        self,
+        session: httpx.Client,
+        timeout: float | httpx.Timeout = TIMEOUT,
+        cache: HttpCache | None = None,
+        retry: RetryPolicy | None = None,
+    ):
         self.session = session
+        self.timeout = timeout
+        self.cache = cache
+        self.retry = retry
 
     def __getattr__(self, attr):
         return _Callable(self, f'/{attr}')
 
-    def _http(self, method: str, path: str, *, use_bytes: bool = False, use_text: bool = False, **kw):
+    def _http(  # pylint: disable=too-many-arguments
+        self,
+        method: str,
+        path: str,
+        *,
+        use_bytes: bool = False,
+        use_text: bool = False,
+        use_stream: bool = False,
+        use_pages: bool = False,
+        reverse_pages: bool = False,
+        **kw,
+    ):
         _method = method.lower()
-        requests_kwargs = {}
-        headers = kw.pop('headers', {})
-        if _method == 'get' and kw:
-            requests_kwargs = {'params': kw}
-
-        elif _method in ['post', 'patch', 'put']:
-            requests_kwargs = {'json': kw}
-
-        response = self.session.request(
-            _method.upper(),
-            path,
-            timeout=TIMEOUT,
-            headers=headers,
-            **requests_kwargs,
-        )
-        contents: str | bytes | JsonObject
-        if use_bytes:
-            contents = response.content
-        elif use_text:
-            contents = response.text
-        else:
-            contents = response_contents(response)
+        requests_kwargs = get_request_kwargs(_method, kw)
 
-        try:
-            response.raise_for_status()
-        except httpx.HTTPStatusError as exc:
-            cls: type[ApiError] = {
-                403: Forbidden,
-                404: NotFound,
-                409: Conflict,
-                422: ValidationFailed,
-            }.get(exc.response.status_code, ApiError)
+        if use_stream:
+            return self._stream(_method, path, **requests_kwargs)
 
-            raise cls(str(contents)) from exc
+        if use_pages:
+            return self._pages(path, reverse=reverse_pages, **requests_kwargs)
 
+        _, contents = self._request(_method, path, use_bytes=use_bytes, use_text=use_text, **requests_kwargs)
         return contents
 
+    def _request(
+        self,
+        method: str,
+        path: str,
+        *,
+        use_bytes: bool = False,
+        use_text: bool = False,
+        **kw,
+    ) -> tuple[httpx.Response, str | bytes | JsonObject]:
+        cache_key = self._prepare_cache(method, path, kw)
+        response = self._send(method, path, **kw)
+        if self.cache:
+            response = self.cache.resolve(cache_key, response)
+            if response.status_code == httpx.codes.NOT_MODIFIED:
+                # Not in the cache anymore, and a 304 has no body
+                response = self.cache.resolve(cache_key, self._send(method, path, **self.cache.without_validators(kw)))
+        return response, read_contents(response, use_bytes=use_bytes, use_text=use_text)
+
+    def _send(self, method: str, path: str, *, stream: contextlib.ExitStack | None = None, **kw) -> httpx.Response:
+        """
+        Send the request, again as long as the retry policy allows it. With
+        stream, the response is opened in it and only read on errors.
+        """
+        for attempt in itertools.count():
+            response: httpx.Response | None = None
+            start = time.perf_counter()
+            try:
+                if stream is None:
+                    response = self.session.request(method.upper(), path, timeout=self.timeout, **kw)
+                else:
+                    response = stream.enter_context(
+                        self.session.stream(method.upper(), path, timeout=self.timeout, **kw)
+                    )
+                    if response.is_error:
+                        response.read()
+            except httpx.TransportError:
+                timing.record_request(method, path, status=None, duration=time.perf_counter() - start)
+                if not self.retry or (delay := self.retry.get_delay(method, attempt)) is None:
+                    raise
+            else:
+                timing.record_request(method, path, status=response.status_code, duration=time.perf_counter() - start)
+                if not self.retry or (delay := self.retry.get_delay(method, attempt, response)) is None:
+                    return response
+                response.close()
+
+            self.retry.record(delay, response)
+            self.retry.sleep(delay)
+        raise AssertionError('unreachable')
+
+    def _prepare_cache(self, method: str, path: str, kw: dict) -> str | None:
+        if not self.cache:
+            return None
+        cache_key = self.cache.get_key(method, path, kw, getattr(self.session, 'headers', {}))
+        self.cache.prepare(cache_key, kw)
+        return cache_key
+
+    def _pages(self, path: str, *, reverse: bool = False, **kw) -> Iterator[list]:
+        """
+        Yield every page of a paginated listing, following the ``Link`` headers.
+        With reverse, the last page is fetched right after the first one and the
+        pages are then walked backwards, so the newest items of a chronological
+        listing come first. Pages are only requested as the iteration goes on.
+        """
+        response, first_page = self._get_page(path, **kw)
+        if not reverse:
+            yield first_page
+            while 'next' in response.links:
+                response, page = self._get_page(response.links['next']['url'], headers=kw.get('headers'))
+                yield page
+            return
+
+        if 'last' in response.links:
+            response, page = self._get_page(response.links['last']['url'], headers=kw.get('headers'))
+            yield page
+            # Stop before going back to the first page, which was already fetched
+            while (prev := response.links.get('prev')) and prev['url'] != response.links.get('first', {}).get('url'):
+                response, page = self._get_page(prev['url'], headers=kw.get('headers'))
+                yield page
+        yield first_page
+
+    def _get_page(self, path: str, **kw) -> tuple[httpx.Response, list]:
+        response, contents = self._request('get', path, **kw)
+        if not isinstance(contents, list):
+            raise ApiError(f'Expected a page of items from {path}, got {type(contents).__name__}')
+        return response, contents
+
+    def _stream(self, method: str, path: str, **kw) -> Iterator[str]:
+        """
+        Yield the decoded response body chunk by chunk, as it is received.
+        The request is only sent when the iteration starts.
+        """
+        cache_key = self._prepare_cache(method, path, kw)
+        with contextlib.ExitStack() as stream:
+            response = self._send(method, path, stream=stream, **kw)
+            entry = None
+            if self.cache and response.status_code == httpx.codes.NOT_MODIFIED:
+                entry = self.cache.open(cache_key) if cache_key is not None else None
+                if entry is None:
+                    # Not in the cache anymore, and a 304 has no body
+                    response = self._send(method, path, stream=stream, **self.cache.without_validators(kw))
+            if response.is_error:
+                raise_for_status(response=response, contents=response_contents(response))
+            if not self.cache:
+                yield from response.iter_text()
+                return
+            chunks: Iterable[bytes]
+            encoding = response.encoding
+            if entry is not None:
+                metadata, cache_file = entry
+                stream.enter_context(cache_file)
+                chunks = self.cache.iter_body(cache_file)
+                encoding = self.cache.get_encoding(metadata)
+            else:
+                chunks = self.cache.tee(cache_key, response)
+            decoder = codecs.getincrementaldecoder(encoding or 'utf-8')(errors='replace')
+            for chunk in chunks:
+                if text := decoder.decode(chunk):
+                    yield text
+            if text := decoder.decode(b'', final=True):
+                yield text
+
+
+class AsyncGitHub:
+    """
+    Asynchronous GitHub client, with the same attribute API as GitHub:
+    ``await gh.repos(repository).pulls(pr_number).get()``.
+    """
+
+    def __init__(
+        self,
+        session: httpx.AsyncClient,
+        timeout: float | httpx.Timeout = TIMEOUT,
+        cache: HttpCache | None = None,
+        retry: RetryPolicy | None = None,
+    ):
+        self.session = session
+        self.timeout = timeout
+        self.cache = cache
+        self.retry = retry
+
+    def __getattr__(self, attr):
+        return _Callable(self, f'/{attr}')
+
+    def _http(  # pylint: disable=too-many-arguments
+        self,
+        method: str,
+        path: str,
+        *,
+        use_bytes: bool = False,
+        use_text: bool = False,
+        use_stream: bool = False,
+        **kw,
+    ):
+        """
+        A coroutine of the contents of the response, or with use_stream an
+        async iterator of its decoded body, as in GitHub._stream.
+        """
+        _method = method.lower()
+        requests_kwargs = get_request_kwargs(_method, kw)
+        if use_stream:
+            return self._stream(_method, path, **requests_kwargs)
+        return self._request(_method, path, use_bytes=use_bytes, use_text=use_text, **requests_kwargs)
+
+    def _prepare_cache(self, method: str, path: str, kw: dict) -> str | None:
+        if not self.cache:
+            return None
+        cache_key = self.cache.get_key(method, path, kw, getattr(self.session, 'headers', {}))
+        self.cache.prepare(cache_key, kw)
+        return cache_key
+
+    async def _request(
+        self,
+        method: str,
+        path: str,
+        *,
+        use_bytes: bool = False,
+        use_text: bool = False,
+        **kw,
+    ) -> str | bytes | JsonObject:
+        cache_key = self._prepare_cache(method, path, kw)
+        response = await self._send(method, path, **kw)
+        if self.cache:
+            response = self.cache.resolve(cache_key, response)
+            if response.status_code == httpx.codes.NOT_MODIFIED:
+                # Not in the cache anymore, and a 304 has no body
+                response = await self._send(method, path, **self.cache.without_validators(kw))
+                response = self.cache.resolve(cache_key, response)
+        return read_contents(response, use_bytes=use_bytes, use_text=use_text)
+
+    async def _stream(self, method: str, path: str, **kw) -> AsyncIterator[str]:
+        cache_key = self._prepare_cache(method, path, kw)
+        async with contextlib.AsyncExitStack() as stream:
+            response = await self._send(method, path, stream=stream, **kw)
+            entry = None
+            if self.cache and response.status_code == httpx.codes.NOT_MODIFIED:
+                entry = self.cache.open(cache_key) if cache_key is not None else None
+                if entry is None:
+                    # Not in the cache anymore, and a 304 has no body
+                    response = await self._send(method, path, stream=stream, **self.cache.without_validators(kw))
+            if response.is_error:
+                raise_for_status(response=response, contents=response_contents(response))
+            if not self.cache:
+                async for text in response.aiter_text():
+                    yield text
+                return
+
+            decoder: codecs.IncrementalDecoder
+            if entry is not None:
+                metadata, cache_file = entry
+                stream.enter_context(cache_file)
+                decoder = codecs.getincrementaldecoder(self.cache.get_encoding(metadata) or 'utf-8')(errors='replace')
+                for chunk in self.cache.iter_body(cache_file):
+                    if text := decoder.decode(chunk):
+                        yield text
+            else:
+                decoder = codecs.getincrementaldecoder(response.encoding or 'utf-8')(errors='replace')
+                async for chunk in self.cache.atee(cache_key, response):
+                    if text := decoder.decode(chunk):
+                        yield text
+            if text := decoder.decode(b'', final=True):
+                yield text
+
+    async def _send(
+        self, method: str, path: str, *, stream: contextlib.AsyncExitStack | None = None, **kw
+    ) -> httpx.Response:
+        for attempt in itertools.count():
+            response: httpx.Response | None = None
+            start = time.perf_counter()
+            try:
+                if stream is None:
+                    response = await self.session.request(method.upper(), path, timeout=self.timeout, **kw)
+                else:
+                    response = await stream.enter_async_context(
+                        self.session.stream(method.upper(), path, timeout=self.timeout, **kw)
+                    )
+                    if response.is_error:
+                        await response.aread()
+            except httpx.TransportError:
+                timing.record_request(method, path, status=None, duration=time.perf_counter() - start)
+                if not self.retry or (delay := self.retry.get_delay(method, attempt)) is None:
+                    raise
+            else:
+                timing.record_request(method, path, status=response.status_code, duration=time.perf_counter() - start)
+                if not self.retry or (delay := self.retry.get_delay(method, attempt, response)) is None:
+                    return response
+                await response.aclose()
+
+            self.retry.record(delay, response)
+            await asyncio.sleep(delay)
+        raise AssertionError('unreachable')
+
+
+def raise_for_status(response: httpx.Response, contents: str | bytes | JsonObject) -> None:
+    try:
+        response.raise_for_status()
+    except httpx.HTTPStatusError as exc:
+        if is_rate_limited(exc.response):
+            raise RateLimited(str(contents)) from exc
+
+        cls: type[ApiError] = {
+            403: Forbidden,
+            404: NotFound,
+            409: Conflict,
+            422: ValidationFailed,
+        }.get(exc.response.status_code, ApiError)
+
+        raise cls(str(contents)) from exc
+
 
 def response_contents(
     response: httpx.Response,
@@ -122,5 +797,9 @@ class Conflict(ApiError):
     pass
 
 
+class RateLimited(ApiError):
+    pass
+
+
 class ValidationFailed(ApiError):
     pass
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+Read LCOV tracefiles (as written by Istanbul/nyc, c8, genhtml, ...), one line
+at a time:
+
+    SF:src/index.js
+    DA:1,4
+    DA:2,0
+    BRDA:1,0,0,3
+    BRDA:1,0,1,-
+    end_of_record
+"""
+from __future__ import annotations
+
+import dataclasses
+import datetime
+import pathlib
+from typing import TextIO
+
+from codecov import coverage as coverage_module, log
+
+
+class InvalidLcovReport(Exception):
+    pass
+
+
+def parse_hits(value: str) -> int:
+    # "-" means the block was never reached
+    return 0 if value == '-' else int(value)
+
+
+@dataclasses.dataclass
+class Record:
+    """Hits of a source file, the union of every record listing it."""
+
+    line_hits: dict[int, int] = dataclasses.field(default_factory=dict)
+    # Keyed by (line, block, branch)
+    branch_hits: dict[tuple[int, str, str], int] = dataclasses.field(default_factory=dict)
+
+    def add_line(self, value: str) -> None:
+        """DA:<line>,<hits>[,<checksum>]"""
+        line_number, hits = value.split(',')[:2]
+        line = int(line_number)
+        self.line_hits[line] = max(self.line_hits.get(line, 0), parse_hits(hits))
+
+    def add_branch(self, value: str) -> None:
+        """BRDA:<line>,<block>,<branch>,<taken>"""
+        line_number, block, branch, taken = value.split(',')
+        branch_key = (int(line_number), block, branch)
+        self.branch_hits[branch_key] = max(self.branch_hits.get(branch_key, 0), parse_hits(taken))
+
+    def get_file_coverage(self, path: pathlib.Path, branch_coverage: bool) -> coverage_module.FileCoverage:
+        branches_per_line: dict[int, tuple[int, int]] = {}
+        for (line, _, _), taken in self.branch_hits.items():
+            covered, total = branches_per_line.get(line, (0, 0))
+            branches_per_line[line] = (covered + bool(taken), total + 1)
+        return coverage_module.get_file_coverage_from_hits(
+            path=path, line_hits=self.line_hits, branch_hits=branches_per_line if branch_coverage else None
+        )
+
+
+def read_lcov(lcov_data: TextIO, root: pathlib.Path) -> tuple[dict[pathlib.Path, coverage_module.FileCoverage], bool]:
+    """
+    The files of the report, and whether it has branch coverage. A file listed
+    in several records (e.g. tracefiles concatenated by lcov -a) gets their union.
+    """
+    records: dict[pathlib.Path, Record] = {}
+    record: Record | None = None
+    has_branches = False
+
+    for number, raw_line in enumerate(lcov_data, start=1):
+        line = raw_line.strip()
+        key, _, value = line.partition(':')
+        try:
+            if key == 'SF':
+                record = records.setdefault(coverage_module.get_relative_path(value, root=root), Record())
+            elif key in ('DA', 'BRDA'):
+                if record is None:
+                    raise ValueError(f'{key} outside of a record')
+                if key == 'DA':
+                    record.add_line(value)
+                else:
+                    has_branches = True
+                    record.add_branch(value)
+            elif line == 'end_of_record':
+                record = None
+        except ValueError as exc:
+            raise InvalidLcovReport(f'Invalid line {number}: {line!r}') from exc
+
+    files = {
+        path: file_record.get_file_coverage(path=path, branch_coverage=has_branches)
+        for path, file_record in records.items()
+    }
+    return files, has_branches
+
+
+def get_coverage_info(coverage_path: pathlib.Path, root: pathlib.Path | None = None) -> coverage_module.Coverage:
+    root = (root or pathlib.Path.cwd()).resolve()
+    try:
+        with coverage_path.open() as lcov_data:
+            files, has_branches = read_lcov(lcov_data=lcov_data, root=root)
+    except InvalidLcovReport:
+        log.error('Invalid LCOV coverage report file: %s', coverage_path)
+        raise
+
+    return coverage_module.Coverage(
+        meta=coverage_module.CoverageMetadata(
+            version='',
+            timestamp=datetime.datetime.fromtimestamp(coverage_path.stat().st_mtime),
+            branch_coverage=has_branches,
+            show_contexts=False,
+        ),
+        files=files,
+        info=coverage_module.get_total_summary(files=files.values(), branch_coverage=has_branches),
+    )
@@ -1,16 +1,34 @@
 # -*- coding: utf-8 -*-
+import asyncio
+import concurrent.futures
+import dataclasses
 import json
 import os
+import pathlib
 import sys
+from collections.abc import Awaitable, Collection
 
 import httpx
 
-from codecov import coverage as coverage_module, diff_grouper, github, github_client, log, settings, template
+from codecov import (
+    coverage as coverage_module,
+    coverage_cache,
+    diff_grouper,
+    github,
+    github_client,
+    log,
+    merge,
+    readers,
+    settings,
+    template,
+    timing,
+)
 
 
 def main():
     try:
-        config = settings.Config.from_environ(environ=os.environ)
+        with timing.phase('config parse'):
+            config = settings.Config.from_environ(environ=os.environ)
         log.setup(debug=config.DEBUG)
 
         if config.SKIP_COVERAGE and not config.ANNOTATE_MISSING_LINES:
@@ -18,16 +36,26 @@ def main():
             sys.exit(0)
 
         log.info('Starting...')
-        github_session = httpx.Client(
-            base_url=github_client.BASE_URL,
-            follow_redirects=True,
-            headers={'Authorization': f'token {config.GITHUB_TOKEN}'},
+        github_session = github_client.create_session(
+            token=config.GITHUB_TOKEN,
+            max_connections=config.HTTP_MAX_CONNECTIONS,
+            keepalive_expiry=config.HTTP_KEEPALIVE_EXPIRY,
+            http2=config.HTTP2,
+            compression=config.HTTP_COMPRESSION,
         )
 
-        exit_code = action(config=config, github_session=github_session)
+        with github_session:
+            exit_code = action(config=config, github_session=github_session)
+        write_timing_reports(config=config)
         log.info('Ending...')
         sys.exit(exit_code)
 
+    except github_client.RateLimited:
+        log.error(
+            'The GitHub API rate limit was exceeded and retrying did not help. Please try again later.', exc_info=True
+        )
+        sys.exit(1)
+
     except Exception:  # pylint: disable=broad-except
         log.error(
             'Critical error. This error possibly occurred because the permissions of the workflow are set incorrectly.'
@@ -37,49 +65,365 @@ def main():
 
 def action(config: settings.Config, github_session: httpx.Client) -> int:
     log.debug('Fetching Pull Request')
-    gh = github_client.GitHub(session=github_session)
+    retry = github_client.RetryPolicy(max_retries=config.HTTP_MAX_RETRIES, max_wait=config.HTTP_MAX_RETRY_WAIT)
+    gh = github_client.GitHub(
+        session=github_session,
+        timeout=get_timeout(config=config),
+        cache=get_cache(config=config),
+        retry=retry,
+    )
     try:
-        pr_number = github.get_pr_number(github=gh, config=config)
-    except github.CannotGetPullRequest:
-        log.error('Cannot get pull request number. Exiting.', exc_info=True)
-        log.error(
-            'This worflow is not triggered on a pull_request event, '
-            "nor on a push event on a branch. Consequently, there's nothing to do. "
-            'Exiting.'
+        try:
+            pr_number = github.get_pr_number(github=gh, config=config)
+        except github.CannotGetPullRequest:
+            log.error('Cannot get pull request number. Exiting.', exc_info=True)
+            log.error(
+                'This worflow is not triggered on a pull_request event, '
+                "nor on a push event on a branch. Consequently, there's nothing to do. "
+                'Exiting.'
+            )
+            return 1
+
+        log.debug(f'Operating on Pull Request {pr_number}')
+        if config.SUBPROJECTS:
+            return process_subprojects(config=config, gh=gh, pr_number=pr_number)
+        if config.ASYNC_PIPELINE:
+            return asyncio.run(process_pr_async(config=config, gh=gh, pr_number=pr_number))
+
+        return process_pr(
+            config=config,
+            gh=gh,
+            pr_number=pr_number,
         )
-        return 1
+    finally:
+        if retry.stats.retries:
+            log.info(
+                f'Retried {retry.stats.retries} GitHub API requests ({retry.stats.rate_limited} rate limited), '
+                f'waiting {retry.stats.waited:.1f}s in total.'
+            )
 
-    log.debug(f'Operating on Pull Request {pr_number}')
-    return process_pr(
-        config=config,
-        gh=gh,
-        pr_number=pr_number,
+
+def get_timeout(config: settings.Config) -> httpx.Timeout:
+    return httpx.Timeout(config.HTTP_READ_TIMEOUT, connect=config.HTTP_CONNECT_TIMEOUT)
+
+
+def get_cache(config: settings.Config) -> github_client.HttpCache | None:
+    if not config.HTTP_CACHE_DIR:
+        return None
+    return github_client.HttpCache(path=config.HTTP_CACHE_DIR, max_size=config.HTTP_CACHE_MAX_SIZE_MB * 1024 * 1024)
+
+
+def get_coverage_cache(config: settings.Config) -> coverage_cache.CoverageCache | None:
+    if not config.COVERAGE_CACHE_DIR:
+        return None
+    return coverage_cache.CoverageCache(
+        path=config.COVERAGE_CACHE_DIR, max_size=config.COVERAGE_CACHE_MAX_SIZE_MB * 1024 * 1024
     )
 
 
-def process_pr(  # pylint: disable=too-many-locals
+def get_template_cache_dir(config: settings.Config) -> pathlib.Path | None:
+    # The compiled templates are few and small, they are kept next to the coverage reports
+    if not config.COVERAGE_CACHE_DIR:
+        return None
+    return config.COVERAGE_CACHE_DIR / 'templates'
+
+
+def write_timing_reports(config: settings.Config) -> None:
+    log.debug('Timings: %s', timing.timer.get_phase_totals())
+    if config.TIMING_REPORT_PATH:
+        timing.write_report(path=config.TIMING_REPORT_PATH)
+    if config.TIMING_STEP_SUMMARY and config.GITHUB_STEP_SUMMARY:
+        timing.write_step_summary(path=config.GITHUB_STEP_SUMMARY)
+
+
+def get_coverage_paths(config: settings.Config, added_lines: dict[pathlib.Path, list[int]]) -> set[pathlib.Path] | None:
+    """
+    The files of the coverage report that are needed: those of the diff, unless
+    the comment reports on the complete project.
+    """
+    if config.COMPLETE_PROJECT_REPORT:
+        return None
+    return set(added_lines)
+
+
+def load_coverage(config: settings.Config, paths: Collection[pathlib.Path] | None = None) -> coverage_module.Coverage:
+    """
+    The coverage of the report(s). With paths, the readers that can (see
+    readers.Reader.filters_paths) only load those files.
+    """
+    cache = get_coverage_cache(config=config)
+    with timing.phase('coverage load'):
+        if config.COVERAGE_PATHS:
+            coverage = merge.get_merged_coverage_info(
+                coverage_paths=[config.COVERAGE_PATH, *config.COVERAGE_PATHS],
+                loader=config.COVERAGE_LOADER,
+                max_workers=config.COVERAGE_MERGE_WORKERS,
+                cache=cache,
+                paths=paths,
+            )
+        else:
+            coverage = readers.read_report(
+                coverage_path=config.COVERAGE_PATH, loader=config.COVERAGE_LOADER, cache=cache, paths=paths
+            )
+    if config.BRANCH_COVERAGE:
+        with timing.phase('grouping'):
+            coverage = diff_grouper.group_branches(coverage=coverage)
+    return coverage
+
+
+def process_pr(
     config: settings.Config,
     gh: github_client.GitHub,
     pr_number: int,
 ) -> int:
-    coverage = coverage_module.get_coverage_info(coverage_path=config.COVERAGE_PATH)
-    if config.BRANCH_COVERAGE:
-        coverage = diff_grouper.group_branches(coverage=coverage)
-    pr_diff = github.get_pr_diff(github=gh, repository=config.GITHUB_REPOSITORY, pr_number=pr_number)
-    added_lines = coverage_module.parse_diff_output(diff=pr_diff)
-    diff_coverage = coverage_module.get_diff_coverage_info(added_lines=added_lines, coverage=coverage)
+    pr_diff = github.stream_pr_diff(github=gh, repository=config.GITHUB_REPOSITORY, pr_number=pr_number)
+    # The diff is parsed while it is downloaded
+    with timing.phase('diff parse', exclude=['diff fetch']):
+        added_lines = coverage_module.parse_diff_chunks(chunks=timing.iterate('diff fetch', pr_diff))
+    coverage = load_coverage(config=config, paths=get_coverage_paths(config=config, added_lines=added_lines))
+    with timing.phase('diff coverage'):
+        diff_coverage = coverage_module.get_diff_coverage_info(added_lines=added_lines, coverage=coverage)
 
     user: github.User = github.get_my_login(github=gh)
+    return report_pr(
+        config=config, gh=gh, pr_number=pr_number, user=user, coverage=coverage, diff_coverage=diff_coverage
+    )
+
+
+async def process_pr_async(
+    config: settings.Config,
+    gh: github_client.GitHub,
+    pr_number: int,
+) -> int:
+    """
+    Same as process_pr, but the coverage report is parsed in a thread while the
+    PR diff and the user are fetched concurrently, so the time until the report
+    can be posted is that of the slowest of the three instead of their sum.
+    """
+    async with github_client.create_async_session(
+        token=config.GITHUB_TOKEN,
+        max_connections=config.HTTP_MAX_CONNECTIONS,
+        keepalive_expiry=config.HTTP_KEEPALIVE_EXPIRY,
+        http2=config.HTTP2,
+        compression=config.HTTP_COMPRESSION,
+    ) as session:
+        async_gh = github_client.AsyncGitHub(
+            session=session, timeout=get_timeout(config=config), cache=gh.cache, retry=gh.retry
+        )
+        added_lines_task = asyncio.create_task(get_added_lines_async(config=config, gh=async_gh, pr_number=pr_number))
+        coverage, added_lines, user = await asyncio.gather(
+            load_coverage_async(config=config, added_lines=added_lines_task),
+            added_lines_task,
+            github.get_my_login_async(github=async_gh),
+        )
+
+    with timing.phase('diff coverage'):
+        diff_coverage = coverage_module.get_diff_coverage_info(added_lines=added_lines, coverage=coverage)
+    return report_pr(
+        config=config, gh=gh, pr_number=pr_number, user=user, coverage=coverage, diff_coverage=diff_coverage
+    )
+
+
+async def load_coverage_async(
+    config: settings.Config, added_lines: Awaitable[dict[pathlib.Path, list[int]]]
+) -> coverage_module.Coverage:
+    """
+    load_coverage in a thread. Only when a reader loads the files of the diff
+    faster than all of them does it wait for the diff first.
+    """
+    paths = None
+    if not config.COMPLETE_PROJECT_REPORT and readers.filters_paths([config.COVERAGE_PATH, *config.COVERAGE_PATHS]):
+        paths = get_coverage_paths(config=config, added_lines=await added_lines)
+    return await asyncio.to_thread(load_coverage, config=config, paths=paths)
+
+
+async def get_added_lines_async(
+    config: settings.Config,
+    gh: github_client.AsyncGitHub,
+    pr_number: int,
+) -> dict[pathlib.Path, list[int]]:
+    pr_diff = github.stream_pr_diff_async(github=gh, repository=config.GITHUB_REPOSITORY, pr_number=pr_number)
+    parser = coverage_module.DiffParser()
+    added_lines: dict[pathlib.Path, list[int]] = {}
+    with timing.phase('diff parse', exclude=['diff fetch']):
+        async for chunk in timing.aiterate('diff fetch', pr_diff):
+            for path, lines in parser.feed(chunk):
+                added_lines.setdefault(path, []).extend(lines)
+        for path, lines in parser.close():
+            added_lines.setdefault(path, []).extend(lines)
+    return added_lines
+
+
+@dataclasses.dataclass
+class SubprojectReport:
+    config: settings.Config
+    annotations: list[github.Annotation]
+    # None when the comment is skipped, or can't be rendered
+    comment: str | None
+
+
+def process_subprojects(
+    config: settings.Config,
+    gh: github_client.GitHub,
+    pr_number: int,
+) -> int:
+    """
+    Report on all the SUBPROJECTS in one run: the PR diff, the user and the
+    comments of the PR are fetched once for all of them, and their reports are
+    computed in parallel before their comments are posted.
+    """
+    pr_diff = github.stream_pr_diff(github=gh, repository=config.GITHUB_REPOSITORY, pr_number=pr_number)
+    with timing.phase('diff parse', exclude=['diff fetch']):
+        added_lines = coverage_module.parse_diff_chunks(chunks=timing.iterate('diff fetch', pr_diff))
+    user: github.User = github.get_my_login(github=gh)
+
+    # The phases of the subprojects are only recorded when they run in this process
+    with timing.phase('subprojects', exclude=['coverage load', 'grouping', 'diff coverage', 'render']):
+        reports = get_subproject_reports(
+            configs=config.get_subproject_configs(),
+            pr_number=pr_number,
+            added_lines=added_lines,
+            max_workers=config.SUBPROJECT_WORKERS,
+        )
+
+    if config.ANNOTATE_MISSING_LINES:
+        log.info('Generating annotations for missing lines.')
+        try:
+            with timing.phase('annotations'):
+                # Written at once, the annotations of a PR being saved in a single file
+                write_annotations(
+                    config=config,
+                    user=user,
+                    pr_number=pr_number,
+                    gh=gh,
+                    formatted_annotations=[annotation for report in reports for annotation in report.annotations],
+                )
+        except github.CannotGetBranch:
+            log_cannot_get_branch()
+            return 1
+
+    if config.SKIP_COVERAGE:
+        log.info('Skipping coverage report generation')
+        return 0
+
+    with timing.phase('post'):
+        return post_subproject_comments(config=config, gh=gh, user=user, pr_number=pr_number, reports=reports)
+
+
+def get_subproject_reports(
+    configs: list[settings.Config],
+    pr_number: int,
+    added_lines: dict[pathlib.Path, list[int]],
+    max_workers: int | None = None,
+) -> list[SubprojectReport]:
+    """
+    Compute the reports of the subprojects, in a process pool when there are
+    several CPUs: loading the coverage reports and rendering the comments is
+    CPU bound, and only the small SubprojectReport is sent back.
+    """
+    max_workers = min(max_workers or os.cpu_count() or 1, len(configs))
+    if max_workers <= 1:
+        return [
+            get_subproject_report(config=config, pr_number=pr_number, added_lines=added_lines) for config in configs
+        ]
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as executor:
+        return list(
+            executor.map(get_subproject_report, configs, [pr_number] * len(configs), [added_lines] * len(configs))
+        )
+
+
+def get_subproject_report(
+    config: settings.Config, pr_number: int, added_lines: dict[pathlib.Path, list[int]]
+) -> SubprojectReport:
+    coverage = load_coverage(config=config, paths=get_coverage_paths(config=config, added_lines=added_lines))
+    with timing.phase('diff coverage'):
+        diff_coverage = coverage_module.get_diff_coverage_info(added_lines=added_lines, coverage=coverage)
+    group_missing_lines(config=config, coverage=coverage, diff_coverage=diff_coverage)
+
+    annotations = []
+    if config.ANNOTATE_MISSING_LINES:
+        annotations = get_annotations(config=config, coverage=coverage, diff_coverage=diff_coverage)
+    comment = None
+    if not config.SKIP_COVERAGE:
+        log.info(f'Generating comment for subproject {config.SUBPROJECT_ID}')
+        with timing.phase('render'):
+            comment = render_comment(
+                config=config,
+                pr_number=pr_number,
+                coverage=coverage,
+                diff_coverage=diff_coverage,
+                marker=template.get_marker(marker_id=config.SUBPROJECT_ID),
+            )
+    return SubprojectReport(config=config, annotations=annotations, comment=comment)
+
+
+def post_subproject_comments(
+    config: settings.Config,
+    gh: github_client.GitHub,
+    user: github.User,
+    pr_number: int,
+    reports: list[SubprojectReport],
+) -> int:
+    """
+    Post the comments of the subprojects. The comments whose id isn't cached in
+    the annotations data branch are all looked up in a single pass over the
+    comments of the PR.
+    """
+    # The comments that couldn't be rendered have been logged already
+    exit_code = int(any(report.comment is None for report in reports))
+    comments = {report.config.SUBPROJECT_ID: report.comment for report in reports if report.comment is not None}
+    configs = {report.config.SUBPROJECT_ID: report.config for report in reports}
+    cached_comment_ids = {
+        id_: github.get_cached_comment_id(github=gh, pr_number=pr_number, config=configs[id_]) for id_ in comments
+    }
+    markers = {id_: template.get_marker(marker_id=id_) for id_ in comments}
     try:
-        generate_annotations(
-            config=config, user=user, pr_number=pr_number, gh=gh, coverage=coverage, diff_coverage=diff_coverage
+        found_comment_ids = github.find_comments(
+            github=gh,
+            user=user,
+            repository=config.GITHUB_REPOSITORY,
+            pr_number=pr_number,
+            markers=[markers[id_] for id_, comment_id in cached_comment_ids.items() if comment_id is None],
         )
-    except github.CannotGetBranch:
-        log.error(
-            'Cannot retrieve the annotation data branch.'
-            'Please ensure it exists and that you have sufficient permissions and branch protection is disabled. Exiting.',
-            exc_info=True,
+    except github_client.ApiError:
+        log.error('Cannot list the comments of the PR.', exc_info=True)
+        return 1
+
+    for id_, comment in comments.items():
+        cached_comment_id = cached_comment_ids[id_]
+        exit_code |= publish_comment(
+            config=configs[id_],
+            gh=gh,
+            user=user,
+            pr_number=pr_number,
+            comment=comment,
+            marker=markers[id_],
+            cached_comment_id=cached_comment_id,
+            comment_id=found_comment_ids.get(markers[id_]),
+            # A cached id may be stale, the others have just been looked up
+            search_comments=cached_comment_id is not None,
         )
+    return exit_code
+
+
+def report_pr(  # pylint: disable=too-many-arguments
+    config: settings.Config,
+    gh: github_client.GitHub,
+    pr_number: int,
+    user: github.User,
+    coverage: coverage_module.Coverage,
+    diff_coverage: coverage_module.DiffCoverage,
+) -> int:
+    group_missing_lines(config=config, coverage=coverage, diff_coverage=diff_coverage)
+
+    try:
+        with timing.phase('annotations'):
+            generate_annotations(
+                config=config, user=user, pr_number=pr_number, gh=gh, coverage=coverage, diff_coverage=diff_coverage
+            )
+    except github.CannotGetBranch:
+        log_cannot_get_branch()
         return 1
 
     if config.SKIP_COVERAGE:
@@ -88,25 +432,58 @@ def process_pr(  # pylint: disable=too-many-locals
 
     log.info('Generating comment for PR')
     marker = template.get_marker(marker_id=config.SUBPROJECT_ID)
-    files_info, count_files, changed_files_info = template.select_changed_files(
-        coverage=coverage,
-        diff_coverage=diff_coverage,
-        max_files=config.MAX_FILES_IN_COMMENT,
-    )
-    coverage_files_info, count_coverage_files = template.select_files(
-        coverage=coverage,
-        changed_files_info=changed_files_info,
-        max_files=config.MAX_FILES_IN_COMMENT - count_files,  # Truncate the report to MAX_FILES_IN_COMMENT
+    with timing.phase('render'):
+        comment = render_comment(
+            config=config, pr_number=pr_number, coverage=coverage, diff_coverage=diff_coverage, marker=marker
+        )
+    if comment is None:
+        return 1
+
+    with timing.phase('post'):
+        cached_comment_id = github.get_cached_comment_id(github=gh, pr_number=pr_number, config=config)
+        return publish_comment(
+            config=config,
+            gh=gh,
+            user=user,
+            pr_number=pr_number,
+            comment=comment,
+            marker=marker,
+            cached_comment_id=cached_comment_id,
+        )
+
+
+def group_missing_lines(
+    config: settings.Config, coverage: coverage_module.Coverage, diff_coverage: coverage_module.DiffCoverage
+) -> None:
+    with timing.phase('grouping'):
+        # The groups are cached on the coverage object, for the annotations and the comment
+        list(diff_grouper.get_diff_missing_groups(coverage=coverage, diff_coverage=diff_coverage))
+        if not config.SKIP_COVERAGE and config.COMPLETE_PROJECT_REPORT:
+            list(diff_grouper.get_missing_groups(coverage=coverage))
+
+
+def log_cannot_get_branch() -> None:
+    log.error(
+        'Cannot retrieve the annotation data branch.'
+        'Please ensure it exists and that you have sufficient permissions and branch protection is disabled. Exiting.',
+        exc_info=True,
     )
+
+
+def render_comment(
+    config: settings.Config,
+    pr_number: int,
+    coverage: coverage_module.Coverage,
+    diff_coverage: coverage_module.DiffCoverage,
+    marker: str,
+) -> str | None:
+    """The markdown of the comment, or None when it can't be rendered."""
     try:
-        comment = template.get_comment_markdown(
+        return template.get_comment_markdown_within_budget(
             coverage=coverage,
             diff_coverage=diff_coverage,
-            files=files_info,
-            count_files=count_files,
-            coverage_files=coverage_files_info,
-            count_coverage_files=count_coverage_files,
             max_files=config.MAX_FILES_IN_COMMENT,
+            max_length=github.MAX_COMMENT_LENGTH,
             minimum_green=config.MINIMUM_GREEN,
             minimum_orange=config.MINIMUM_ORANGE,
             repo_name=config.GITHUB_REPOSITORY,
@@ -118,6 +495,7 @@ def process_pr(  # pylint: disable=too-many-locals
             branch_coverage=config.BRANCH_COVERAGE,
             complete_project_report=config.COMPLETE_PROJECT_REPORT,
             coverage_report_url=config.COVERAGE_REPORT_URL,
+            template_cache_dir=get_template_cache_dir(config=config),
         )
     except template.MissingMarker:
         log.error(
@@ -127,23 +505,41 @@ def process_pr(  # pylint: disable=too-many-locals
             "its own comment and avoid making new comments or overwriting someone else's "
             'comment.'
         )
-        return 1
     except template.TemplateError:
         log.error(
             'There was a rendering error when computing the text of the comment to post '
             "on the PR. Please see the traceback, in particular if you're using a custom "
             'template.'
         )
-        return 1
+    return None
+
 
+def publish_comment(  # pylint: disable=too-many-arguments
+    config: settings.Config,
+    gh: github_client.GitHub,
+    user: github.User,
+    pr_number: int,
+    comment: str,
+    marker: str,
+    cached_comment_id: int | None,
+    comment_id: int | None = None,
+    search_comments: bool = True,
+) -> int:
+    """
+    Post the comment, or update ours, and save its id in the annotations data
+    branch when it isn't the cached one. comment_id and search_comments are
+    for comments already looked up on the PR (see github.post_comment).
+    """
     try:
-        github.post_comment(
+        posted_comment_id = github.post_comment(
             github=gh,
             user=user,
             repository=config.GITHUB_REPOSITORY,
             pr_number=pr_number,
             contents=comment,
             marker=marker,
+            comment_id=cached_comment_id if comment_id is None else comment_id,
+            search_comments=search_comments,
         )
     except github.CannotPostComment:
         log.debug('Exception when posting comment', exc_info=True)
@@ -152,17 +548,23 @@ def process_pr(  # pylint: disable=too-many-locals
         )
         return 1
 
+    if posted_comment_id != cached_comment_id:
+        github.write_cached_comment_id(
+            github=gh,
+            user=user,
+            pr_number=pr_number,
+            config=config,
+            comment_id=posted_comment_id,
+            cached=cached_comment_id is not None,
+        )
+
     log.debug('Comment created on PR')
     return 0
 
 
-def generate_annotations(  # pylint: disable=too-many-arguments
-    config: settings.Config, user: github.User, pr_number: int, gh: github_client.GitHub, coverage, diff_coverage
-):
-    if not config.ANNOTATE_MISSING_LINES:
-        return
-
-    log.info('Generating annotations for missing lines.')
+def get_annotations(
+    config: settings.Config, coverage: coverage_module.Coverage, diff_coverage: coverage_module.DiffCoverage
+) -> list[github.Annotation]:
     annotations = diff_grouper.get_diff_missing_groups(coverage=coverage, diff_coverage=diff_coverage)
     formatted_annotations = github.create_missing_coverage_annotations(
         annotation_type=config.ANNOTATION_TYPE,
@@ -178,7 +580,32 @@ def generate_annotations(  # pylint: disable=too-many-arguments
                 branch=True,
             )
         )
+    return formatted_annotations
+
+
+def generate_annotations(  # pylint: disable=too-many-arguments
+    config: settings.Config, user: github.User, pr_number: int, gh: github_client.GitHub, coverage, diff_coverage
+):
+    if not config.ANNOTATE_MISSING_LINES:
+        return
 
+    log.info('Generating annotations for missing lines.')
+    write_annotations(
+        config=config,
+        user=user,
+        pr_number=pr_number,
+        gh=gh,
+        formatted_annotations=get_annotations(config=config, coverage=coverage, diff_coverage=diff_coverage),
+    )
+
+
+def write_annotations(
+    config: settings.Config,
+    user: github.User,
+    pr_number: int,
+    gh: github_client.GitHub,
+    formatted_annotations: list[github.Annotation],
+) -> None:
     if not formatted_annotations:
         log.info('No annotations to generate. Exiting.')
         return
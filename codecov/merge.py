@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+"""
+Merge the coverage reports of sharded test runs into one Coverage, instead of
+running `coverage combine` before the action.
+"""
+from __future__ import annotations
+
+import concurrent.futures
+import os
+import pathlib
+from collections.abc import Collection, Iterable
+
+from codecov import coverage as coverage_module, coverage_cache, readers
+
+# Batches of files merged by each worker, so that they finish at about the same time
+MERGE_BATCHES_PER_WORKER = 4
+
+
+def merge_branches(
+    executed: Iterable[list[list[int]] | None], missing: Iterable[list[list[int]] | None]
+) -> tuple[list[list[int]], list[list[int]]]:
+    executed_set = {(start, end) for branches in executed for start, end in branches or []}
+    missing_set = {(start, end) for branches in missing for start, end in branches or []} - executed_set
+    return [list(branch) for branch in sorted(executed_set)], [list(branch) for branch in sorted(missing_set)]
+
+
+def merge_files(file_coverages: list[coverage_module.FileCoverage]) -> coverage_module.FileCoverage:
+    """
+    Union of the coverage of one file in several reports: a line or a branch is
+    executed when it was in any report, missing when it was in none.
+    """
+    if len(file_coverages) == 1:
+        return file_coverages[0]
+
+    executed = set().union(*(file.executed_lines for file in file_coverages))
+    missing = set().union(*(file.missing_lines for file in file_coverages)) - executed
+    excluded = set().union(*(file.excluded_lines for file in file_coverages))
+
+    executed_branches = missing_branches = None
+    branches = None
+    if any(file.executed_branches is not None or file.missing_branches is not None for file in file_coverages):
+        executed_branches, missing_branches = merge_branches(
+            executed=(file.executed_branches for file in file_coverages),
+            missing=(file.missing_branches for file in file_coverages),
+        )
+        executed_starts = {start for start, _ in executed_branches}
+        branches = (
+            len(executed_branches) + len(missing_branches),
+            len({start for start, _ in missing_branches if start in executed_starts}),
+            len(missing_branches),
+        )
+
+    return coverage_module.FileCoverage(
+        path=file_coverages[0].path,
+        executed_lines=coverage_module.Lines(sorted(executed)),
+        missing_lines=coverage_module.Lines(sorted(missing)),
+        excluded_lines=coverage_module.Lines(sorted(excluded)),
+        executed_branches=executed_branches,
+        missing_branches=missing_branches,
+        info=coverage_module.get_summary(
+            num_statements=len(executed) + len(missing),
+            num_missing=len(missing),
+            num_excluded=len(excluded),
+            branches=branches,
+        ),
+    )
+
+
+def merge_coverages(
+    coverages: Iterable[coverage_module.Coverage],
+    executor: concurrent.futures.Executor | None = None,
+    max_workers: int = 1,
+) -> coverage_module.Coverage:
+    """
+    Merge the reports file by file. With an executor of max_workers, the files
+    that are in several reports are merged in parallel, in batches.
+    """
+    coverages = list(coverages)
+    if len(coverages) == 1:
+        return coverages[0]
+
+    files_by_path: dict[pathlib.Path, list[coverage_module.FileCoverage]] = {}
+    for coverage in coverages:
+        for path, file_coverage in coverage.files.items():
+            files_by_path.setdefault(path, []).append(file_coverage)
+    files = {path: file_coverages[0] for path, file_coverages in files_by_path.items() if len(file_coverages) == 1}
+    to_merge = {path: file_coverages for path, file_coverages in files_by_path.items() if len(file_coverages) > 1}
+    if executor is None:
+        files.update((path, merge_files(file_coverages)) for path, file_coverages in to_merge.items())
+    else:
+        chunksize = max(1, len(to_merge) // (MERGE_BATCHES_PER_WORKER * max_workers))
+        files.update(zip(to_merge, executor.map(merge_files, to_merge.values(), chunksize=chunksize)))
+    # In the order of the reports
+    files = {path: files[path] for path in files_by_path}
+
+    branch_coverage = any(coverage.meta.branch_coverage for coverage in coverages)
+    return coverage_module.Coverage(
+        meta=coverage_module.CoverageMetadata(
+            version=coverages[0].meta.version,
+            timestamp=max(coverage.meta.timestamp for coverage in coverages),
+            branch_coverage=branch_coverage,
+            show_contexts=any(coverage.meta.show_contexts for coverage in coverages),
+        ),
+        files=files,
+        info=coverage_module.get_total_summary(files=files.values(), branch_coverage=branch_coverage),
+    )
+
+
+def load_and_merge(
+    coverage_paths: list[pathlib.Path],
+    loader: str = 'json',
+    cache: coverage_cache.CoverageCache | None = None,
+    paths: Collection[pathlib.Path] | None = None,
+) -> coverage_module.Coverage:
+    return merge_coverages(
+        readers.read_report(coverage_path=path, loader=loader, cache=cache, paths=paths) for path in coverage_paths
+    )
+
+
+def load_and_merge_share(
+    coverage_paths: list[pathlib.Path],
+    loader: str = 'json',
+    cache: coverage_cache.CoverageCache | None = None,
+    paths: Collection[pathlib.Path] | None = None,
+) -> coverage_module.Coverage:
+    coverage = load_and_merge(coverage_paths=coverage_paths, loader=loader, cache=cache, paths=paths)
+    # Sent back to the parent process: the lazily loaded files can't be pickled
+    coverage.files = dict(coverage.files)
+    return coverage
+
+
+def get_merged_coverage_info(
+    coverage_paths: list[pathlib.Path],
+    loader: str = 'json',
+    max_workers: int | None = None,
+    cache: coverage_cache.CoverageCache | None = None,
+    paths: Collection[pathlib.Path] | None = None,
+) -> coverage_module.Coverage:
+    """
+    Load and merge the reports in a process pool. Every worker loads a share of
+    the reports and merges them, so only one partial Coverage per worker (with
+    compact Lines) is sent back. The files that are in several partials are
+    then merged in parallel too, file by file, so that a few big reports still
+    use every worker.
+    """
+    coverage_paths = list(dict.fromkeys(coverage_paths))
+    max_workers = max_workers or os.cpu_count() or 1
+    if max_workers <= 1 or len(coverage_paths) <= 1:
+        return load_and_merge(coverage_paths=coverage_paths, loader=loader, cache=cache, paths=paths)
+
+    num_shares = min(max_workers, len(coverage_paths))
+    shares = [coverage_paths[index::num_shares] for index in range(num_shares)]
+    with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as executor:
+        partials = list(
+            executor.map(
+                load_and_merge_share, shares, [loader] * len(shares), [cache] * len(shares), [paths] * len(shares)
+            )
+        )
+        return merge_coverages(partials, executor=executor, max_workers=max_workers)
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""
+Registry of the readers of coverage reports. The reader of a report is chosen
+by the extension of its file, else by sniffing its first bytes, and every
+reader builds the same Coverage model.
+"""
+from __future__ import annotations
+
+import dataclasses
+import pathlib
+from collections.abc import Callable, Collection, Iterable
+
+from codecov import cobertura, coverage as coverage_module, coverage_cache, coverage_database, lcov, log
+
+# Number of bytes read from a report to guess its format
+SNIFF_SIZE = 1024
+
+
+class UnknownReportFormat(Exception):
+    pass
+
+
+@dataclasses.dataclass
+class Reader:
+    name: str
+    # Called with the path of the report, the COVERAGE_LOADER setting, which only matters for JSON,
+    # and the paths of the files that are needed, or None for all of them
+    read: Callable[[pathlib.Path, str, Collection[pathlib.Path] | None], coverage_module.Coverage]
+    # Whether the first bytes of a report are of this format
+    sniff: Callable[[bytes], bool]
+    extensions: tuple[str, ...] = ()
+    # Whether the Coverage only depends on the content of the report, and can be cached
+    cacheable: bool = True
+    # Whether read only loads the files in the paths it is given, and is faster for it
+    filters_paths: bool = False
+
+
+READERS: dict[str, Reader] = {}
+
+
+def register_reader(reader: Reader) -> None:
+    READERS[reader.name] = reader
+
+
+def get_reader(coverage_path: pathlib.Path) -> Reader:
+    for reader in READERS.values():
+        if coverage_path.suffix.lower() in reader.extensions:
+            return reader
+
+    with coverage_path.open('rb') as report:
+        head = report.read(SNIFF_SIZE)
+    for reader in READERS.values():
+        if reader.sniff(head):
+            return reader
+    raise UnknownReportFormat(f'Cannot tell the format of the coverage report {coverage_path}')
+
+
+def filters_paths(coverage_paths: Iterable[pathlib.Path]) -> bool:
+    """Whether the paths of the files that are needed make reading one of the reports faster."""
+    return any(get_reader(coverage_path).filters_paths for coverage_path in coverage_paths)
+
+
+def read_report(
+    coverage_path: pathlib.Path,
+    loader: str = 'json',
+    cache: coverage_cache.CoverageCache | None = None,
+    paths: Collection[pathlib.Path] | None = None,
+) -> coverage_module.Coverage:
+    """
+    The Coverage of the report. With paths, the readers that can only load
+    those files, the others load all of them.
+    """
+    reader = get_reader(coverage_path)
+    if cache is None or not reader.cacheable:
+        return reader.read(coverage_path, loader, paths)
+
+    key = cache.get_key(coverage_path=coverage_path, reader_name=reader.name)
+    if (coverage := cache.read(key)) is not None:
+        log.debug('Loaded the coverage report %s from the cache', coverage_path)
+        return coverage
+    coverage = reader.read(coverage_path, loader, paths)
+    cache.write(key, coverage)
+    return coverage
+
+
+def read_json(
+    coverage_path: pathlib.Path, loader: str, _paths: Collection[pathlib.Path] | None
+) -> coverage_module.Coverage:
+    return coverage_module.get_coverage_info(coverage_path=coverage_path, loader=loader)
+
+
+def read_coverage_database(
+    coverage_path: pathlib.Path, _loader: str, paths: Collection[pathlib.Path] | None
+) -> coverage_module.Coverage:
+    return coverage_database.get_coverage_info(coverage_path=coverage_path, paths=paths)
+
+
+def read_lcov(
+    coverage_path: pathlib.Path, _loader: str, _paths: Collection[pathlib.Path] | None
+) -> coverage_module.Coverage:
+    return lcov.get_coverage_info(coverage_path=coverage_path)
+
+
+def read_cobertura(
+    coverage_path: pathlib.Path, _loader: str, _paths: Collection[pathlib.Path] | None
+) -> coverage_module.Coverage:
+    return cobertura.get_coverage_info(coverage_path=coverage_path)
+
+
+def sniff_lcov(head: bytes) -> bool:
+    first_line = head.lstrip().split(b'\n', 1)[0]
+    return first_line.startswith((b'TN:', b'SF:'))
+
+
+register_reader(
+    Reader(
+        name='coverage.py-json',
+        read=read_json,
+        sniff=lambda head: head.lstrip().startswith(b'{'),
+        extensions=('.json',),
+    )
+)
+register_reader(
+    Reader(
+        name='coverage.py-sqlite',
+        read=read_coverage_database,
+        sniff=lambda head: head.startswith(coverage_database.SQLITE_HEADER),
+        # The lines are those of the source files as they are now, not only of the report
+        cacheable=False,
+        filters_paths=True,
+    )
+)
+register_reader(
+    Reader(
+        name='lcov',
+        read=read_lcov,
+        sniff=sniff_lcov,
+        extensions=('.info', '.lcov'),
+    )
+)
+register_reader(
+    Reader(
+        name='cobertura',
+        read=read_cobertura,
+        sniff=lambda head: b'<coverage' in head,
+        extensions=('.xml',),
+    )
+)
@@ -3,11 +3,15 @@ from __future__ import annotations
 
 import dataclasses
 import decimal
+import glob
 import inspect
+import json
 import pathlib
 from collections.abc import MutableMapping
 from typing import Any
 
+from codecov import readers
+
 
 class MissingEnvironmentVariable(Exception):
     pass
@@ -17,21 +21,80 @@ class InvalidAnnotationType(Exception):
     pass
 
 
+class InvalidCoverageLoader(Exception):
+    pass
+
+
 def path_below(path_str: str | pathlib.Path) -> pathlib.Path:
     path = pathlib.Path(path_str).resolve()
     if not (path.exists() and path.is_file()):
         raise ValueError('Path does not exist')
 
-    if path.suffix != '.json':
-        raise ValueError('The file is not a JSON file.')
+    try:
+        readers.get_reader(path)
+    except readers.UnknownReportFormat as exc:
+        raise ValueError('The file is not a coverage report in a known format.') from exc
     return path
 
 
+def paths_below(patterns: str) -> list[pathlib.Path]:
+    """Paths matching the comma or newline separated glob patterns."""
+    paths: list[pathlib.Path] = []
+    for pattern in patterns.replace(',', '\n').splitlines():
+        if not (pattern := pattern.strip()):
+            continue
+        matches = sorted(glob.glob(pattern, recursive=True)) if set(pattern) & set('*?[') else [pattern]
+        if not matches:
+            raise ValueError(f'No file matches {pattern}')
+        paths.extend(path_below(match) for match in matches)
+    return paths
+
+
 def str_to_bool(value: str) -> bool:
     return value.lower() in ('1', 'true', 'yes')
 
 
-# pylint: disable=invalid-name, too-many-instance-attributes
+@dataclasses.dataclass
+class Subproject:
+    """A subproject of a monorepo, reported on in a comment of its own"""
+
+    id: str
+    coverage_path: pathlib.Path
+    # The thresholds of the action are used when not set
+    minimum_green: decimal.Decimal | None = None
+    minimum_orange: decimal.Decimal | None = None
+
+
+def parse_subprojects(value: str) -> list[Subproject]:
+    """
+    Subprojects from a JSON list such as:
+
+        [{"id": "api", "coverage_path": "api/coverage.json", "minimum_green": 90, "minimum_orange": 60}]
+    """
+    try:
+        items = json.loads(value)
+        subprojects = [
+            Subproject(
+                id=str(item['id']),
+                coverage_path=path_below(item['coverage_path']),
+                minimum_green=decimal.Decimal(str(item['minimum_green'])) if 'minimum_green' in item else None,
+                minimum_orange=decimal.Decimal(str(item['minimum_orange'])) if 'minimum_orange' in item else None,
+            )
+            for item in items
+        ]
+    except (KeyError, TypeError, decimal.InvalidOperation, json.JSONDecodeError) as exc:
+        raise ValueError(
+            'Expecting a JSON list of objects with an "id", a "coverage_path", '
+            'and optionally a "minimum_green" and a "minimum_orange"'
+        ) from exc
+
+    ids = [subproject.id for subproject in subprojects]
+    if duplicates := sorted({id_ for id_ in ids if ids.count(id_) > 1}):
+        raise ValueError(f'Duplicate subproject ids: {", ".join(duplicates)}')
+    return subprojects
+
+
+# pylint: disable=invalid-name, too-many-instance-attributes, too-many-public-methods
 @dataclasses.dataclass
 class Config:
     """This object defines the environment variables"""
@@ -56,6 +119,39 @@ class Config:
     MAX_FILES_IN_COMMENT: int = 25
     COMPLETE_PROJECT_REPORT: bool = False
     COVERAGE_REPORT_URL: str | None = None
+    # How the coverage report is read: "json" loads it at once, "stream" parses it incrementally,
+    # "mmap" maps it in memory and only decodes the files that are needed
+    COVERAGE_LOADER: str = 'json'
+    # Reports of other test shards, merged with COVERAGE_PATH
+    COVERAGE_PATHS: list[pathlib.Path] = dataclasses.field(default_factory=list)
+    # Processes loading and merging the reports, one per CPU by default
+    COVERAGE_MERGE_WORKERS: int | None = None
+    # Directory where the parsed coverage reports are cached, keyed by their content
+    COVERAGE_CACHE_DIR: pathlib.Path | None = None
+    COVERAGE_CACHE_MAX_SIZE_MB: int = 200
+    # Report on several subprojects at once, each with its own SUBPROJECT_ID, COVERAGE_PATH and thresholds
+    SUBPROJECTS: list[Subproject] = dataclasses.field(default_factory=list)
+    SUBPROJECT_WORKERS: int | None = None
+    # Transport of the GitHub API client
+    HTTP_MAX_CONNECTIONS: int = 10
+    HTTP_KEEPALIVE_EXPIRY: float = 5.0
+    HTTP_CONNECT_TIMEOUT: float = 10.0
+    HTTP_READ_TIMEOUT: float = 60.0
+    HTTP2: bool = False
+    HTTP_COMPRESSION: bool = False
+    # Retries of the GitHub API requests on rate limits and server errors
+    HTTP_MAX_RETRIES: int = 3
+    HTTP_MAX_RETRY_WAIT: float = 60.0
+    # Directory of the cache of the GitHub API responses, revalidated with conditional requests
+    HTTP_CACHE_DIR: pathlib.Path | None = None
+    HTTP_CACHE_MAX_SIZE_MB: int = 50
+    # Fetch the PR diff and the user while the coverage report is parsed
+    ASYNC_PIPELINE: bool = False
+    # Timings of the phases of the run and of the GitHub API calls
+    TIMING_REPORT_PATH: pathlib.Path | None = None
+    TIMING_STEP_SUMMARY: bool = False
+    # Set by GitHub Actions
+    GITHUB_STEP_SUMMARY: pathlib.Path | None = None
     # Only for debugging, not exposed in the action
     DEBUG: bool = False
 
@@ -63,6 +159,21 @@ class Config:
         if self.GITHUB_PR_NUMBER is None and self.GITHUB_REF is None:
             raise ValueError('Either GITHUB_PR_NUMBER or GITHUB_REF must be provided')
 
+    def get_subproject_configs(self) -> list[Config]:
+        return [
+            dataclasses.replace(
+                self,
+                SUBPROJECT_ID=subproject.id,
+                COVERAGE_PATH=subproject.coverage_path,
+                # The shards of the top-level report aren't those of the subprojects
+                COVERAGE_PATHS=[],
+                MINIMUM_GREEN=self.MINIMUM_GREEN if subproject.minimum_green is None else subproject.minimum_green,
+                MINIMUM_ORANGE=self.MINIMUM_ORANGE if subproject.minimum_orange is None else subproject.minimum_orange,
+                SUBPROJECTS=[],
+            )
+            for subproject in self.SUBPROJECTS
+        ]
+
     # Clean methods
     @classmethod
     def clean_minimum_green(cls, value: str) -> decimal.Decimal:
@@ -100,6 +211,70 @@ class Config:
             )
         return value
 
+    @classmethod
+    def clean_coverage_loader(cls, value: str) -> str:
+        if value not in {'json', 'stream', 'mmap'}:
+            raise InvalidCoverageLoader(
+                f'The coverage loader {value} is not valid. Please choose from json, stream or mmap'
+            )
+        return value
+
+    @classmethod
+    def clean_http_max_connections(cls, value: str) -> int:
+        return int(value)
+
+    @classmethod
+    def clean_http_keepalive_expiry(cls, value: str) -> float:
+        return float(value)
+
+    @classmethod
+    def clean_http_connect_timeout(cls, value: str) -> float:
+        return float(value)
+
+    @classmethod
+    def clean_http_read_timeout(cls, value: str) -> float:
+        return float(value)
+
+    @classmethod
+    def clean_http2(cls, value: str) -> bool:
+        return str_to_bool(value)
+
+    @classmethod
+    def clean_http_compression(cls, value: str) -> bool:
+        return str_to_bool(value)
+
+    @classmethod
+    def clean_http_max_retries(cls, value: str) -> int:
+        return int(value)
+
+    @classmethod
+    def clean_http_max_retry_wait(cls, value: str) -> float:
+        return float(value)
+
+    @classmethod
+    def clean_http_cache_dir(cls, value: str) -> pathlib.Path:
+        return pathlib.Path(value)
+
+    @classmethod
+    def clean_http_cache_max_size_mb(cls, value: str) -> int:
+        return int(value)
+
+    @classmethod
+    def clean_async_pipeline(cls, value: str) -> bool:
+        return str_to_bool(value)
+
+    @classmethod
+    def clean_timing_report_path(cls, value: str) -> pathlib.Path:
+        return pathlib.Path(value)
+
+    @classmethod
+    def clean_timing_step_summary(cls, value: str) -> bool:
+        return str_to_bool(value)
+
+    @classmethod
+    def clean_github_step_summary(cls, value: str) -> pathlib.Path:
+        return pathlib.Path(value)
+
     @classmethod
     def clean_github_pr_number(cls, value: str) -> int:
         return int(value)
@@ -108,6 +283,30 @@ class Config:
     def clean_coverage_path(cls, value: str) -> pathlib.Path:
         return path_below(value)
 
+    @classmethod
+    def clean_coverage_paths(cls, value: str) -> list[pathlib.Path]:
+        return paths_below(value)
+
+    @classmethod
+    def clean_coverage_merge_workers(cls, value: str) -> int:
+        return int(value)
+
+    @classmethod
+    def clean_coverage_cache_dir(cls, value: str) -> pathlib.Path:
+        return pathlib.Path(value)
+
+    @classmethod
+    def clean_coverage_cache_max_size_mb(cls, value: str) -> int:
+        return int(value)
+
+    @classmethod
+    def clean_subprojects(cls, value: str) -> list[Subproject]:
+        return parse_subprojects(value)
+
+    @classmethod
+    def clean_subproject_workers(cls, value: str) -> int:
+        return int(value)
+
     @classmethod
     def clean_annotations_output_path(cls, value: str) -> pathlib.Path:
         return pathlib.Path(value)
@@ -124,6 +323,9 @@ class Config:
                     config[key] = func(value)
                 except ValueError as exc:
                     raise ValueError(f'{key}: {exc!s}') from exc
+        # Each subproject has its own report, COVERAGE_PATH is not needed then
+        if config.get('SUBPROJECTS') and 'COVERAGE_PATH' not in config:
+            config['COVERAGE_PATH'] = config['SUBPROJECTS'][0].coverage_path
 
         try:
             config_obj = cls(**config)
@@ -1,20 +1,27 @@
 # -*- coding: utf-8 -*-
 from __future__ import annotations
 
+import collections
 import dataclasses
 import decimal
 import functools
 import hashlib
 import itertools
+import json
 import pathlib
+from collections.abc import Callable
 from importlib import resources
 
 import jinja2
 from jinja2.sandbox import SandboxedEnvironment
 
-from codecov import badge, coverage as coverage_module, diff_grouper
+from codecov import badge, coverage as coverage_module, diff_grouper, log
 
 MARKER = """<!-- This comment was generated by CI codecov{id_part} -->"""
+TEMPLATE_FILES_DIR = 'template_files'
+# Precompiled templates, generated at build time by compile_templates()
+COMPILED_TEMPLATES_DIR = 'compiled'
+COMPILED_TEMPLATES_MANIFEST = 'manifest.json'
 
 
 class MissingMarker(Exception):
@@ -66,6 +73,81 @@ class FileInfo:
     diff: coverage_module.FileDiffCoverage | None
 
 
+@functools.lru_cache(maxsize=32)
+def get_environment(  # pylint: disable=too-many-arguments
+    *,
+    repo_name: str,
+    pr_number: int,
+    base_ref: str,
+    minimum_green: decimal.Decimal,
+    minimum_orange: decimal.Decimal,
+    bytecode_cache_dir: pathlib.Path | None = None,
+) -> SandboxedEnvironment:
+    """
+    Build the rendering environment once per set of filter parameters.
+
+    Rendering again with the same parameters (e.g. several subprojects of the
+    same PR) reuses the environment and its already compiled templates. With
+    bytecode_cache_dir, the bytecode cache on disk lets new environments, or
+    new processes, skip parsing and compiling templates they have already seen.
+    """
+    loaders: list[jinja2.BaseLoader] = []
+    if compiled_loader := get_compiled_templates_loader():
+        loaders.append(compiled_loader)
+    loaders.append(jinja2.PackageLoader('codecov', TEMPLATE_FILES_DIR))
+    bytecode_cache = None
+    if bytecode_cache_dir:
+        bytecode_cache_dir.mkdir(parents=True, exist_ok=True)
+        bytecode_cache = jinja2.FileSystemBytecodeCache(str(bytecode_cache_dir))
+    env = SandboxedEnvironment(loader=jinja2.ChoiceLoader(loaders), bytecode_cache=bytecode_cache)
+    env.filters.update(
+        get_filters(
+            repo_name=repo_name,
+            pr_number=pr_number,
+            base_ref=base_ref,
+            minimum_green=minimum_green,
+            minimum_orange=minimum_orange,
+        )
+    )
+    return env
+
+
+def get_filters(
+    *,
+    repo_name: str,
+    pr_number: int,
+    base_ref: str,
+    minimum_green: decimal.Decimal,
+    minimum_orange: decimal.Decimal,
+) -> dict:
+    return {
+        'pct': pct,
+        'x100': x100,
+        'generate_badge': badge.get_static_badge_url,
+        'pluralize': pluralize,
+        'file_url': functools.partial(get_file_url, repo_name=repo_name, pr_number=pr_number, base_ref=base_ref),
+        'get_badge_color': functools.partial(
+            badge.get_badge_color,
+            minimum_green=minimum_green,
+            minimum_orange=minimum_orange,
+        ),
+    }
+
+
+@functools.lru_cache(maxsize=32)
+def get_string_template(env: SandboxedEnvironment, source: str) -> jinja2.Template:
+    """
+    Same as env.from_string, but compiled once per environment and source, and
+    through the environment's bytecode cache, keyed by the hash of the source.
+    A source equal to one of the packaged templates is loaded under that
+    template's name, so that the precompiled version is used when available.
+    """
+    source_hash = template_hash(source)
+    if name := get_packaged_template_names().get(source_hash):
+        return env.get_template(name)
+    return jinja2.FunctionLoader(lambda name: source).load(env, f'string-{source_hash}.md.j2')
+
+
 def get_comment_markdown(  # pylint: disable=too-many-arguments,too-many-locals
     *,
     coverage: coverage_module.Coverage,
@@ -86,38 +168,38 @@ def get_comment_markdown(  # pylint: disable=too-many-arguments,too-many-locals
     branch_coverage: bool = False,
     complete_project_report: bool = False,
     coverage_report_url: str | None = None,
+    max_missing_links: int | None = None,
+    template_cache_dir: pathlib.Path | None = None,
 ):
-    env = SandboxedEnvironment(loader=jinja2.FileSystemLoader('codecov/template_files/'))
-    env.filters['pct'] = pct
-    env.filters['x100'] = x100
-    env.filters['generate_badge'] = badge.get_static_badge_url
-    env.filters['pluralize'] = pluralize
-    env.filters['file_url'] = functools.partial(
-        get_file_url, repo_name=repo_name, pr_number=pr_number, base_ref=base_ref
-    )
-    env.filters['get_badge_color'] = functools.partial(
-        badge.get_badge_color,
+    env = get_environment(
+        repo_name=repo_name,
+        pr_number=pr_number,
+        base_ref=base_ref,
         minimum_green=minimum_green,
         minimum_orange=minimum_orange,
+        bytecode_cache_dir=template_cache_dir,
     )
 
     missing_diff_lines = {
-        key: list(value)
+        key: list(itertools.islice(value, max_missing_links))
         for key, value in itertools.groupby(
             diff_grouper.get_diff_missing_groups(coverage=coverage, diff_coverage=diff_coverage),
             lambda x: x.file,
         )
     }
 
+    # Only the project files shown in the comment need their missing lines
     missing_lines_for_whole_project = {
-        key: list(value)
+        key: list(itertools.islice(value, max_missing_links))
         for key, value in itertools.groupby(
-            diff_grouper.get_missing_groups(coverage=coverage),
+            diff_grouper.get_missing_groups(
+                coverage=coverage, paths=[file.path for file in coverage_files] if complete_project_report else []
+            ),
             lambda x: x.file,
         )
     }
     try:
-        comment = env.from_string(base_template).render(
+        comment = get_string_template(env=env, source=base_template).render(
             coverage=coverage,
             diff_coverage=diff_coverage,
             max_files=max_files,
@@ -142,6 +224,152 @@ def get_comment_markdown(  # pylint: disable=too-many-arguments,too-many-locals
     return comment
 
 
+def get_comment_markdown_within_budget(
+    *,
+    coverage: coverage_module.Coverage,
+    diff_coverage: coverage_module.DiffCoverage,
+    max_files: int | None,
+    max_length: int,
+    **kwargs,
+) -> str:
+    """
+    Render the comment with as many file rows (and missing lines links) as fit
+    in max_length characters.
+
+    Files are kept in the same priority order as select_changed_files and
+    select_files: changed files first, then the rest of the project, each by
+    sort_order. The cost of a row is estimated from an empty and a full render,
+    and the estimate is refined with a binary search, so only a handful of
+    renders happen whatever the number of files. If not even a single row fits,
+    the number of missing lines links per file is capped instead, and if not
+    even the comment without rows fits, only the totals are shown.
+
+    The remaining keyword arguments are passed to get_comment_markdown.
+    """
+    changed_files, project_files, count_coverage_files = select_files_by_priority(
+        coverage=coverage,
+        diff_coverage=diff_coverage,
+        complete_project_report=kwargs.get('complete_project_report', False),
+    )
+    total_files = len(changed_files) + len(project_files)
+    if max_files is not None:
+        total_files = min(total_files, max_files)
+
+    renders: dict[tuple[int, int | None], str] = {}
+
+    def render(num_files: int, max_links: int | None = None) -> str:
+        if (num_files, max_links) not in renders:
+            # The mandatory arguments that are not given here are in kwargs
+            arguments = kwargs | {
+                'coverage': coverage,
+                'diff_coverage': diff_coverage,
+                'files': sorted(changed_files[:num_files], key=lambda x: x.path),
+                'count_files': len(changed_files),
+                'coverage_files': sorted(project_files[: max(num_files - len(changed_files), 0)], key=lambda x: x.path),
+                'count_coverage_files': count_coverage_files,
+                'max_files': max_files if num_files == total_files else num_files,
+                'max_missing_links': max_links,
+            }
+            renders[num_files, max_links] = get_comment_markdown(**arguments)
+        return renders[num_files, max_links]
+
+    def fits(num_files: int, max_links: int | None = None) -> bool:
+        return len(render(num_files, max_links)) <= max_length
+
+    if fits(total_files):
+        return render(total_files)
+    if not fits(0):
+        log.warning('Comment is too long even without any file, showing only the totals')
+        return get_too_large_comment(coverage=coverage, diff_coverage=diff_coverage, marker=kwargs['marker'])
+
+    num_files = search_max_rows(render=render, total_files=total_files, max_length=max_length)
+    if num_files == 0 and fits(1, 0):
+        # A single row doesn't fit: keep one row and cap its links
+        max_links = count_max_missing_links(coverage=coverage, diff_coverage=diff_coverage, project_files=project_files)
+        links = search_max(lambda links: fits(1, links), low=0, high=max_links + 1)
+        log.warning('Comment is too long, showing only %s missing lines links per file', links)
+        return render(1, links)
+
+    log.warning('Comment is too long, showing only %s files out of %s', num_files, total_files)
+    return render(num_files)
+
+
+def select_files_by_priority(
+    coverage: coverage_module.Coverage,
+    diff_coverage: coverage_module.DiffCoverage,
+    complete_project_report: bool = False,
+) -> tuple[list[FileInfo], list[FileInfo], int]:
+    """
+    The changed files and the project files, most important first, and the
+    number of project files.
+    """
+    _, _, changed_files = select_changed_files(coverage=coverage, diff_coverage=diff_coverage, max_files=None)
+    changed_files = sorted(changed_files, key=sort_order, reverse=True)
+    # Project files only take room in the comment when the complete report is shown, they are
+    # not even looked at otherwise so that the files of a lazily loaded report stay undecoded
+    if not complete_project_report:
+        return changed_files, [], 0
+    project_files, count_coverage_files = select_files(
+        coverage=coverage, changed_files_info=changed_files, max_files=None
+    )
+    return changed_files, sorted(project_files, key=sort_order, reverse=True), count_coverage_files
+
+
+def search_max(fits: Callable[[int], bool], low: int, high: int) -> int:
+    """Binary search of the largest value that fits, low fitting (or being the floor) and high not."""
+    while high - low > 1:
+        middle = (low + high) // 2
+        if fits(middle):
+            low = middle
+        else:
+            high = middle
+    return low
+
+
+def search_max_rows(render: Callable[[int], str], total_files: int, max_length: int) -> int:
+    """
+    The largest number of rows, below total_files, of a comment that fits in
+    max_length, starting from a guess made from the cost of a row.
+    """
+    empty, full = len(render(0)), len(render(total_files))
+    row_cost = max((full - empty) / total_files, 1)
+    low, high = 0, total_files
+    guess = int((max_length - empty) // row_cost)
+    if 0 < guess < high:
+        if len(render(guess)) <= max_length:
+            low = guess
+        else:
+            high = guess
+    return search_max(lambda num_files: len(render(num_files)) <= max_length, low=low, high=high)
+
+
+def count_max_missing_links(
+    coverage: coverage_module.Coverage, diff_coverage: coverage_module.DiffCoverage, project_files: list[FileInfo]
+) -> int:
+    """The largest number of missing lines links of a file of the comment."""
+    links_per_file = collections.Counter(
+        group.file
+        for group in itertools.chain(
+            diff_grouper.get_diff_missing_groups(coverage=coverage, diff_coverage=diff_coverage),
+            diff_grouper.get_missing_groups(coverage=coverage, paths=[file.path for file in project_files]),
+        )
+    )
+    return max(links_per_file.values(), default=0)
+
+
+def get_too_large_comment(
+    coverage: coverage_module.Coverage, diff_coverage: coverage_module.DiffCoverage, marker: str
+) -> str:
+    """Minimal comment, for a report that doesn't fit in a comment even without its files."""
+    return (
+        '## Coverage report\n\n'
+        f'Coverage of the whole project for this PR is {coverage.info.percent_covered_display}%, '
+        f'{pct(diff_coverage.total_percent_covered)} of the statement lines added by this PR are covered. '
+        'The report is too large to be shown in a comment.\n\n'
+        f'{marker}'
+    )
+
+
 def select_changed_files(
     *,
     coverage: coverage_module.Coverage,
@@ -155,18 +383,18 @@ def select_changed_files(
     """
 
     files = []
-    for path, coverage_file in coverage.files.items():
-        diff_coverage_file = diff_coverage.files.get(path)
+    # Only the files of the diff are looked at, the diff coverage only has files of the coverage report
+    for path, diff_coverage_file in diff_coverage.files.items():
+        if path not in coverage.files or not diff_coverage_file.added_statements:
+            continue
 
-        file_info = FileInfo(
-            path=path,
-            coverage=coverage_file,
-            diff=diff_coverage_file,
+        files.append(
+            FileInfo(
+                path=path,
+                coverage=coverage.files[path],
+                diff=diff_coverage_file,
+            )
         )
-        has_diff = bool(diff_coverage_file and diff_coverage_file.added_statements)
-
-        if has_diff:
-            files.append(file_info)
 
     return sort_and_trucate_files(files=files, max_files=max_files), len(files), files
 
@@ -224,7 +452,68 @@ def sort_order(file_info: FileInfo) -> tuple[int, int, int]:
 
 
 def read_template_file(template: str) -> str:
-    return (resources.files('codecov') / 'template_files' / template).read_text()
+    return (resources.files('codecov') / TEMPLATE_FILES_DIR / template).read_text()
+
+
+def template_hash(source: str) -> str:
+    return hashlib.sha256(source.encode()).hexdigest()
+
+
+@functools.lru_cache(maxsize=None)
+def get_packaged_template_hashes() -> dict[str, str]:
+    """Hash of the source of every template shipped in the package, by name."""
+    return {
+        entry.name: template_hash(entry.read_text())
+        for entry in (resources.files('codecov') / TEMPLATE_FILES_DIR).iterdir()
+        if entry.name.endswith('.j2')
+    }
+
+
+@functools.lru_cache(maxsize=None)
+def get_packaged_template_names() -> dict[str, str]:
+    return {source_hash: name for name, source_hash in get_packaged_template_hashes().items()}
+
+
+def compile_templates(target: pathlib.Path | None = None) -> None:
+    """
+    Build step: compile the packaged templates into Python modules, next to a
+    manifest of the source hashes they were compiled from.
+    """
+    if target is None:
+        target = pathlib.Path(str(resources.files('codecov') / TEMPLATE_FILES_DIR / COMPILED_TEMPLATES_DIR))
+    env = SandboxedEnvironment(loader=jinja2.PackageLoader('codecov', TEMPLATE_FILES_DIR))
+    # Filters are looked up by name when rendering, so the compiled code does
+    # not depend on their parameters; they only need to exist at compile time.
+    env.filters.update(
+        get_filters(
+            repo_name='',
+            pr_number=0,
+            base_ref='',
+            minimum_green=decimal.Decimal('100'),
+            minimum_orange=decimal.Decimal('70'),
+        )
+    )
+    env.compile_templates(target, extensions=['j2'], zip=None, ignore_errors=False, log_function=log.info)
+    (target / COMPILED_TEMPLATES_MANIFEST).write_text(json.dumps(get_packaged_template_hashes(), indent=2))
+
+
+@functools.lru_cache(maxsize=None)
+def get_compiled_templates_loader(path: pathlib.Path | None = None) -> jinja2.ModuleLoader | None:
+    """
+    Loader for the precompiled templates, or None when they were not built or
+    were built from other sources than the packaged templates.
+    """
+    if path is None:
+        path = pathlib.Path(str(resources.files('codecov') / TEMPLATE_FILES_DIR / COMPILED_TEMPLATES_DIR))
+    try:
+        manifest = json.loads((path / COMPILED_TEMPLATES_MANIFEST).read_text())
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+    if manifest != get_packaged_template_hashes():
+        log.debug('Precompiled templates are outdated, compiling templates from source.')
+        return None
+    return jinja2.ModuleLoader(path)
 
 
 def get_file_url(  # pylint: disable=too-many-arguments
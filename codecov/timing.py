@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+"""
+Where the seconds of a run go: the duration of each phase of the action and of
+each GitHub API call, collected in a process-wide Timer like log collects logs.
+"""
+from __future__ import annotations
+
+import contextlib
+import dataclasses
+import json
+import pathlib
+import time
+from collections.abc import AsyncIterable, AsyncIterator, Iterable, Iterator
+
+
+@dataclasses.dataclass
+class PhaseTiming:
+    name: str
+    duration: float
+
+
+@dataclasses.dataclass
+class RequestTiming:
+    method: str
+    path: str
+    status: int | None
+    duration: float
+
+
+@dataclasses.dataclass
+class Timer:
+    phases: list[PhaseTiming] = dataclasses.field(default_factory=list)
+    requests: list[RequestTiming] = dataclasses.field(default_factory=list)
+
+    def add(self, name: str, duration: float) -> None:
+        self.phases.append(PhaseTiming(name=name, duration=duration))
+
+    def total(self, name: str) -> float:
+        return sum(phase_timing.duration for phase_timing in self.phases if phase_timing.name == name)
+
+    @contextlib.contextmanager
+    def phase(self, name: str, exclude: Iterable[str] = ()) -> Iterator[None]:
+        """
+        Time the block as the phase name. The time recorded meanwhile for the
+        phases in exclude, for example by iterate, is not counted twice.
+        """
+        exclude = tuple(exclude)
+        excluded_before = sum(self.total(excluded) for excluded in exclude)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - start
+            excluded = sum(self.total(excluded) for excluded in exclude) - excluded_before
+            self.add(name, duration - excluded)
+
+    def iterate(self, name: str, iterable: Iterable) -> Iterator:
+        """Time how long it takes to get the items of the iterable, as the phase name."""
+        iterator = iter(iterable)
+        duration = 0.0
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    duration += time.perf_counter() - start
+                yield item
+        finally:
+            self.add(name, duration)
+
+    async def aiterate(self, name: str, iterable: AsyncIterable) -> AsyncIterator:
+        """Same as iterate, for an asynchronous iterable."""
+        iterator = aiter(iterable)
+        duration = 0.0
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    item = await anext(iterator)
+                except StopAsyncIteration:
+                    return
+                finally:
+                    duration += time.perf_counter() - start
+                yield item
+        finally:
+            self.add(name, duration)
+
+    def record_request(self, method: str, path: str, status: int | None, duration: float) -> None:
+        self.requests.append(RequestTiming(method=method.upper(), path=path, status=status, duration=duration))
+
+    def get_phase_totals(self) -> dict[str, float]:
+        totals: dict[str, float] = {}
+        for phase_timing in self.phases:
+            totals[phase_timing.name] = totals.get(phase_timing.name, 0.0) + phase_timing.duration
+        return totals
+
+    def to_dict(self) -> dict:
+        return {
+            'phases': self.get_phase_totals(),
+            'requests': [dataclasses.asdict(request) for request in self.requests],
+            'requests_total': sum(request.duration for request in self.requests),
+        }
+
+    def to_markdown(self) -> str:
+        lines = ['### Coverage comment timings', '', '| Phase | Seconds |', '| --- | ---: |']
+        lines += [f'| {name} | {duration:.3f} |' for name, duration in self.get_phase_totals().items()]
+        if self.requests:
+            lines += ['', '| Request | Status | Seconds |', '| --- | :---: | ---: |']
+            lines += [
+                f'| {request.method} {request.path} | {request.status or "error"} | {request.duration:.3f} |'
+                for request in self.requests
+            ]
+        return '\n'.join(lines) + '\n'
+
+
+timer = Timer()
+
+
+def reset() -> None:
+    global timer  # pylint: disable=global-statement
+    timer = Timer()
+
+
+def phase(name: str, exclude: Iterable[str] = ()) -> contextlib.AbstractContextManager[None]:
+    return timer.phase(name, exclude=exclude)
+
+
+def iterate(name: str, iterable: Iterable) -> Iterator:
+    return timer.iterate(name, iterable)
+
+
+def aiterate(name: str, iterable: AsyncIterable) -> AsyncIterator:
+    return timer.aiterate(name, iterable)
+
+
+def record_request(method: str, path: str, status: int | None, duration: float) -> None:
+    timer.record_request(method=method, path=path, status=status, duration=duration)
+
+
+def write_report(path: pathlib.Path) -> None:
+    path.write_text(json.dumps(timer.to_dict(), indent=2))
+
+
+def write_step_summary(path: pathlib.Path) -> None:
+    # The step summary is shared by all the steps of the job
+    with path.open('a') as summary_file:
+        summary_file.write(timer.to_markdown())
@@ -3,6 +3,7 @@
 # mypy: disable-error-code="operator, union-attr"
 from __future__ import annotations
 
+import contextlib
 import datetime
 import decimal
 import functools
@@ -13,7 +14,25 @@ from typing import Callable
 import httpx
 import pytest
 
-from codecov import coverage as coverage_module, github_client, settings
+from codecov import coverage as coverage_module, github_client, settings, template, timing
+
+
+@pytest.fixture(autouse=True)
+def clear_template_caches():
+    # Some tests patch pathlib.Path.open, which must not leak into the
+    # process-wide template caches.
+    yield
+    template.get_environment.cache_clear()
+    template.get_string_template.cache_clear()
+    template.get_packaged_template_hashes.cache_clear()
+    template.get_packaged_template_names.cache_clear()
+    template.get_compiled_templates_loader.cache_clear()
+
+
+@pytest.fixture(autouse=True)
+def reset_timing():
+    yield
+    timing.reset()
 
 
 @pytest.fixture
@@ -273,7 +292,8 @@ def make_coverage_obj(coverage_obj_more_files):
     def f(**kwargs):
         obj = coverage_obj_more_files
         for key, value in kwargs.items():
-            vars(obj.files[pathlib.Path(key)]).update(value)
+            for attr, attr_value in value.items():
+                setattr(obj.files[pathlib.Path(key)], attr, attr_value)
         return obj
 
     return f
@@ -371,6 +391,10 @@ def session():
                     )
             assert False, f'No response found for kwargs {request_kwargs}\nExpected answers are {self.responses}'
 
+        @contextlib.contextmanager
+        def stream(self, method, path, **kwargs):
+            yield self.request(method, path, **kwargs)
+
         def __getattr__(self, value):
             if value in ['get', 'post', 'patch', 'delete', 'put']:
                 return functools.partial(self.request, value.upper())
@@ -392,3 +416,16 @@ def session():
 @pytest.fixture
 def gh(session):
     return github_client.GitHub(session=session)
+
+
+@pytest.fixture
+def async_gh(session):
+    class AsyncSession:
+        async def request(self, method, path, **kwargs):
+            return session.request(method, path, **kwargs)
+
+        @contextlib.asynccontextmanager
+        async def stream(self, method, path, **kwargs):
+            yield session.request(method, path, **kwargs)
+
+    return github_client.AsyncGitHub(session=AsyncSession())
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+
+import os
+import time
+
+from codecov import cache_dir
+
+
+def test_touch(tmp_path):
+    path = tmp_path / 'a.cache'
+    path.write_bytes(b'')
+    os.utime(path, (0, 0))
+
+    cache_dir.touch(path)
+
+    assert path.stat().st_mtime > 0
+
+
+def test_touch_evicted(tmp_path):
+    cache_dir.touch(tmp_path / 'a.cache')
+
+    assert not list(tmp_path.iterdir())
+
+
+def test_evict(tmp_path):
+    for age, name in enumerate(('c.cache', 'b.cache', 'a.cache')):
+        (tmp_path / name).write_bytes(b'x' * 10)
+        os.utime(tmp_path / name, (time.time() - 10 + age,) * 2)
+    (tmp_path / 'other.tmp').write_bytes(b'x' * 100)
+
+    cache_dir.evict(tmp_path, suffix='.cache', max_size=20)
+
+    assert sorted(path.name for path in tmp_path.iterdir()) == ['a.cache', 'b.cache', 'other.tmp']
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+
+import datetime
+import io
+import pathlib
+import xml.etree.ElementTree as ET
+
+import pytest
+
+from codecov import cobertura
+
+COBERTURA_REPORT = b"""\
+<?xml version="1.0" ?>
+<coverage version="7.4.0" timestamp="946684800000" line-rate="0.75" branch-rate="0.5">
+    <sources>
+        <source>/project/src</source>
+    </sources>
+    <packages>
+        <package name="pkg">
+            <classes>
+                <class name="Mod" filename="pkg/mod.py">
+                    <methods>
+                        <method name="f"><lines><line number="3" hits="0"/></lines></method>
+                    </methods>
+                    <lines>
+                        <line number="1" hits="1"/>
+                        <line number="2" hits="4" branch="true" condition-coverage="50% (1/2)"/>
+                        <line number="3" hits="0"/>
+                    </lines>
+                </class>
+                <class name="Mod$Inner" filename="pkg/mod.py">
+                    <lines>
+                        <line number="5" hits="2"/>
+                    </lines>
+                </class>
+            </classes>
+        </package>
+    </packages>
+</coverage>
+"""
+
+
+def test_read_cobertura():
+    files, has_branches, attributes = cobertura.read_cobertura(
+        xml_data=io.BytesIO(COBERTURA_REPORT), root=pathlib.Path('/project')
+    )
+
+    assert has_branches is True
+    assert attributes['version'] == '7.4.0'
+    # File names are relative to the sources, the classes of the same file are merged
+    assert list(files) == [pathlib.Path('src/pkg/mod.py')]
+    file_coverage = files[pathlib.Path('src/pkg/mod.py')]
+    assert file_coverage.executed_lines == [1, 2, 5]
+    assert file_coverage.missing_lines == [3]
+    assert file_coverage.executed_branches == [[2, 2]]
+    assert file_coverage.missing_branches == [[2, 2]]
+    assert file_coverage.info.num_partial_branches == 1
+    assert file_coverage.info.percent_covered_display == '67'
+
+
+def test_read_cobertura_drops_classes(monkeypatch):
+    elements = []
+    iterparse = ET.iterparse
+
+    def record(*args, **kwargs):
+        for event, element in iterparse(*args, **kwargs):
+            elements.append(element)
+            yield event, element
+
+    monkeypatch.setattr(cobertura.ET, 'iterparse', record)
+    cobertura.read_cobertura(xml_data=io.BytesIO(COBERTURA_REPORT), root=pathlib.Path('/project'))
+
+    classes = elements[0].find('packages/package/classes')
+    assert classes is not None
+    assert not list(classes)
+
+
+def test_read_cobertura_not_cobertura():
+    with pytest.raises(cobertura.InvalidCoberturaReport):
+        cobertura.read_cobertura(xml_data=io.BytesIO(b'<report name="jacoco"/>'), root=pathlib.Path())
+
+
+def test_get_coverage_info(tmp_path):
+    path = tmp_path / 'coverage.xml'
+    path.write_bytes(COBERTURA_REPORT.replace(b'/project', str(tmp_path).encode()))
+
+    result = cobertura.get_coverage_info(coverage_path=path, root=tmp_path)
+
+    assert result.meta.version == '7.4.0'
+    assert result.meta.timestamp == datetime.datetime.fromtimestamp(946684800)
+    assert list(result.files) == [pathlib.Path('src/pkg/mod.py')]
+    assert result.info.num_statements == 4
+
+
+def test_get_coverage_info_invalid(tmp_path):
+    path = tmp_path / 'coverage.xml'
+    path.write_bytes(b'<coverage><packages>')
+
+    with pytest.raises(ET.ParseError):
+        cobertura.get_coverage_info(coverage_path=path)
@@ -1,10 +1,15 @@
 # -*- coding: utf-8 -*-
 from __future__ import annotations
 
+import copy
 import datetime
 import decimal
+import io
 import json
+import mmap
 import pathlib
+import pickle
+import random
 from unittest.mock import patch
 
 import pytest
@@ -26,6 +31,47 @@ def test_diff_violations(make_coverage_and_diff):
     assert diff.files[pathlib.Path('a.py')].violation_lines == [1, 3]
 
 
+def test_lines_list_compatible():
+    lines = coverage.Lines([1, 2, 5])
+    lines.append(7)
+
+    assert lines == [1, 2, 5, 7]
+    assert lines != [1, 2, 5]
+    assert lines == coverage.Lines([1, 2, 5, 7])
+    assert lines[1] == 2
+    assert list(lines) == [1, 2, 5, 7]
+    assert set(lines) & {5, 6} == {5}
+    assert repr(lines) == 'Lines([1, 2, 5, 7])'
+
+
+def test_lines_slice():
+    lines = coverage.Lines([1, 2, 3, 8])
+
+    assert lines[0:2] == [1, 2]
+    assert isinstance(lines[1:], coverage.Lines)
+    assert lines[::-1] == [8, 3, 2, 1]
+    assert lines[-1] == 8
+
+
+def test_lines_copy_and_pickle():
+    lines = coverage.Lines([3, 4, 100000])
+
+    # The pickle round-trip is the one of the process pools, on data of our own
+    unpickled = pickle.loads(pickle.dumps(lines))  # noqa: S301
+    for other in (copy.copy(lines), copy.deepcopy(lines), unpickled):
+        assert isinstance(other, coverage.Lines)
+        assert other == [3, 4, 100000]
+
+
+def test_file_coverage_stores_lines_compactly(coverage_json):
+    file_coverage = coverage.extract_info(coverage_json).files[pathlib.Path('codebase/code.py')]
+
+    assert isinstance(file_coverage.executed_lines, coverage.Lines)
+    assert isinstance(file_coverage.missing_lines, coverage.Lines)
+    assert isinstance(file_coverage.excluded_lines, coverage.Lines)
+    assert not hasattr(file_coverage, '__dict__')
+
+
 @pytest.mark.parametrize(
     'num_covered, num_total, expected_coverage',
     [
@@ -156,6 +202,32 @@ def test_get_diff_coverage_info(make_coverage_obj, added_lines, update_obj, expe
     assert result == expected
 
 
+@pytest.mark.parametrize(
+    'left, right, expected',
+    [
+        ([], [], []),
+        ([1, 2, 3], [], []),
+        ([1, 2, 3], [2, 3, 4], [2, 3]),
+        ([1, 3, 5], [2, 4, 6], []),
+        ([5], list(range(1, 1000)), [5]),
+        (list(range(1, 1000)), [0, 500, 999, 1000], [500, 999]),
+        ([1, 2, 2, 3], [2, 2, 3], [2, 3]),
+    ],
+)
+def test_intersect_sorted(left, right, expected):
+    assert coverage.intersect_sorted(left, right) == expected
+    assert coverage.intersect_sorted(right, left) == expected
+
+
+@pytest.mark.parametrize('seed', range(50))
+def test_intersect_sorted_matches_sets(seed):
+    rng = random.Random(seed)  # noqa: S311
+    left = sorted(rng.sample(range(1, 2000), rng.randint(0, 300)))
+    right = sorted(rng.sample(range(1, 2000), rng.randint(0, 10) if seed % 2 else rng.randint(0, 1500)))
+
+    assert coverage.intersect_sorted(coverage.Lines(left), right) == sorted(set(left) & set(right))
+
+
 @pytest.mark.parametrize(
     'line_number_diff_line, expected',
     [
@@ -274,6 +346,112 @@ def test_parse_line_number_diff_line(line_number_diff_line, expected):
     assert result == expected
 
 
+@pytest.mark.parametrize(
+    'diff, expected',
+    [
+        pytest.param(
+            'diff --git a/old.py b/new.py\n'
+            'similarity index 100%\n'
+            'rename from old.py\n'
+            'rename to new.py\n'
+            'diff --git a/a.py b/a.py\n'
+            '--- a/a.py\n'
+            '+++ b/a.py\n'
+            '@@ -1,2 +1,3 @@\n'
+            ' context\n'
+            '+added\n'
+            ' context\n',
+            {pathlib.Path('a.py'): [2]},
+            id='rename',
+        ),
+        pytest.param(
+            'diff --git a/gone.py b/gone.py\n'
+            'deleted file mode 100644\n'
+            '--- a/gone.py\n'
+            '+++ /dev/null\n'
+            '@@ -1,2 +0,0 @@\n'
+            '-foo\n'
+            '-bar\n',
+            {},
+            id='deleted',
+        ),
+        pytest.param(
+            'diff --git a/image.png b/image.png\n'
+            'new file mode 100644\n'
+            'Binary files /dev/null and b/image.png differ\n'
+            'diff --git a/a.py b/a.py\n'
+            '--- a/a.py\n'
+            '+++ b/a.py\n'
+            '@@ -0,0 +1,2 @@\n'
+            '+foo\n'
+            '+bar',
+            {pathlib.Path('a.py'): [1, 2]},
+            id='binary_and_no_trailing_newline',
+        ),
+        pytest.param(
+            'diff --git a/a.py b/a.py\n'
+            '--- a/a.py\n'
+            '+++ b/a.py\n'
+            '@@ -1 +1 @@\n'
+            '-foo\n'
+            '\\ No newline at end of file\n'
+            '+bar\n'
+            '\\ No newline at end of file\n',
+            {pathlib.Path('a.py'): [1]},
+            id='no_newline_marker',
+        ),
+        pytest.param(
+            'diff --git a/a.py b/a.py\r\n'
+            '--- a/a.py\r\n'
+            '+++ b/a.py\r\n'
+            '@@ -10,2 +10,3 @@\r\n'
+            ' foo\r\n'
+            '+bar\r\n'
+            ' baz\r\n',
+            {pathlib.Path('a.py'): [11]},
+            id='crlf',
+        ),
+    ],
+)
+def test_parse_diff_output_special_entries(diff, expected):
+    assert coverage.parse_diff_output(diff) == expected
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 5, 13])
+def test_diff_parser_chunks(chunk_size):
+    diff = (
+        'diff --git a/a.py b/a.py\n'
+        '--- a/a.py\n'
+        '+++ b/a.py\n'
+        '@@ -1,2 +1,5 @@\n'
+        ' context\n'
+        '+new_line_1\n'
+        '-old_line\n'
+        ' context\n'
+        '+new_line_2\n'
+        ' context\n'
+        'diff --git a/b.py b/b.py\n'
+        '--- a/b.py\n'
+        '+++ b/b.py\n'
+        '@@ -20,6 +20,7 @@\n'
+        '+new_line\n'
+    )
+    parser = coverage.DiffParser()
+    result = []
+    for i in range(0, len(diff), chunk_size):
+        result.extend(parser.feed(diff[i : i + chunk_size]))
+    result.extend(parser.close())
+
+    assert result == list(coverage.iter_diff_ranges([diff]))
+    assert result == [(pathlib.Path('a.py'), range(2, 5)), (pathlib.Path('b.py'), range(20, 21))]
+
+
+def test_parse_diff_chunks():
+    chunks = ['diff --git a/a.py b/a.py\n--- a/a.py\n+++ b/', 'a.py\n@@ -1 +1,2 @@\n', ' foo\n+b', 'ar\n']
+
+    assert coverage.parse_diff_chunks(chunks=chunks) == {pathlib.Path('a.py'): [2]}
+
+
 def test_parse_line_number_raise_value_error():
     lines = (
         'diff --git a/test.py b/test.py\n'
@@ -290,6 +468,23 @@ def test_parse_line_number_raise_value_error():
         coverage.parse_diff_output(lines)
 
 
+@pytest.mark.parametrize(
+    'percent, display',
+    [(0, '0'), (0.2, '1'), (50.4, '50'), (99.9, '99'), (100, '100')],
+)
+def test_get_display_percent(percent, display):
+    assert coverage.get_display_percent(percent) == display
+
+
+def test_get_summary():
+    info = coverage.get_summary(num_statements=8, num_missing=2, num_excluded=1, branches=(4, 1, 2))
+
+    assert info.covered_lines == 6
+    assert info.covered_branches == 2
+    assert info.percent_covered == pytest.approx(100 * 8 / 12)
+    assert info.percent_covered_display == '67'
+
+
 def test_extract_info(coverage_json):
     expected_coverage = coverage.Coverage(
         meta=coverage.CoverageMetadata(
@@ -337,6 +532,73 @@ def test_extract_info(coverage_json):
     assert coverage.extract_info(coverage_json) == expected_coverage
 
 
+def test_extract_info_is_lazy(coverage_json):
+    result = coverage.extract_info(coverage_json)
+
+    assert isinstance(result.files, coverage.LazyFiles)
+    assert list(result.files) == [pathlib.Path('codebase/code.py')]
+    assert pathlib.Path('codebase/code.py') in result.files
+    assert not result.files.decoded
+
+    file_coverage = result.files[pathlib.Path('codebase/code.py')]
+
+    assert file_coverage.missing_lines == [6, 8, 10, 11]
+    assert result.files[pathlib.Path('codebase/code.py')] is file_coverage
+
+
+def test_lazy_files():
+    def decode(path, data):
+        return coverage.FileCoverage(
+            path=path,
+            executed_lines=data,
+            missing_lines=[],
+            excluded_lines=[],
+            executed_branches=None,
+            missing_branches=None,
+            info=None,  # type: ignore[arg-type]
+        )
+
+    index = {pathlib.Path(f'{name}.py'): [index] for index, name in enumerate('abc')}
+    files = coverage.LazyFiles(index=index, decode=decode)
+    files.apply(lambda file_coverage: file_coverage.executed_lines.append(10))
+
+    assert len(files) == 3
+    assert files[pathlib.Path('b.py')].executed_lines == [1, 10]
+    assert pathlib.Path('d.py') not in files
+    with pytest.raises(KeyError):
+        files[pathlib.Path('d.py')]  # pylint: disable=pointless-statement
+
+    del files[pathlib.Path('a.py')]
+    files[pathlib.Path('d.py')] = decode(pathlib.Path('d.py'), [3])
+
+    assert list(files) == [pathlib.Path('b.py'), pathlib.Path('c.py'), pathlib.Path('d.py')]
+    assert list(files.decoded) == [pathlib.Path('b.py'), pathlib.Path('d.py')]
+    assert repr(files) == 'LazyFiles(3 files, 2 decoded)'
+
+
+def test_get_diff_coverage_info_malformed_file(coverage_json):
+    del coverage_json['files']['codebase/code.py']['summary']
+    result = coverage.extract_info(coverage_json)
+
+    # The file isn't silently left out as if it wasn't in the report
+    with pytest.raises(ValueError, match='summary'):
+        coverage.get_diff_coverage_info(added_lines={pathlib.Path('codebase/code.py'): [5, 6]}, coverage=result)
+
+
+def test_get_diff_coverage_info_only_decodes_diff_files(coverage_json):
+    files_data = coverage_json['files']['codebase/code.py']
+    coverage_json['files'] = {f'codebase/file_{index}.py': copy.deepcopy(files_data) for index in range(30)}
+    result = coverage.extract_info(coverage_json)
+
+    diff_coverage = coverage.get_diff_coverage_info(
+        added_lines={pathlib.Path('codebase/file_3.py'): [5, 6], pathlib.Path('other.py'): [1]},
+        coverage=result,
+    )
+
+    assert list(diff_coverage.files) == [pathlib.Path('codebase/file_3.py')]
+    assert list(result.files.decoded) == [pathlib.Path('codebase/file_3.py')]  # type: ignore[attr-defined]
+
+
 def test_get_coverage_info(coverage_json):
     with patch('pathlib.Path.open') as mock_open:
         mock_open.return_value.__enter__.return_value.read.return_value = json.dumps(coverage_json)
@@ -355,3 +617,119 @@ def test_get_coverage_info_json_decode_error():
 def test_get_coverage_info_file_not_found():
     with pytest.raises(FileNotFoundError):
         coverage.get_coverage_info(pathlib.Path('path/to/file.json'))
+
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 64, coverage.STREAM_CHUNK_SIZE])
+def test_stream_info(coverage_json, chunk_size):
+    coverage_data = io.StringIO(json.dumps(coverage_json, indent=2))
+
+    result = coverage.stream_info(coverage_data=coverage_data, chunk_size=chunk_size)
+
+    assert result == coverage.extract_info(coverage_json)
+
+
+def test_stream_info_empty_files(coverage_json):
+    coverage_json['files'] = {}
+    coverage_data = io.StringIO(json.dumps(coverage_json))
+
+    result = coverage.stream_info(coverage_data=coverage_data, chunk_size=3)
+
+    assert result.files == {}
+
+
+@pytest.mark.parametrize(
+    'contents',
+    [
+        '',
+        '[]',
+        '{"meta": {}',
+        '{"files": {"a.py": {"executed_lines": [1, 2}}}',
+        '{1: 2}',
+    ],
+)
+def test_stream_info_invalid_json(contents):
+    with pytest.raises(json.JSONDecodeError):
+        coverage.stream_info(coverage_data=io.StringIO(contents), chunk_size=4)
+
+
+def test_get_coverage_info_stream(coverage_json, tmp_path):
+    coverage_path = tmp_path / 'coverage.json'
+    coverage_path.write_text(json.dumps(coverage_json))
+
+    result = coverage.get_coverage_info(coverage_path, loader='stream')
+
+    assert result == coverage.extract_info(coverage_json)
+
+
+def test_get_coverage_info_mmap(coverage_json, tmp_path):
+    coverage_json['files']['codebase/"quoted" {braces}.py'] = coverage_json['files']['codebase/code.py']
+    coverage_path = tmp_path / 'coverage.json'
+    coverage_path.write_text(json.dumps(coverage_json, indent=2))
+
+    result = coverage.get_coverage_info(coverage_path, loader='mmap')
+
+    assert isinstance(result.files, coverage.LazyFiles)
+    assert not result.files.decoded
+    assert result == coverage.extract_info(coverage_json)
+
+
+@pytest.mark.parametrize('name', [b'b\\"{.py', b'b{.py'])
+def test_index_json_report(name):
+    # Without backslashes, the braces in the strings are skipped by counting quotes
+    report = b'{"meta": {"a": "}"}, "files": {"a.py": {"s": {"b": 1}}, "%s": {}}, "totals": {}}' % name
+
+    sections, files = coverage.index_json_report(buffer=report)
+
+    assert {key: report[start:end] for key, (start, end) in sections.items()} == {
+        b'"meta"': b'{"a": "}"}',
+        b'"files"': b'{"a.py": {"s": {"b": 1}}, "%s": {}}' % name,
+        b'"totals"': b'{}',
+    }
+    assert {key: report[start:end] for key, (start, end) in files.items()} == {
+        b'"a.py"': b'{"s": {"b": 1}}',
+        b'"%s"' % name: b'{}',
+    }
+
+
+@pytest.mark.parametrize(
+    'contents',
+    [
+        '',
+        '[]',
+        '{"meta": {}',
+        '{"meta": {}}}',
+        '{"files": {"a.py": {"executed_lines": [1, 2}}}',
+        '{1: 2}',
+    ],
+)
+def test_get_coverage_info_mmap_invalid_json(contents, tmp_path):
+    coverage_path = tmp_path / 'coverage.json'
+    coverage_path.write_text(contents)
+
+    with pytest.raises(json.JSONDecodeError):
+        coverage.get_coverage_info(coverage_path, loader='mmap')
+
+
+@pytest.mark.parametrize('contents', ['[]', '{"meta": {}}}'])
+def test_get_coverage_info_mmap_invalid_json_unmapped(contents, tmp_path):
+    coverage_path = tmp_path / 'coverage.json'
+    coverage_path.write_text(contents)
+    buffers = []
+    mmap_class = mmap.mmap
+
+    def mmap_file(*args, **kwargs):
+        buffers.append(mmap_class(*args, **kwargs))
+        return buffers[-1]
+
+    with patch('codecov.coverage.mmap.mmap', side_effect=mmap_file), pytest.raises(json.JSONDecodeError):
+        coverage.get_coverage_info(coverage_path, loader='mmap')
+
+    assert [buffer.closed for buffer in buffers] == [True]
+
+
+def test_get_coverage_info_stream_json_decode_error(tmp_path):
+    coverage_path = tmp_path / 'coverage.json'
+    coverage_path.write_text('{"meta": ')
+
+    with pytest.raises(json.JSONDecodeError):
+        coverage.get_coverage_info(coverage_path, loader='stream')
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+
+import copy
+import decimal
+import os
+import pathlib
+import time
+
+from codecov import coverage as coverage_module, coverage_cache
+
+
+def test_write_read(tmp_path, coverage_json):
+    coverage_json['meta']['branch_coverage'] = True
+    coverage_json['files']['codebase/code.py']['executed_branches'] = [[2, 3], [5, -1]]
+    coverage_json['files']['codebase/code.py']['missing_branches'] = [[2, 5]]
+    coverage_json['files']['codebase/other.py'] = copy.deepcopy(coverage_json['files']['codebase/code.py'])
+    coverage_json['files']['codebase/other.py']['executed_lines'] = []
+    coverage_json['files']['codebase/other.py']['executed_branches'] = []
+    coverage = coverage_module.extract_info(coverage_json)
+    cache = coverage_cache.CoverageCache(path=tmp_path)
+
+    cache.write('key', coverage)
+    result = cache.read('key')
+
+    assert result is not None
+    assert result.meta == coverage.meta
+    assert result.info == coverage.info
+    assert isinstance(result.info.percent_covered, float)
+    assert isinstance(result.files, coverage_module.LazyFiles)
+    assert list(result.files) == [pathlib.Path('codebase/code.py'), pathlib.Path('codebase/other.py')]
+    assert not result.files.decoded
+    assert dict(result.files) == dict(coverage.files)
+    assert result.files[pathlib.Path('codebase/code.py')].executed_branches == [[2, 3], [5, -1]]
+    assert result.files[pathlib.Path('codebase/other.py')].executed_lines == []
+
+
+def test_write_read_without_branches(tmp_path, coverage_obj):
+    file_coverage = coverage_obj.files[pathlib.Path('codebase/code.py')]
+    file_coverage.executed_branches = file_coverage.missing_branches = None
+    cache = coverage_cache.CoverageCache(path=tmp_path)
+
+    cache.write('key', coverage_obj)
+    result = cache.read('key')
+
+    assert result is not None
+    assert result.files[pathlib.Path('codebase/code.py')].executed_branches is None
+    assert dict(result.files) == dict(coverage_obj.files)
+
+
+def test_write_read_decimal_percent(tmp_path, coverage_obj):
+    coverage_obj.info.percent_covered = decimal.Decimal('12.5')
+    cache = coverage_cache.CoverageCache(path=tmp_path)
+
+    cache.write('key', coverage_obj)
+    result = cache.read('key')
+
+    assert result is not None
+    assert result.info.percent_covered == decimal.Decimal('12.5')
+    assert isinstance(result.info.percent_covered, decimal.Decimal)
+
+
+def test_read_missing(tmp_path):
+    assert coverage_cache.CoverageCache(path=tmp_path).read('key') is None
+
+
+def test_read_other_schema_version(tmp_path, coverage_obj, monkeypatch):
+    cache = coverage_cache.CoverageCache(path=tmp_path)
+    cache.write('key', coverage_obj)
+
+    monkeypatch.setattr(coverage_cache, 'SCHEMA_VERSION', coverage_cache.SCHEMA_VERSION + 1)
+
+    assert cache.read('key') is None
+
+
+def test_read_invalid(tmp_path):
+    cache = coverage_cache.CoverageCache(path=tmp_path)
+    for key, content in (('empty', b''), ('short', b'COVCACHE'), ('json', b'{"meta": {}}' * 4)):
+        cache.get_file(key).write_bytes(content)
+
+        assert cache.read(key) is None
+
+
+def test_get_key(tmp_path, monkeypatch):
+    report = tmp_path / 'coverage.json'
+    report.write_text('{}')
+    key = coverage_cache.CoverageCache.get_key(coverage_path=report, reader_name='coverage.py-json')
+
+    assert key == coverage_cache.CoverageCache.get_key(coverage_path=report, reader_name='coverage.py-json')
+    assert key != coverage_cache.CoverageCache.get_key(coverage_path=report, reader_name='lcov')
+    monkeypatch.setattr(coverage_cache, 'SCHEMA_VERSION', coverage_cache.SCHEMA_VERSION + 1)
+    assert key != coverage_cache.CoverageCache.get_key(coverage_path=report, reader_name='coverage.py-json')
+    monkeypatch.undo()
+    report.write_text('{ }')
+    assert key != coverage_cache.CoverageCache.get_key(coverage_path=report, reader_name='coverage.py-json')
+
+
+def test_evict(tmp_path, coverage_obj):
+    cache = coverage_cache.CoverageCache(path=tmp_path)
+    for age, key in enumerate(('b', 'a')):
+        cache.write(key, coverage_obj)
+        # Make sure the files have distinct mtimes
+        os.utime(cache.get_file(key), (time.time() - 10 + age,) * 2)
+    cache.max_size = 2 * cache.get_file('a').stat().st_size
+
+    # Reading "b" makes "a" the least recently used entry
+    assert cache.read('b') is not None
+    cache.write('c', coverage_obj)
+
+    assert sorted(path.name.split('.')[0] for path in tmp_path.iterdir()) == ['b', 'c']
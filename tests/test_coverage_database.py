@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+
+import datetime
+import pathlib
+import sqlite3
+
+import pytest
+
+from codecov import coverage_database
+
+SOURCE = """\
+def f(x):
+    if x:
+        return 1
+    return 2
+
+
+def g(y):  # pragma: no cover
+    return y
+"""
+
+
+def lines_to_numbits(lines: list[int]) -> bytes:
+    numbits = bytearray((max(lines) // 8 + 1) if lines else 0)
+    for line in lines:
+        numbits[line // 8] |= 1 << (line % 8)
+    return bytes(numbits)
+
+
+@pytest.fixture
+def make_database(tmp_path):
+    def _(lines: dict[str, list[list[int]]] | None = None, arcs: dict[str, list[tuple[int, int]]] | None = None):
+        path = tmp_path / '.coverage'
+        connection = sqlite3.connect(path)
+        connection.executescript(
+            """
+            CREATE TABLE meta (key text, value text, unique (key));
+            CREATE TABLE file (id integer primary key, path text, unique (path));
+            CREATE TABLE line_bits (file_id integer, context_id integer, numbits blob);
+            CREATE TABLE arc (file_id integer, context_id integer, fromno integer, tono integer);
+            """
+        )
+        connection.executemany(
+            'INSERT INTO meta VALUES (?, ?)',
+            [('version', '7.4.0'), ('when', '2024-01-02 03:04:05'), ('has_arcs', '1' if arcs is not None else '0')],
+        )
+        for file_id, path_str in enumerate((lines or arcs or {}), start=1):
+            connection.execute('INSERT INTO file VALUES (?, ?)', (file_id, path_str))
+            for context_id, context_lines in enumerate((lines or {}).get(path_str, [])):
+                connection.execute(
+                    'INSERT INTO line_bits VALUES (?, ?, ?)', (file_id, context_id, lines_to_numbits(context_lines))
+                )
+            for from_line, to_line in (arcs or {}).get(path_str, []):
+                connection.execute('INSERT INTO arc VALUES (?, 0, ?, ?)', (file_id, from_line, to_line))
+        connection.commit()
+        connection.close()
+        return path
+
+    return _
+
+
+def test_is_coverage_database(make_database, tmp_path):
+    json_path = tmp_path / 'coverage.json'
+    json_path.write_text('{}')
+
+    assert coverage_database.is_coverage_database(make_database(lines={})) is True
+    assert coverage_database.is_coverage_database(json_path) is False
+    assert coverage_database.is_coverage_database(tmp_path / 'missing') is False
+
+
+def test_numbits_to_lines():
+    assert coverage_database.numbits_to_lines(lines_to_numbits([1, 2, 7, 8, 17])) == [1, 2, 7, 8, 17]
+    assert coverage_database.numbits_to_lines(b'') == []
+
+
+def test_read_coverage_data(make_database, tmp_path):
+    path = make_database(
+        lines={
+            str(tmp_path / 'codebase' / 'code.py'): [[1, 2], [2, 4]],
+            '/elsewhere/other.py': [[3]],
+        }
+    )
+
+    data = coverage_database.read_coverage_data(coverage_path=path, root=tmp_path)
+
+    assert data.meta.version == '7.4.0'
+    assert data.meta.timestamp == datetime.datetime(2024, 1, 2, 3, 4, 5)
+    assert data.meta.branch_coverage is False
+    # The lines of all the contexts are merged, the paths below the root are made relative
+    assert data.files == {
+        pathlib.Path('codebase/code.py'): coverage_database.MeasuredFile(
+            path=pathlib.Path('codebase/code.py'), lines={1, 2, 4}, arcs=None
+        ),
+        pathlib.Path('/elsewhere/other.py'): coverage_database.MeasuredFile(
+            path=pathlib.Path('/elsewhere/other.py'), lines={3}, arcs=None
+        ),
+    }
+
+
+def test_read_coverage_data_paths(make_database, tmp_path):
+    path = make_database(lines={str(tmp_path / 'a.py'): [[1]], str(tmp_path / 'b.py'): [[2]]})
+
+    data = coverage_database.read_coverage_data(coverage_path=path, paths={pathlib.Path('b.py')}, root=tmp_path)
+
+    assert list(data.files) == [pathlib.Path('b.py')]
+
+
+def test_read_coverage_data_arcs(make_database, tmp_path):
+    path = make_database(arcs={str(tmp_path / 'a.py'): [(-1, 1), (1, 2), (2, 4), (4, -1)]})
+
+    data = coverage_database.read_coverage_data(coverage_path=path, root=tmp_path)
+
+    assert data.meta.branch_coverage is True
+    assert data.files[pathlib.Path('a.py')].lines == {1, 2, 4}
+    assert data.files[pathlib.Path('a.py')].arcs == {(-1, 1), (1, 2), (2, 4), (4, -1)}
+
+
+def test_read_coverage_data_invalid(tmp_path):
+    path = tmp_path / '.coverage'
+    sqlite3.connect(path).close()
+
+    with pytest.raises(coverage_database.CoverageDataError):
+        coverage_database.read_coverage_data(coverage_path=path)
+
+
+def test_get_coverage_info(make_database, tmp_path, monkeypatch):
+    pytest.importorskip('coverage')
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'code.py').write_text(SOURCE)
+    path = make_database(lines={str(tmp_path / 'code.py'): [[0, 1, 2, 4, 7]], str(tmp_path / 'missing.py'): [[1]]})
+
+    coverage = coverage_database.get_coverage_info(coverage_path=path)
+
+    # The file whose source is missing is left out
+    assert list(coverage.files) == [pathlib.Path('code.py')]
+    file_coverage = coverage.files[pathlib.Path('code.py')]
+    assert file_coverage.executed_lines == [1, 2, 4]
+    assert file_coverage.missing_lines == [3]
+    assert file_coverage.excluded_lines == [7, 8]
+    assert file_coverage.executed_branches is None
+    assert coverage.info.num_statements == 4
+    assert coverage.info.percent_covered_display == '75'
+
+
+def test_get_coverage_info_branches(make_database, tmp_path, monkeypatch):
+    pytest.importorskip('coverage')
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'code.py').write_text(SOURCE)
+    path = make_database(arcs={str(tmp_path / 'code.py'): [(-1, 1), (1, 7), (7, -1), (1, -1), (2, 4), (4, -1)]})
+
+    coverage = coverage_database.get_coverage_info(coverage_path=path)
+
+    file_coverage = coverage.files[pathlib.Path('code.py')]
+    assert file_coverage.executed_branches == [[2, 4]]
+    assert file_coverage.missing_branches == [[2, 3]]
+    assert coverage.info.num_branches == 2
+    assert coverage.info.num_partial_branches == 1
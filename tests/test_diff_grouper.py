@@ -2,8 +2,9 @@
 from __future__ import annotations
 
 import pathlib
+from unittest import mock
 
-from codecov import diff_grouper, groups
+from codecov import coverage as coverage_module, diff_grouper, groups
 
 
 def test_group_annotations(coverage_obj, diff_coverage_obj):
@@ -83,3 +84,78 @@ def test_group_branch_annotations_more_files(coverage_obj_more_files, diff_cover
         groups.Group(file=pathlib.Path('codebase/other.py'), line_start=4, line_end=5),
         groups.Group(file=pathlib.Path('codebase/other.py'), line_start=8, line_end=9),
     ]
+
+
+def test_coverage_group_annotations_does_not_materialize_joiners(coverage_obj):
+    # A huge statement count must not translate into a huge set of joiners
+    coverage_obj.files[pathlib.Path('codebase/code.py')].info.num_statements = 10**12
+
+    result = diff_grouper.get_missing_groups(coverage=coverage_obj)
+
+    assert list(result) == [
+        groups.Group(file=pathlib.Path('codebase/code.py'), line_start=6, line_end=11),
+    ]
+
+
+def test_coverage_group_annotations_skips_fully_covered_files(coverage_obj):
+    coverage_file = coverage_obj.files[pathlib.Path('codebase/code.py')]
+    coverage_file.missing_lines = []
+    coverage_file.info.num_statements = 10**12
+
+    assert not list(diff_grouper.get_missing_groups(coverage=coverage_obj))
+
+
+def test_group_branches_without_missing_branches(coverage_obj):
+    coverage_file = coverage_obj.files[pathlib.Path('codebase/code.py')]
+    coverage_file.missing_branches = None
+    coverage_file.info.num_statements = 10**12
+
+    diff_grouper.group_branches(coverage=coverage_obj)
+
+    assert coverage_file.missing_branches == []
+
+
+def test_missing_groups_are_computed_once(coverage_obj, diff_coverage_obj):
+    with mock.patch(
+        'codecov.diff_grouper.groups.compute_contiguous_groups', wraps=groups.compute_contiguous_groups
+    ) as compute:
+        first = list(diff_grouper.get_diff_missing_groups(coverage=coverage_obj, diff_coverage=diff_coverage_obj))
+        second = list(diff_grouper.get_diff_missing_groups(coverage=coverage_obj, diff_coverage=diff_coverage_obj))
+        project_first = list(diff_grouper.get_missing_groups(coverage=coverage_obj))
+        project_second = list(diff_grouper.get_missing_groups(coverage=coverage_obj))
+
+    assert first == second
+    assert project_first == project_second
+    assert compute.call_count == 2
+
+
+def test_diff_missing_groups_cache_follows_diff_coverage(coverage_obj, diff_coverage_obj, make_diff_coverage):
+    first = list(diff_grouper.get_diff_missing_groups(coverage=coverage_obj, diff_coverage=diff_coverage_obj))
+    other_diff = make_diff_coverage(added_lines={pathlib.Path('codebase/code.py'): [11]}, coverage=coverage_obj)
+
+    second = list(diff_grouper.get_diff_missing_groups(coverage=coverage_obj, diff_coverage=other_diff))
+
+    assert first == [groups.Group(file=pathlib.Path('codebase/code.py'), line_start=6, line_end=8)]
+    assert second == [groups.Group(file=pathlib.Path('codebase/code.py'), line_start=11, line_end=11)]
+
+
+def test_group_branches_lazy(coverage_json):
+    coverage_obj = coverage_module.extract_info(coverage_json)
+    eager_coverage = coverage_module.extract_info(coverage_json)
+    eager_coverage.files = dict(eager_coverage.files)
+
+    diff_grouper.group_branches(coverage=coverage_obj)
+    diff_grouper.group_branches(coverage=eager_coverage)
+
+    # The branches are grouped when the file is decoded
+    assert not coverage_obj.files.decoded  # type: ignore[attr-defined]
+    assert coverage_obj.files == eager_coverage.files
+
+
+def test_get_missing_groups_paths(coverage_obj_more_files):
+    result = list(
+        diff_grouper.get_missing_groups(coverage=coverage_obj_more_files, paths=[pathlib.Path('codebase/other.py')])
+    )
+
+    assert result
+    assert {group.file for group in result} == {pathlib.Path('codebase/other.py')}
@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 from __future__ import annotations
 
+import asyncio
 import base64
 import json
 import pathlib
@@ -89,12 +90,75 @@ def test_get_pr_diff_not_found(gh, session, base_config):
         github.get_pr_diff(github=gh, repository=config.GITHUB_REPOSITORY, pr_number=config.GITHUB_PR_NUMBER)
 
 
+async def collect(chunks):
+    return [chunk async for chunk in chunks]
+
+
+def test_stream_pr_diff_async(async_gh, session, base_config):
+    config = base_config()
+    diff_data = 'diff --git a/file.py b/file.py\nindex 1234567..abcdefg 100644\n--- a/file.py\n+++ b/file.py\n@@ -1,2 +1,2 @@\n-foo\n+bar\n-baz\n+qux\n'
+    session.register(
+        'GET',
+        f'/repos/{config.GITHUB_REPOSITORY}/pulls/{config.GITHUB_PR_NUMBER}',
+        headers={'Accept': 'application/vnd.github.v3.diff'},
+    )(text=diff_data)
+
+    chunks = github.stream_pr_diff_async(
+        github=async_gh, repository=config.GITHUB_REPOSITORY, pr_number=config.GITHUB_PR_NUMBER
+    )
+    assert ''.join(asyncio.run(collect(chunks))) == diff_data
+
+
+@pytest.mark.parametrize('status_code', [403, 404])
+def test_stream_pr_diff_async_error(async_gh, session, base_config, status_code):
+    config = base_config()
+    session.register('GET', f'/repos/{config.GITHUB_REPOSITORY}/pulls/{config.GITHUB_PR_NUMBER}')(
+        status_code=status_code
+    )
+
+    chunks = github.stream_pr_diff_async(
+        github=async_gh, repository=config.GITHUB_REPOSITORY, pr_number=config.GITHUB_PR_NUMBER
+    )
+    with pytest.raises(github.CannotGetPullRequest):
+        asyncio.run(collect(chunks))
+
+
+def test_stream_pr_diff(gh, session, base_config):
+    config = base_config()
+    diff_data = 'diff --git a/file.py b/file.py\nindex 1234567..abcdefg 100644\n--- a/file.py\n+++ b/file.py\n@@ -1,2 +1,2 @@\n-foo\n+bar\n-baz\n+qux\n'
+    session.register(
+        'GET',
+        f'/repos/{config.GITHUB_REPOSITORY}/pulls/{config.GITHUB_PR_NUMBER}',
+        headers={'Accept': 'application/vnd.github.v3.diff'},
+    )(text=diff_data)
+
+    result = github.stream_pr_diff(github=gh, repository=config.GITHUB_REPOSITORY, pr_number=config.GITHUB_PR_NUMBER)
+    assert ''.join(result) == diff_data
+
+
+@pytest.mark.parametrize('status_code', [403, 404])
+def test_stream_pr_diff_error(gh, session, base_config, status_code):
+    config = base_config()
+    session.register('GET', f'/repos/{config.GITHUB_REPOSITORY}/pulls/{config.GITHUB_PR_NUMBER}')(
+        status_code=status_code
+    )
+
+    with pytest.raises(github.CannotGetPullRequest):
+        list(github.stream_pr_diff(github=gh, repository=config.GITHUB_REPOSITORY, pr_number=config.GITHUB_PR_NUMBER))
+
+
 def test_get_my_login(gh, session):
     session.register('GET', '/user')(json={'login': 'foo', 'id': 123, 'name': 'bar', 'email': 'baz'})
     result = github.get_my_login(github=gh)
     assert result == github.User(name='bar', email='baz', login='foo')
 
 
+def test_get_my_login_async(async_gh, session):
+    session.register('GET', '/user')(json={'login': 'foo', 'id': 123, 'name': 'bar', 'email': None})
+    result = asyncio.run(github.get_my_login_async(github=async_gh))
+    assert result == github.User(name='bar', email='123+foo@users.noreply.github.com', login='foo')
+
+
 def test_get_my_login_github_bot(gh, session):
     session.register('GET', '/user')(status_code=403)
     result = github.get_my_login(github=gh)
@@ -111,9 +175,9 @@ def test_get_my_login_github_bot(gh, session):
 )
 def test_post_comment_create(gh, session, existing_comments):
     session.register('GET', '/repos/foo/bar/issues/123/comments')(json=existing_comments)
-    session.register('POST', '/repos/foo/bar/issues/123/comments', json={'body': 'hi!'})()
+    session.register('POST', '/repos/foo/bar/issues/123/comments', json={'body': 'hi!'})(json={'id': 789})
 
-    github.post_comment(
+    result = github.post_comment(
         github=gh,
         user=github.User(name='foo', email='bar', login='foo'),
         repository='foo/bar',
@@ -122,6 +186,8 @@ def test_post_comment_create(gh, session, existing_comments):
         marker='marker',
     )
 
+    assert result == 789
+
 
 def test_post_comment_content_too_long_error(gh, session):
     session.register('GET', '/repos/foo/bar/issues/123/comments')(json=[])
@@ -162,15 +228,243 @@ def test_post_comment_update(gh, session):
     session.register('GET', '/repos/foo/bar/issues/123/comments')(json=[comment])
     session.register('PATCH', '/repos/foo/bar/issues/comments/456', json={'body': 'hi!'})()
 
-    github.post_comment(
+    result = github.post_comment(
+        github=gh,
+        user=github.User(name='foo', email='bar', login='foo'),
+        repository='foo/bar',
+        pr_number=123,
+        contents='hi!',
+        marker='marker',
+    )
+
+    assert result == 456
+
+
+def test_post_comment_update_newest_first(gh, session):
+    def link(page):
+        return f'<https://api.github.com/repositories/1/issues/123/comments?per_page=100&page={page}>'
+
+    def comment(comment_id, body='Hi!'):
+        return {'user': {'login': 'foo'}, 'body': body, 'id': comment_id}
+
+    session.register('GET', '/repos/foo/bar/issues/123/comments', params={'per_page': 100})(
+        json=[comment(1, 'old marker')],
+        headers={'link': f'{link(2)}; rel="next", {link(4)}; rel="last"'},
+    )
+    session.register('GET', link(4)[1:-1])(
+        json=[comment(7)],
+        headers={'link': f'{link(3)}; rel="prev", {link(1)}; rel="first"'},
+    )
+    session.register('GET', link(3)[1:-1])(
+        json=[comment(4, 'marker'), comment(5, 'marker'), comment(6)],
+        headers={'link': f'{link(2)}; rel="prev", {link(4)}; rel="next", {link(1)}; rel="first"'},
+    )
+    session.register('PATCH', '/repos/foo/bar/issues/comments/5', json={'body': 'hi!'})()
+
+    result = github.post_comment(
+        github=gh,
+        user=github.User(name='foo', email='bar', login='foo'),
+        repository='foo/bar',
+        pr_number=123,
+        contents='hi!',
+        marker='marker',
+    )
+
+    # Page 2 was never requested
+    assert result == 5
+    assert session.responses == []
+
+
+def test_find_comments(gh, session):
+    session.register('GET', '/repos/foo/bar/issues/123/comments')(
+        json=[
+            {'user': {'login': 'foo'}, 'body': 'old api-marker', 'id': 1},
+            {'user': {'login': 'foo'}, 'body': 'web-marker', 'id': 2},
+            {'user': {'login': 'bar'}, 'body': 'api-marker', 'id': 3},
+            {'user': {'login': 'foo'}, 'body': 'api-marker', 'id': 4},
+        ]
+    )
+
+    result = github.find_comments(
+        github=gh,
+        user=github.User(name='foo', email='bar', login='foo'),
+        repository='foo/bar',
+        pr_number=123,
+        markers=['api-marker', 'web-marker', 'docs-marker'],
+    )
+
+    assert result == {'api-marker': 4, 'web-marker': 2}
+
+
+def test_find_comments_no_markers(gh, session):
+    result = github.find_comments(
+        github=gh,
+        user=github.User(name='foo', email='bar', login='foo'),
+        repository='foo/bar',
+        pr_number=123,
+        markers=[],
+    )
+
+    assert result == {}
+
+
+def test_post_comment_create_without_search(gh, session):
+    session.register('POST', '/repos/foo/bar/issues/123/comments', json={'body': 'hi!'})(json={'id': 789})
+
+    result = github.post_comment(
+        github=gh,
+        user=github.User(name='foo', email='bar', login='foo'),
+        repository='foo/bar',
+        pr_number=123,
+        contents='hi!',
+        marker='marker',
+        search_comments=False,
+    )
+
+    assert result == 789
+
+
+def test_post_comment_create_no_match_in_pages(gh, session):
+    def link(page):
+        return f'<https://api.github.com/repositories/1/issues/123/comments?per_page=100&page={page}>'
+
+    def comment(comment_id):
+        return {'user': {'login': 'foo'}, 'body': 'Hi!', 'id': comment_id}
+
+    session.register('GET', '/repos/foo/bar/issues/123/comments', params={'per_page': 100})(
+        json=[comment(1)],
+        headers={'link': f'{link(2)}; rel="next", {link(3)}; rel="last"'},
+    )
+    session.register('GET', link(3)[1:-1])(
+        json=[comment(3)],
+        headers={'link': f'{link(2)}; rel="prev", {link(1)}; rel="first"'},
+    )
+    session.register('GET', link(2)[1:-1])(
+        json=[comment(2)],
+        headers={'link': f'{link(1)}; rel="prev", {link(3)}; rel="next", {link(1)}; rel="first"'},
+    )
+    session.register('POST', '/repos/foo/bar/issues/123/comments', json={'body': 'hi!'})(json={'id': 789})
+
+    result = github.post_comment(
+        github=gh,
+        user=github.User(name='foo', email='bar', login='foo'),
+        repository='foo/bar',
+        pr_number=123,
+        contents='hi!',
+        marker='marker',
+    )
+
+    # Every page was requested once
+    assert result == 789
+    assert session.responses == []
+
+
+def test_post_comment_update_known_id(gh, session):
+    session.register('PATCH', '/repos/foo/bar/issues/comments/456', json={'body': 'hi!'})()
+
+    result = github.post_comment(
         github=gh,
         user=github.User(name='foo', email='bar', login='foo'),
         repository='foo/bar',
         pr_number=123,
         contents='hi!',
         marker='marker',
+        comment_id=456,
     )
 
+    assert result == 456
+
+
+def test_post_comment_known_id_deleted(gh, session):
+    session.register('PATCH', '/repos/foo/bar/issues/comments/456', json={'body': 'hi!'})(status_code=404)
+    session.register('GET', '/repos/foo/bar/issues/123/comments')(json=[])
+    session.register('POST', '/repos/foo/bar/issues/123/comments', json={'body': 'hi!'})(json={'id': 789})
+
+    result = github.post_comment(
+        github=gh,
+        user=github.User(name='foo', email='bar', login='foo'),
+        repository='foo/bar',
+        pr_number=123,
+        contents='hi!',
+        marker='marker',
+        comment_id=456,
+    )
+
+    assert result == 789
+
+
+def test_get_cached_comment_id(gh, session, base_config):
+    config = base_config(ANNOTATIONS_DATA_BRANCH='annotations-data')
+    content = base64.b64encode(b'{"comment_id": 456}').decode()
+    session.register('GET', '/repos/codecov/foobar/contents/123-comment.json', params={'ref': 'annotations-data'})(
+        json={'content': content, 'sha': 'abc'}
+    )
+
+    assert github.get_cached_comment_id(github=gh, pr_number=123, config=config) == 456
+
+
+def test_get_cached_comment_id_missing(gh, session, base_config):
+    config = base_config(ANNOTATIONS_DATA_BRANCH='annotations-data', SUBPROJECT_ID='front')
+    session.register('GET', '/repos/codecov/foobar/contents/123-front-comment.json')(status_code=404)
+
+    assert github.get_cached_comment_id(github=gh, pr_number=123, config=config) is None
+
+
+def test_get_cached_comment_id_no_branch(gh, base_config):
+    assert github.get_cached_comment_id(github=gh, pr_number=123, config=base_config()) is None
+
+
+def test_write_cached_comment_id(gh, session, base_config):
+    config = base_config(ANNOTATIONS_DATA_BRANCH='annotations-data')
+    session.register('GET', '/repos/codecov/foobar/contents/123-comment.json')(json={'sha': 'abc'})
+    session.register(
+        'PUT',
+        '/repos/codecov/foobar/contents/123-comment.json',
+        json=lambda body: body['sha'] == 'abc' and base64.b64decode(body['content']) == b'{"comment_id": 456}',
+    )()
+
+    github.write_cached_comment_id(
+        github=gh, user=github.User(name='foo', email='bar', login='foo'), pr_number=123, config=config, comment_id=456
+    )
+
+    assert session.responses == []
+
+
+def test_write_cached_comment_id_not_cached(gh, session, base_config):
+    config = base_config(ANNOTATIONS_DATA_BRANCH='annotations-data')
+    session.register('PUT', '/repos/codecov/foobar/contents/123-comment.json', json=lambda body: body['sha'] is None)()
+
+    github.write_cached_comment_id(
+        github=gh,
+        user=github.User(name='foo', email='bar', login='foo'),
+        pr_number=123,
+        config=config,
+        comment_id=456,
+        cached=False,
+    )
+
+    assert session.responses == []
+
+
+def test_write_cached_comment_id_not_cached_but_exists(gh, session, base_config):
+    config = base_config(ANNOTATIONS_DATA_BRANCH='annotations-data')
+    session.register('PUT', '/repos/codecov/foobar/contents/123-comment.json', json=lambda body: body['sha'] is None)(
+        status_code=422
+    )
+    session.register('GET', '/repos/codecov/foobar/contents/123-comment.json')(json={'sha': 'abc'})
+    session.register('PUT', '/repos/codecov/foobar/contents/123-comment.json', json=lambda body: body['sha'] == 'abc')()
+
+    github.write_cached_comment_id(
+        github=gh,
+        user=github.User(name='foo', email='bar', login='foo'),
+        pr_number=123,
+        config=config,
+        comment_id=456,
+        cached=False,
+    )
+
+    assert session.responses == []
+
 
 def test_post_comment_update_error(gh, session):
     comment = {
@@ -1,9 +1,17 @@
 # -*- coding: utf-8 -*-
 from __future__ import annotations
 
+import asyncio
+import os
+import time
+from unittest import mock
+
+import httpx
 import pytest
 
-from codecov import github_client
+from codecov import github_client, timing
+
+TOKEN = 'foo'  # noqa: S105
 
 
 def test_github_client_get(session, gh):
@@ -28,6 +36,121 @@ def test_github_client_get_bytes(session, gh):
     assert gh.repos('a/b').issues().get(a=1, use_bytes=True) == b'foobar'
 
 
+def test_github_client_get_stream(session, gh):
+    session.register('GET', '/repos/a/b/issues', timeout=60, params={'a': 1})(
+        text='foobar', headers={'content-type': 'text/plain'}
+    )
+
+    assert ''.join(gh.repos('a/b').issues().get(a=1, use_stream=True)) == 'foobar'
+
+
+def test_github_client_get_stream_error(session, gh):
+    session.register('GET', '/repos')(json={'foo': 'bar'}, status_code=403)
+
+    chunks = gh.repos.get(use_stream=True)
+    with pytest.raises(github_client.Forbidden) as exc_info:
+        list(chunks)
+
+    assert str(exc_info.value) == "{'foo': 'bar'}"
+
+
+def test_github_client_get_stream_httpx():
+    def handler(request):
+        assert request.url.path == '/repos/a/b/pulls/1'
+        return httpx.Response(200, content=iter([b'diff --git', b' a/b', b'\n']))
+
+    session = httpx.Client(base_url=github_client.BASE_URL, transport=httpx.MockTransport(handler))
+    gh = github_client.GitHub(session=session)
+
+    assert ''.join(gh.repos('a/b').pulls(1).get(use_stream=True)) == 'diff --git a/b\n'
+
+
+def test_github_client_get_pages(session, gh):
+    session.register('GET', '/repos/a/b/issues', params={'per_page': 2})(
+        json=[1, 2], headers={'link': '<https://api.github.com/repos/a/b/issues?per_page=2&page=2>; rel="next"'}
+    )
+    session.register('GET', 'https://api.github.com/repos/a/b/issues?per_page=2&page=2')(json=[3])
+
+    assert list(gh.repos('a/b').issues().get(per_page=2, use_pages=True)) == [[1, 2], [3]]
+
+
+def test_github_client_get_pages_reverse(session, gh):
+    session.register('GET', '/repos/a/b/issues')(json=[1, 2])
+
+    assert list(gh.repos('a/b').issues().get(use_pages=True, reverse_pages=True)) == [[1, 2]]
+
+
+def test_github_client_get_pages_not_a_list(session, gh):
+    session.register('GET', '/repos/a/b/issues')(json={'message': 'not a listing'})
+
+    with pytest.raises(github_client.ApiError):
+        list(gh.repos('a/b').issues().get(use_pages=True))
+
+
+def test_github_client_get_pages_reverse_all(session, gh):
+    def link(page):
+        return f'<https://api.github.com/repos/a/b/issues?page={page}>'
+
+    session.register('GET', '/repos/a/b/issues')(
+        json=[1], headers={'link': f'{link(2)}; rel="next", {link(3)}; rel="last"'}
+    )
+    session.register('GET', link(3)[1:-1])(json=[3], headers={'link': f'{link(2)}; rel="prev", {link(1)}; rel="first"'})
+    session.register('GET', link(2)[1:-1])(
+        json=[2], headers={'link': f'{link(1)}; rel="prev", {link(3)}; rel="next", {link(1)}; rel="first"'}
+    )
+
+    # The first page is only requested once
+    assert list(gh.repos('a/b').issues().get(use_pages=True, reverse_pages=True)) == [[3], [2], [1]]
+    assert session.responses == []
+
+
+def test_async_github_client_get():
+    def handler(request):
+        assert request.url.path == '/repos/a/b/issues'
+        assert request.url.params['a'] == '1'
+        return httpx.Response(200, json={'foo': 'bar'})
+
+    async def get():
+        transport = httpx.MockTransport(handler)
+        async with httpx.AsyncClient(base_url=github_client.BASE_URL, transport=transport) as session:
+            return await github_client.AsyncGitHub(session=session).repos('a/b').issues().get(a=1)
+
+    assert asyncio.run(get()) == {'foo': 'bar'}
+
+
+def test_async_github_client_get_error():
+    async def get():
+        transport = httpx.MockTransport(lambda request: httpx.Response(404, json={'message': 'Not Found'}))
+        async with httpx.AsyncClient(base_url=github_client.BASE_URL, transport=transport) as session:
+            return await github_client.AsyncGitHub(session=session).repos('a/b').get()
+
+    with pytest.raises(github_client.NotFound):
+        asyncio.run(get())
+
+
+def test_async_github_client_get_stream():
+    diff = 'diff --git a/é b/é\n'
+
+    async def get():
+        transport = httpx.MockTransport(lambda request: httpx.Response(200, text=diff))
+        async with httpx.AsyncClient(base_url=github_client.BASE_URL, transport=transport) as session:
+            gh = github_client.AsyncGitHub(session=session)
+            return [chunk async for chunk in gh.repos('a/b').pulls(1).get(use_stream=True)]
+
+    assert ''.join(asyncio.run(get())) == diff
+
+
+def test_async_github_client_get_stream_error():
+    async def get():
+        transport = httpx.MockTransport(lambda request: httpx.Response(404, json={'message': 'Not Found'}))
+        async with httpx.AsyncClient(base_url=github_client.BASE_URL, transport=transport) as session:
+            gh = github_client.AsyncGitHub(session=session)
+            return [chunk async for chunk in gh.repos('a/b').pulls(1).get(use_stream=True)]
+
+    with pytest.raises(github_client.NotFound):
+        asyncio.run(get())
+
+
 def test_github_client_get_headers(session, gh):
     session.register('GET', '/repos/a/b/issues', timeout=60, params={'a': 1})(
         json={'foo': 'bar'},
@@ -79,3 +202,314 @@ def test_github_client_get_error_non_json(session, gh):
         gh.repos.get()
 
     assert str(exc_info.value) == "b'{foobar'"
+
+
+def test_create_session():
+    session = github_client.create_session(token=TOKEN, max_connections=4, keepalive_expiry=2.5)
+
+    assert session.base_url == github_client.BASE_URL
+    assert session.headers['Authorization'] == f'token {TOKEN}'
+    # Compression is opt-in
+    assert session.headers['Accept-Encoding'] == 'identity'
+    pool = session._transport._pool  # pylint: disable=protected-access
+    assert pool._max_connections == 4  # pylint: disable=protected-access
+    assert pool._keepalive_expiry == 2.5  # pylint: disable=protected-access
+
+
+def test_create_session_with_compression():
+    session = github_client.create_session(token=TOKEN, compression=True)
+
+    assert 'gzip' in session.headers['Accept-Encoding']
+
+
+def test_create_session_http2_unavailable(caplog):
+    with mock.patch('importlib.util.find_spec', return_value=None):
+        session = github_client.create_session(token=TOKEN, http2=True)
+
+    assert session._transport._pool._http2 is False  # pylint: disable=protected-access
+    assert 'falling back to HTTP/1.1' in caplog.text
+
+
+def test_github_client_timeout(session):
+    timeout = httpx.Timeout(30, connect=5)
+    session.register('GET', '/user', timeout=timeout)(json={'login': 'foo'})
+
+    assert github_client.GitHub(session=session, timeout=timeout).user.get() == {'login': 'foo'}
+
+
+def make_cached_gh(tmp_path, requests, body=b'{"foo": "bar"}', content_type='application/json'):
+    def handler(request):
+        requests.append(request)
+        if request.headers.get('If-None-Match') == '"v1"':
+            return httpx.Response(304, headers={'ETag': '"v1"'})
+        return httpx.Response(200, headers={'ETag': '"v1"', 'Content-Type': content_type}, content=body)
+
+    session = httpx.Client(base_url=github_client.BASE_URL, transport=httpx.MockTransport(handler))
+    return github_client.GitHub(session=session, cache=github_client.HttpCache(path=tmp_path))
+
+
+def test_http_cache_not_modified(tmp_path):
+    requests = []
+    gh = make_cached_gh(tmp_path, requests)
+
+    assert gh.repos('a/b').get() == {'foo': 'bar'}
+    assert gh.repos('a/b').get() == {'foo': 'bar'}
+
+    assert 'If-None-Match' not in requests[0].headers
+    assert requests[1].headers['If-None-Match'] == '"v1"'
+
+
+def test_http_cache_key(tmp_path):
+    requests = []
+    gh = make_cached_gh(tmp_path, requests)
+
+    gh.repos('a/b').get()
+    gh.repos('a/b').get(page=2)
+    gh.repos('a/b').get(headers={'Accept': 'application/vnd.github.v3.diff'}, use_text=True)
+
+    assert all('If-None-Match' not in request.headers for request in requests)
+
+
+def test_http_cache_not_for_writes(tmp_path):
+    requests = []
+    gh = make_cached_gh(tmp_path, requests)
+
+    gh.repos('a/b').patch(foo='bar')
+    gh.repos('a/b').patch(foo='bar')
+
+    assert 'If-None-Match' not in requests[1].headers
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_http_cache_stream(tmp_path):
+    requests = []
+    diff = 'diff --git a/é b/é\n'
+    gh = make_cached_gh(tmp_path, requests, body=diff.encode(), content_type='text/plain; charset=utf-8')
+
+    assert ''.join(gh.repos('a/b').pulls(1).get(use_stream=True)) == diff
+    assert ''.join(gh.repos('a/b').pulls(1).get(use_stream=True)) == diff
+
+    assert requests[1].headers['If-None-Match'] == '"v1"'
+
+
+def test_http_cache_stream_written_as_received(tmp_path):
+    cache = github_client.HttpCache(path=tmp_path)
+    first = b'x' * 100_000
+    response = httpx.Response(200, headers={'ETag': '"v1"'}, content=iter([first, b'second']))
+
+    chunks = cache.tee('key', response)
+    assert next(chunks) == first
+    # The chunks received so far are already on disk, not kept in memory
+    (temporary_file,) = tmp_path.glob('*.tmp')
+    assert temporary_file.read_bytes().endswith(b'\n' + first)
+    assert list(chunks) == [b'second']
+
+    assert list(tmp_path.iterdir()) == [cache.get_file('key')]
+    assert cache.read('key') == ({'status_code': 200, 'headers': {'etag': '"v1"'}}, first + b'second')
+
+
+def test_http_cache_stream_incomplete(tmp_path):
+    cache = github_client.HttpCache(path=tmp_path)
+    response = httpx.Response(200, headers={'ETag': '"v1"'}, content=iter([b'first', b'second']))
+
+    chunks = cache.tee('key', response)
+    assert next(chunks) == b'first'
+    chunks.close()
+
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_http_cache_stream_not_modified_in_chunks(tmp_path, monkeypatch):
+    monkeypatch.setattr(github_client, 'HTTP_CACHE_CHUNK_SIZE', 4)
+    requests = []
+    diff = 'diff --git a/é b/é\n'
+    gh = make_cached_gh(tmp_path, requests, body=diff.encode(), content_type='text/plain; charset=utf-8')
+    assert ''.join(gh.repos('a/b').pulls(1).get(use_stream=True)) == diff
+
+    chunks = list(gh.repos('a/b').pulls(1).get(use_stream=True))
+
+    assert requests[1].headers['If-None-Match'] == '"v1"'
+    assert len(chunks) > 1
+    assert ''.join(chunks) == diff
+
+
+@pytest.mark.parametrize('use_stream', [False, True])
+def test_http_cache_not_modified_evicted(tmp_path, use_stream):
+    requests = []
+    diff = 'diff --git a/b b/b\n'
+    gh = make_cached_gh(tmp_path, requests, body=diff.encode(), content_type='text/plain')
+
+    # The entry is evicted between the conditional request and the 304
+    def prepare(key, kw):
+        kw['headers'] = {'If-None-Match': '"v1"'}
+
+    with mock.patch.object(gh.cache, 'prepare', side_effect=prepare):
+        if use_stream:
+            result = ''.join(gh.repos('a/b').pulls(1).get(use_stream=True))
+        else:
+            result = gh.repos('a/b').pulls(1).get(use_text=True)
+
+    assert result == diff
+    assert [request.headers.get('If-None-Match') for request in requests] == ['"v1"', None]
+
+
+def test_http_cache_stream_async(tmp_path):
+    requests = []
+    diff = 'diff --git a/é b/é\n'
+
+    def handler(request):
+        requests.append(request)
+        if request.headers.get('If-None-Match') == '"v1"':
+            return httpx.Response(304, headers={'ETag': '"v1"'})
+        return httpx.Response(200, headers={'ETag': '"v1"', 'Content-Type': 'text/plain; charset=utf-8'}, content=diff)
+
+    async def get():
+        transport = httpx.MockTransport(handler)
+        async with httpx.AsyncClient(base_url=github_client.BASE_URL, transport=transport) as session:
+            gh = github_client.AsyncGitHub(session=session, cache=github_client.HttpCache(path=tmp_path))
+            return [''.join([chunk async for chunk in gh.repos('a/b').pulls(1).get(use_stream=True)]) for _ in range(2)]
+
+    assert asyncio.run(get()) == [diff, diff]
+    assert requests[1].headers['If-None-Match'] == '"v1"'
+
+
+def test_http_cache_evict(tmp_path):
+    cache = github_client.HttpCache(path=tmp_path)
+    response = httpx.Response(200, headers={'ETag': '"v1"'}, content=b'x' * 100)
+    for age, key in enumerate(('b', 'a')):
+        cache.write(key, response, [response.content])
+        # Make sure the files have distinct mtimes
+        os.utime(cache.get_file(key), (time.time() - 10 + age,) * 2)
+    cache.max_size = 2 * cache.get_file('a').stat().st_size
+
+    # Reading "b" makes "a" the least recently used entry
+    assert cache.read('b') is not None
+    cache.write('c', response, [response.content])
+
+    assert sorted(path.stem for path in tmp_path.iterdir()) == ['b', 'c']
+
+
+def make_retrying_gh(responses, **policy_kwargs):
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        response = responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    sleep = mock.Mock()
+    session = httpx.Client(base_url=github_client.BASE_URL, transport=httpx.MockTransport(handler))
+    retry = github_client.RetryPolicy(sleep=sleep, **policy_kwargs)
+    return github_client.GitHub(session=session, retry=retry), requests, sleep
+
+
+def test_retry_server_error():
+    gh, requests, sleep = make_retrying_gh([httpx.Response(503), httpx.Response(200, json={'foo': 'bar'})])
+
+    assert gh.repos.get() == {'foo': 'bar'}
+    assert len(requests) == 2
+    delay = sleep.call_args.args[0]
+    assert 0.5 <= delay <= 1
+    assert gh.retry.stats == github_client.RetryStats(retries=1, rate_limited=0, waited=delay)
+
+
+def test_retry_transport_error():
+    gh, requests, sleep = make_retrying_gh([httpx.ConnectError('boom'), httpx.Response(200, json={'foo': 'bar'})])
+
+    assert gh.repos.get() == {'foo': 'bar'}
+    assert len(requests) == 2
+
+
+def test_retry_not_idempotent():
+    gh, requests, sleep = make_retrying_gh([httpx.Response(502), httpx.ConnectError('boom')])
+
+    with pytest.raises(github_client.ApiError):
+        gh.repos.post(foo='bar')
+    with pytest.raises(httpx.ConnectError):
+        gh.repos.post(foo='bar')
+    sleep.assert_not_called()
+
+
+def test_retry_gives_up():
+    gh, requests, sleep = make_retrying_gh([httpx.Response(500)] * 3, max_retries=2)
+
+    with pytest.raises(github_client.ApiError):
+        gh.repos.get()
+    assert len(requests) == 3
+    assert [call.args[0] <= 2**attempt for attempt, call in enumerate(sleep.call_args_list)] == [True, True]
+
+
+def test_retry_rate_limited_retry_after():
+    gh, requests, sleep = make_retrying_gh(
+        [
+            httpx.Response(403, headers={'Retry-After': '2'}, json={'message': 'You exceeded a secondary rate limit'}),
+            httpx.Response(201, json={'id': 1}),
+        ]
+    )
+
+    assert gh.repos.post(foo='bar') == {'id': 1}
+    sleep.assert_called_once_with(2.0)
+    assert gh.retry.stats.rate_limited == 1
+
+
+def test_retry_rate_limited_reset():
+    reset = int(time.time()) + 10
+    headers = {'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset': str(reset)}
+    gh, requests, sleep = make_retrying_gh([httpx.Response(429, headers=headers), httpx.Response(200, json={})])
+
+    gh.repos.get()
+
+    assert 9 <= sleep.call_args.args[0] <= 11
+
+
+def test_retry_rate_limited_too_long():
+    headers = {'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset': str(int(time.time()) + 3600)}
+    gh, requests, sleep = make_retrying_gh([httpx.Response(403, headers=headers, json={'message': 'API rate limit'})])
+
+    with pytest.raises(github_client.RateLimited):
+        gh.repos.get()
+    sleep.assert_not_called()
+
+
+def test_retry_forbidden():
+    gh, requests, sleep = make_retrying_gh([httpx.Response(403, json={'message': 'Resource not accessible'})])
+
+    with pytest.raises(github_client.Forbidden):
+        gh.repos.get()
+    sleep.assert_not_called()
+
+
+def test_retry_stream():
+    gh, requests, sleep = make_retrying_gh([httpx.Response(502, text='bad gateway'), httpx.Response(200, text='diff')])
+
+    assert ''.join(gh.repos.get(use_stream=True)) == 'diff'
+    assert len(requests) == 2
+
+
+def test_retry_async():
+    responses = [httpx.Response(503), httpx.Response(200, json={'foo': 'bar'})]
+
+    async def get():
+        transport = httpx.MockTransport(lambda request: responses.pop(0))
+        async with httpx.AsyncClient(base_url=github_client.BASE_URL, transport=transport) as session:
+            gh = github_client.AsyncGitHub(session=session, retry=github_client.RetryPolicy())
+            with mock.patch('asyncio.sleep') as sleep:
+                return await gh.repos.get(), sleep
+
+    result, sleep = asyncio.run(get())
+
+    assert result == {'foo': 'bar'}
+    sleep.assert_awaited_once()
+
+
+def test_github_client_records_timings():
+    gh, requests, sleep = make_retrying_gh([httpx.Response(503), httpx.Response(200, json={})])
+
+    gh.repos('a/b').get()
+
+    assert [(request.method, request.path, request.status) for request in timing.timer.requests] == [
+        ('GET', '/repos/a/b', 503),
+        ('GET', '/repos/a/b', 200),
+    ]
@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+
+import array
+import functools
+import itertools
+import random
+
+import pytest
+
+from codecov import coverage, groups
+
+
+def reference_compute_contiguous_groups(
+    values: list[int], separators: set[int], joiners: set[int], max_gap: int
+) -> list[tuple[int, int]]:
+    """The original set-based implementation, kept to check the interval-based one."""
+    contiguous_groups: list[tuple[int, int]] = []
+    for _, contiguous_group in itertools.groupby(zip(values, itertools.count(1)), lambda x: x[1] - x[0]):
+        grouped_values = (e[0] for e in contiguous_group)
+        first = next(grouped_values)
+        try:
+            *_, last = grouped_values
+        except ValueError:
+            last = first
+        contiguous_groups.append((first, last))
+
+    def reducer(acc: list[tuple[int, int]], group: tuple[int, int]) -> list[tuple[int, int]]:
+        if not acc:
+            return [group]
+
+        last_start, last_end = acc[-1]
+        next_start, next_end = group
+
+        gap = set(range(last_end + 1, next_start)) - joiners
+
+        if len(gap) <= max_gap and not gap & separators:
+            acc[-1] = (last_start, next_end)
+            return acc
+
+        acc.append(group)
+        return acc
+
+    return functools.reduce(reducer, contiguous_groups, [])
+
+
+def test_sorted_lines():
+    lines = groups.SortedLines([5, 1, 3, 3, 9])
+
+    assert list(lines) == [1, 3, 5, 9]
+    assert len(lines) == 4
+    assert 3 in lines
+    assert 4 not in lines
+    assert 10 not in lines
+    assert lines.count(1, 6) == 3
+    assert lines.count(2, 3) == 0
+    assert lines.count(6, 2) == 0
+    assert lines.count(0, 100) == 4
+
+
+def test_line_union():
+    lines = groups.LineUnion([1, 4, 9], [2, 3])
+
+    assert 3 in lines
+    assert 9 in lines
+    assert 5 not in lines
+    assert lines.count(1, 5) == 4
+    assert lines.count(5, 9) == 0
+    assert lines.count(9, 1) == 0
+
+
+def test_line_union_of_lines():
+    executed = coverage.Lines([1, 4, 9])
+    lines = groups.LineUnion(executed, [2, 3])
+
+    assert type(lines.sequences[0]) is array.array
+    assert 4 in lines
+    assert 5 not in lines
+    assert lines.count(1, 5) == 4
+    # The lines are copied, not exported to a view that would prevent resizing them
+    executed.append(10)
+    assert 10 not in lines
+
+
+def test_line_complement():
+    lines = groups.LineComplement(start=1, stop=10, excluded=groups.SortedLines([2, 3, 7]))
+
+    assert 1 in lines
+    assert 2 not in lines
+    assert 0 not in lines
+    assert 10 not in lines
+    assert lines.count(1, 10) == 6
+    assert lines.count(-5, 4) == 1
+    assert lines.count(8, 100) == 2
+    assert lines.count(20, 30) == 0
+
+
+def test_as_line_set():
+    lines = groups.SortedLines([1, 2])
+    union = groups.LineUnion([1])
+
+    assert groups.as_line_set(lines) is lines
+    assert groups.as_line_set(union) is union
+    assert list(groups.as_line_set({2, 1})) == [1, 2]
+
+
+class EvenLines:
+    """A LineSet that can't be iterated over."""
+
+    def __contains__(self, line: object) -> bool:
+        return isinstance(line, int) and line % 2 == 0
+
+    def count(self, start: int, stop: int) -> int:
+        return (stop - 1) // 2 - (start - 1) // 2
+
+
+def test_as_line_set_other_implementation():
+    lines = EvenLines()
+
+    assert groups.as_line_set(lines) is lines
+
+
+def test_compute_contiguous_groups_other_line_set():
+    result = groups.compute_contiguous_groups(values=[1, 3, 7], separators=EvenLines(), joiners=set(), max_gap=3)
+
+    assert result == [(1, 1), (3, 3), (7, 7)]
+
+
+@pytest.mark.parametrize(
+    'values, separators, joiners, max_gap, expected',
+    [
+        ([], set(), set(), 3, []),
+        ([1, 2, 3], set(), set(), 0, [(1, 3)]),
+        ([1, 5], set(), set(), 3, [(1, 5)]),
+        ([1, 6], set(), set(), 3, [(1, 1), (6, 6)]),
+        ([1, 6], set(), {2}, 3, [(1, 6)]),
+        ([1, 5], {3}, set(), 3, [(1, 1), (5, 5)]),
+        ([1, 5], {3}, {3}, 3, [(1, 5)]),
+        ([1, 100_000], set(), set(range(2, 100_000)), 0, [(1, 100_000)]),
+    ],
+)
+def test_compute_contiguous_groups(values, separators, joiners, max_gap, expected):
+    result = groups.compute_contiguous_groups(values=values, separators=separators, joiners=joiners, max_gap=max_gap)
+
+    assert result == expected
+
+
+@pytest.mark.parametrize('seed', range(100))
+def test_compute_contiguous_groups_with_complement_joiners(seed):
+    rng = random.Random(seed)  # noqa: S311
+    size = rng.choice([10, 50, 300])
+    lines = range(1, size)
+    executed = sorted(rng.sample(lines, rng.randint(0, size // 2)))
+    excluded = sorted(set(rng.sample(lines, rng.randint(0, size // 4))) - set(executed))
+    values = sorted(rng.sample(sorted(set(lines) - set(executed) - set(excluded)), rng.randint(0, size // 4)))
+    separators = {*executed, *excluded}
+
+    result = groups.compute_contiguous_groups(
+        values=values,
+        separators=groups.LineUnion(executed, excluded),
+        joiners=groups.LineComplement(start=1, stop=size - 5, excluded=groups.LineUnion(executed, excluded)),
+        max_gap=3,
+    )
+
+    assert result == reference_compute_contiguous_groups(
+        values=values, separators=separators, joiners=set(range(1, size - 5)) - separators, max_gap=3
+    )
+
+
+@pytest.mark.parametrize('seed', range(300))
+def test_compute_contiguous_groups_matches_reference(seed):
+    rng = random.Random(seed)  # noqa: S311
+    size = rng.choice([10, 50, 300])
+    lines = range(1, size)
+    values = sorted(rng.sample(lines, rng.randint(0, size // 2)))
+    separators = set(rng.sample(lines, rng.randint(0, size // 2)))
+    joiners = set(rng.sample(lines, rng.randint(0, size // 2)))
+    if rng.random() < 0.5:
+        # Like diff_grouper does, keep joiners and separators disjoint
+        joiners -= separators
+    max_gap = rng.randint(0, 5)
+
+    result = groups.compute_contiguous_groups(values=values, separators=separators, joiners=joiners, max_gap=max_gap)
+
+    assert result == reference_compute_contiguous_groups(
+        values=values, separators=separators, joiners=joiners, max_gap=max_gap
+    )
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+
+import io
+import pathlib
+
+import pytest
+
+from codecov import lcov
+
+LCOV_REPORT = """\
+TN:
+SF:/project/src/index.js
+FN:1,main
+FNDA:1,main
+DA:1,1
+DA:2,3
+DA:4,0
+BRDA:2,0,0,3
+BRDA:2,0,1,-
+BRF:2
+BRH:1
+LF:3
+LH:2
+end_of_record
+SF:/project/src/index.js
+DA:4,1
+BRDA:2,0,1,0
+end_of_record
+SF:/elsewhere/lib.js
+DA:1,0
+end_of_record
+"""
+
+
+def test_read_lcov():
+    files, has_branches = lcov.read_lcov(lcov_data=io.StringIO(LCOV_REPORT), root=pathlib.Path('/project'))
+
+    assert has_branches is True
+    assert list(files) == [pathlib.Path('src/index.js'), pathlib.Path('/elsewhere/lib.js')]
+    # The records of the same file are merged
+    index = files[pathlib.Path('src/index.js')]
+    assert index.executed_lines == [1, 2, 4]
+    assert index.missing_lines == []
+    assert index.executed_branches == [[2, 2]]
+    assert index.missing_branches == [[2, 2]]
+    assert index.info.num_branches == 2
+    assert index.info.num_partial_branches == 1
+    assert index.info.percent_covered_display == '80'
+    assert files[pathlib.Path('/elsewhere/lib.js')].missing_lines == [1]
+
+
+def test_read_lcov_without_branches():
+    files, has_branches = lcov.read_lcov(lcov_data=io.StringIO('SF:a.js\nDA:1,1\nend_of_record\n'), root=pathlib.Path())
+
+    assert has_branches is False
+    assert files[pathlib.Path('a.js')].executed_branches is None
+    assert files[pathlib.Path('a.js')].info.num_branches is None
+
+
+@pytest.mark.parametrize('report', ['DA:1,1\n', 'SF:a.js\nDA:one,1\n'])
+def test_read_lcov_invalid(report):
+    with pytest.raises(lcov.InvalidLcovReport):
+        lcov.read_lcov(lcov_data=io.StringIO(report), root=pathlib.Path())
+
+
+def test_get_coverage_info(tmp_path):
+    path = tmp_path / 'lcov.info'
+    path.write_text(LCOV_REPORT.replace('/project', str(tmp_path)))
+
+    result = lcov.get_coverage_info(coverage_path=path, root=tmp_path)
+
+    assert result.meta.branch_coverage is True
+    assert result.info.num_statements == 4
+    assert result.info.missing_lines == 1
+    assert result.info.covered_branches == 1
@@ -1,12 +1,27 @@
 # -*- coding: utf-8 -*-
+import asyncio
+import base64
+import dataclasses
+import decimal
 import json
 import pathlib
 import tempfile
 from unittest import mock
 
+import httpx
 import pytest
 
-from codecov import diff_grouper, github, main
+from codecov import (
+    coverage as coverage_module,
+    coverage_database,
+    diff_grouper,
+    github,
+    github_client,
+    main,
+    settings,
+    template,
+    timing,
+)
 
 
 @mock.patch('pathlib.Path.open')
@@ -272,6 +287,10 @@ def test_process_pr_with_annotations_to_branch(
     session.register('GET', f'/repos/{config.GITHUB_REPOSITORY}/pulls/{config.GITHUB_PR_NUMBER}')(text=diff_data)
     session.register('GET', '/user')(json={'login': 'foo', 'id': 123, 'name': 'bar', 'email': 'baz'})
 
+    session.register(
+        'GET', f'/repos/{config.GITHUB_REPOSITORY}/contents/{config.GITHUB_PR_NUMBER}-sub_project-comment.json'
+    )(status_code=404)
+
     result = main.process_pr(config, gh, config.GITHUB_PR_NUMBER)
 
     assert result == 0
@@ -296,6 +315,48 @@ def test_process_pr_generate_annotations(mock_open: mock.Mock, gh, base_config,
     assert result == 1
 
 
+@mock.patch('pathlib.Path.open')
+@mock.patch('codecov.main.report_pr')
+def test_process_pr_async(mock_report_pr: mock.Mock, mock_open: mock.Mock, base_config, gh, coverage_json):
+    config = base_config()
+    mock_open.return_value.__enter__.return_value.read.return_value = json.dumps(coverage_json)
+    mock_report_pr.return_value = 0
+    diff_data = 'diff --git a/codebase/code.py b/codebase/code.py\nindex 1234567..abcdefg 100644\n--- a/codebase/code.py\n+++ b/codebase/code.py\n@@ -1,2 +1,2 @@\n-foo\n+bar\n-baz\n+qux\n'
+
+    def handler(request):
+        if request.url.path == '/user':
+            return httpx.Response(403)
+        assert request.url.path == f'/repos/{config.GITHUB_REPOSITORY}/pulls/{config.GITHUB_PR_NUMBER}'
+        assert request.headers['Accept'] == 'application/vnd.github.v3.diff'
+        return httpx.Response(200, text=diff_data)
+
+    def create_async_session(**kwargs):
+        return httpx.AsyncClient(base_url=github_client.BASE_URL, transport=httpx.MockTransport(handler))
+
+    with mock.patch('codecov.main.github_client.create_async_session', create_async_session):
+        result = asyncio.run(main.process_pr_async(config=config, gh=gh, pr_number=config.GITHUB_PR_NUMBER))
+
+    assert result == 0
+    kwargs = mock_report_pr.call_args.kwargs
+    assert kwargs['user'].login == github.GITHUB_CODECOV_LOGIN
+    assert kwargs['coverage'].files.keys() == {pathlib.Path('codebase/code.py')}
+    assert kwargs['diff_coverage'].files[pathlib.Path('codebase/code.py')].added_lines == [1, 2]
+
+
+@mock.patch('codecov.main.process_pr_async')
+def test_action_async_pipeline(mock_process_pr_async: mock.AsyncMock, session, base_config):
+    config = base_config(ASYNC_PIPELINE=True)
+    mock_process_pr_async.return_value = 0
+    session.register('GET', f'/repos/{config.GITHUB_REPOSITORY}/pulls/{config.GITHUB_PR_NUMBER}')(
+        json={'number': config.GITHUB_PR_NUMBER, 'state': 'open'}
+    )
+
+    result = main.action(config=config, github_session=session)
+
+    assert result == 0
+    mock_process_pr_async.assert_awaited_once()
+
+
 @mock.patch('codecov.main.settings.Config.from_environ')
 @mock.patch('codecov.main.log.setup')
 @mock.patch('codecov.main.sys.exit')
@@ -337,6 +398,34 @@ def test_main_exception(mock_action, mock_httpx_client, mock_sys_exit, mock_conf
     mock_sys_exit.assert_called_once_with(1)
 
 
+@mock.patch('codecov.main.settings.Config.from_environ')
+@mock.patch('codecov.main.sys.exit')
+@mock.patch('codecov.main.httpx.Client')
+@mock.patch('codecov.main.action')
+def test_main_rate_limited(mock_action, mock_httpx_client, mock_sys_exit, mock_config_from_environ, caplog):
+    mock_action.side_effect = github_client.RateLimited()
+
+    main.main()
+
+    mock_sys_exit.assert_called_once_with(1)
+    assert 'rate limit' in caplog.records[-1].message
+
+
+def test_write_timing_reports(base_config, tmp_path):
+    config = base_config(
+        TIMING_REPORT_PATH=tmp_path / 'timings.json',
+        TIMING_STEP_SUMMARY=True,
+        GITHUB_STEP_SUMMARY=tmp_path / 'summary.md',
+    )
+    with timing.phase('render'):
+        pass
+
+    main.write_timing_reports(config=config)
+
+    assert 'render' in json.loads((tmp_path / 'timings.json').read_text())['phases']
+    assert '| render |' in (tmp_path / 'summary.md').read_text()
+
+
 def test_action_pull_request_success(session, base_config):
     config = base_config()
     main.process_pr = mock.Mock(return_value=0)
@@ -357,3 +446,222 @@ def test_action_pull_request_failed(session, base_config):
     session.register('GET', f'/repos/{config.GITHUB_REPOSITORY}/pulls/{config.GITHUB_PR_NUMBER}')(status_code=404)
     result = main.action(config=config, github_session=session)
     assert result == 1
+
+
+@mock.patch('codecov.readers.coverage_database.get_coverage_info')
+def test_load_coverage_database(mock_get_coverage_info: mock.Mock, base_config, coverage_obj, tmp_path):
+    path = tmp_path / '.coverage'
+    path.write_bytes(coverage_database.SQLITE_HEADER)
+    mock_get_coverage_info.return_value = coverage_obj
+
+    assert main.load_coverage(config=base_config(COVERAGE_PATH=path)) is coverage_obj
+    mock_get_coverage_info.assert_called_once_with(coverage_path=path, paths=None)
+
+
+@mock.patch('codecov.readers.coverage_database.get_coverage_info')
+def test_load_coverage_database_paths(mock_get_coverage_info: mock.Mock, base_config, coverage_obj, tmp_path):
+    path = tmp_path / '.coverage'
+    path.write_bytes(coverage_database.SQLITE_HEADER)
+    mock_get_coverage_info.return_value = coverage_obj
+    paths = {pathlib.Path('codebase/code.py')}
+
+    assert main.load_coverage(config=base_config(COVERAGE_PATH=path), paths=paths) is coverage_obj
+    mock_get_coverage_info.assert_called_once_with(coverage_path=path, paths=paths)
+
+
+@pytest.mark.parametrize('complete_project_report, expected', [(False, {pathlib.Path('a.py')}), (True, None)])
+def test_get_coverage_paths(base_config, complete_project_report, expected):
+    config = base_config(COMPLETE_PROJECT_REPORT=complete_project_report)
+
+    assert main.get_coverage_paths(config=config, added_lines={pathlib.Path('a.py'): [1]}) == expected
+
+
+@pytest.mark.parametrize('name, expected', [('coverage.json', None), ('.coverage', {pathlib.Path('a.py')})])
+@mock.patch('codecov.main.load_coverage')
+def test_load_coverage_async(mock_load_coverage: mock.Mock, base_config, coverage_obj, tmp_path, name, expected):
+    path = tmp_path / name
+    path.write_bytes(coverage_database.SQLITE_HEADER if name == '.coverage' else b'{}')
+    config = base_config(COVERAGE_PATH=path)
+    mock_load_coverage.return_value = coverage_obj
+
+    async def load():
+        added_lines: asyncio.Future = asyncio.Future()
+        added_lines.set_result({pathlib.Path('a.py'): [1]})
+        return await main.load_coverage_async(config=config, added_lines=added_lines)
+
+    assert asyncio.run(load()) is coverage_obj
+    mock_load_coverage.assert_called_once_with(config=config, paths=expected)
+
+
+@mock.patch('codecov.main.merge.get_merged_coverage_info')
+def test_load_coverage_merges_reports(mock_get_merged_coverage_info: mock.Mock, base_config, coverage_obj):
+    config = base_config(COVERAGE_PATHS=[pathlib.Path('coverage-2.json')], COVERAGE_MERGE_WORKERS=4)
+    mock_get_merged_coverage_info.return_value = coverage_obj
+
+    assert main.load_coverage(config=config) is coverage_obj
+    mock_get_merged_coverage_info.assert_called_once_with(
+        coverage_paths=[pathlib.Path('coverage.json'), pathlib.Path('coverage-2.json')],
+        loader='json',
+        max_workers=4,
+        cache=None,
+        paths=None,
+    )
+
+
+def test_load_coverage_cache(base_config, coverage_json, tmp_path):
+    path = tmp_path / 'coverage.json'
+    path.write_text(json.dumps(coverage_json))
+    config = base_config(COVERAGE_PATH=path, COVERAGE_CACHE_DIR=tmp_path / 'cache')
+
+    first = main.load_coverage(config=config)
+    with mock.patch('codecov.readers.coverage_module.get_coverage_info') as mock_get_coverage_info:
+        second = main.load_coverage(config=config)
+
+    mock_get_coverage_info.assert_not_called()
+    assert isinstance(second.files, coverage_module.LazyFiles)
+    assert dict(second.files) == dict(first.files)
+    assert second.info == first.info
+
+
+def test_get_template_cache_dir(base_config, tmp_path):
+    assert main.get_template_cache_dir(config=base_config()) is None
+    assert main.get_template_cache_dir(config=base_config(COVERAGE_CACHE_DIR=tmp_path)) == tmp_path / 'templates'
+
+
+@pytest.fixture
+def subprojects_config(base_config, coverage_json, tmp_path):
+    subprojects = []
+    for subproject_id in ('api', 'web'):
+        path = tmp_path / f'{subproject_id}.json'
+        path.write_text(json.dumps(coverage_json))
+        subprojects.append(settings.Subproject(id=subproject_id, coverage_path=path))
+    subprojects[0].minimum_green = decimal.Decimal('50')
+    return base_config(SUBPROJECTS=subprojects, SUBPROJECT_WORKERS=1)
+
+
+SUBPROJECTS_DIFF = (
+    'diff --git a/codebase/code.py b/codebase/code.py\n'
+    'index 1234567..abcdefg 100644\n'
+    '--- a/codebase/code.py\n'
+    '+++ b/codebase/code.py\n'
+    '@@ -5,1 +5,4 @@\n'
+    ' foo\n'
+    '+bar\n'
+    '+baz\n'
+    '+qux\n'
+)
+
+
+def test_process_subprojects(subprojects_config, gh, session):
+    config = subprojects_config
+    repository = config.GITHUB_REPOSITORY
+    session.register('GET', f'/repos/{repository}/pulls/{config.GITHUB_PR_NUMBER}')(text=SUBPROJECTS_DIFF)
+    session.register('GET', '/user')(json={'login': 'foo', 'id': 123, 'name': 'bar', 'email': 'baz'})
+    # The comments are listed once for both subprojects
+    session.register('GET', f'/repos/{repository}/issues/123/comments')(
+        json=[{'user': {'login': 'foo'}, 'body': template.get_marker(marker_id='api'), 'id': 456}]
+    )
+    session.register(
+        'PATCH', f'/repos/{repository}/issues/comments/456', json=lambda body: '(id: api)' in body['body']
+    )()
+    session.register('POST', f'/repos/{repository}/issues/123/comments', json=lambda body: '(id: web)' in body['body'])(
+        json={'id': 789}
+    )
+
+    result = main.process_subprojects(config=config, gh=gh, pr_number=123)
+
+    assert result == 0
+    assert not session.responses
+
+
+def test_process_subprojects_annotations(subprojects_config, gh, session, tmp_path):
+    config = dataclasses.replace(
+        subprojects_config,
+        ANNOTATE_MISSING_LINES=True,
+        ANNOTATIONS_OUTPUT_PATH=tmp_path / 'annotations.json',
+        SKIP_COVERAGE=True,
+    )
+    session.register('GET', f'/repos/{config.GITHUB_REPOSITORY}/pulls/123')(text=SUBPROJECTS_DIFF)
+    session.register('GET', '/user')(json={'login': 'foo', 'id': 123, 'name': 'bar', 'email': 'baz'})
+    annotation = github.Annotation(
+        file=pathlib.Path('codebase/code.py'), line_start=6, line_end=8, title='', message_type='warning', message=''
+    )
+
+    with mock.patch('codecov.main.github.create_missing_coverage_annotations', return_value=[annotation]):
+        result = main.process_subprojects(config=config, gh=gh, pr_number=123)
+
+    assert result == 0
+    # The annotations of both subprojects are written at once
+    assert len(json.loads(config.ANNOTATIONS_OUTPUT_PATH.read_text())) == 2
+
+
+def test_get_subproject_reports(subprojects_config):
+    configs = subprojects_config.get_subproject_configs()
+    added_lines = coverage_module.parse_diff_output(SUBPROJECTS_DIFF)
+
+    sequential = main.get_subproject_reports(configs=configs, pr_number=123, added_lines=added_lines, max_workers=1)
+    parallel = main.get_subproject_reports(configs=configs, pr_number=123, added_lines=added_lines, max_workers=2)
+
+    assert parallel == sequential
+    assert [report.config.SUBPROJECT_ID for report in parallel] == ['api', 'web']
+    assert all(report.comment and f'(id: {report.config.SUBPROJECT_ID})' in report.comment for report in parallel)
+
+
+def test_post_subproject_comments_cached_comment_id(subprojects_config, gh, session):
+    config = dataclasses.replace(subprojects_config, ANNOTATIONS_DATA_BRANCH='data')
+    repository = config.GITHUB_REPOSITORY
+    reports = [
+        main.SubprojectReport(config=subproject_config, annotations=[], comment=f'{subproject_config.SUBPROJECT_ID}')
+        for subproject_config in config.get_subproject_configs()
+    ]
+    session.register('GET', f'/repos/{repository}/contents/123-api-comment.json', params={'ref': 'data'})(
+        json={'content': base64.b64encode(b'{"comment_id": 456}').decode()}
+    )
+    session.register('GET', f'/repos/{repository}/contents/123-web-comment.json', params={'ref': 'data'})(
+        status_code=404
+    )
+    # Only the comment of web is looked up
+    session.register('GET', f'/repos/{repository}/issues/123/comments')(json=[])
+    session.register('PATCH', f'/repos/{repository}/issues/comments/456', json={'body': 'api'})()
+    session.register('POST', f'/repos/{repository}/issues/123/comments', json={'body': 'web'})(json={'id': 789})
+    # Known to be missing, the file is created without being looked up again
+    session.register(
+        'PUT', f'/repos/{repository}/contents/123-web-comment.json', json=lambda body: body['sha'] is None
+    )()
+    user = github.User(name='bar', email='baz', login='foo')
+
+    result = main.post_subproject_comments(config=config, gh=gh, user=user, pr_number=123, reports=reports)
+
+    assert result == 0
+    assert not session.responses
+
+
+def test_post_subproject_comments_render_error(subprojects_config, gh, session):
+    api_config, web_config = subprojects_config.get_subproject_configs()
+    reports = [
+        main.SubprojectReport(config=api_config, annotations=[], comment=None),
+        main.SubprojectReport(config=web_config, annotations=[], comment='web'),
+    ]
+    repository = subprojects_config.GITHUB_REPOSITORY
+    session.register('GET', f'/repos/{repository}/issues/123/comments')(json=[])
+    session.register('POST', f'/repos/{repository}/issues/123/comments', json={'body': 'web'})(json={'id': 789})
+    user = github.User(name='bar', email='baz', login='foo')
+
+    result = main.post_subproject_comments(config=subprojects_config, gh=gh, user=user, pr_number=123, reports=reports)
+
+    # The other comments are posted all the same
+    assert result == 1
+    assert not session.responses
+
+
+@mock.patch('codecov.main.process_subprojects')
+def test_action_subprojects(mock_process_subprojects: mock.Mock, session, subprojects_config):
+    mock_process_subprojects.return_value = 0
+    session.register('GET', f'/repos/{subprojects_config.GITHUB_REPOSITORY}/pulls/123')(
+        json={'number': 123, 'state': 'open'}
+    )
+
+    result = main.action(config=subprojects_config, github_session=session)
+
+    assert result == 0
+    mock_process_subprojects.assert_called_once()
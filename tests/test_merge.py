@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+
+import concurrent.futures
+import copy
+import datetime
+import json
+import pathlib
+
+from codecov import coverage as coverage_module, merge
+
+
+def make_file(executed, missing, executed_branches=None, missing_branches=None) -> coverage_module.FileCoverage:
+    return coverage_module.FileCoverage(
+        path=pathlib.Path('codebase/code.py'),
+        executed_lines=executed,
+        missing_lines=missing,
+        excluded_lines=[20],
+        executed_branches=executed_branches,
+        missing_branches=missing_branches,
+        info=coverage_module.get_summary(
+            num_statements=len(executed) + len(missing), num_missing=len(missing), num_excluded=1, branches=None
+        ),
+    )
+
+
+def test_merge_files():
+    result = merge.merge_files(
+        [
+            make_file([1, 2, 3], [5, 6], executed_branches=[[2, 3]], missing_branches=[[2, 5], [5, 6]]),
+            make_file([1, 5], [2, 3, 6], executed_branches=[[2, 5]], missing_branches=[[2, 3], [5, 6]]),
+        ]
+    )
+
+    assert result.executed_lines == [1, 2, 3, 5]
+    assert result.missing_lines == [6]
+    assert result.excluded_lines == [20]
+    assert result.executed_branches == [[2, 3], [2, 5]]
+    assert result.missing_branches == [[5, 6]]
+    assert result.info == coverage_module.get_summary(
+        num_statements=5, num_missing=1, num_excluded=1, branches=(3, 0, 1)
+    )
+
+
+def test_merge_files_partial_branches():
+    result = merge.merge_files(
+        [
+            make_file([1, 2], [], executed_branches=[[2, 3]], missing_branches=[[2, 5]]),
+            make_file([1, 2], [], executed_branches=[], missing_branches=[[2, 3], [2, 5]]),
+        ]
+    )
+
+    assert result.info.num_partial_branches == 1
+    assert result.info.covered_branches == 1
+
+
+def test_merge_coverages(coverage_json):
+    other_json = copy.deepcopy(coverage_json)
+    other_json['meta']['timestamp'] = '2000-01-02T00:00:00'
+    other_json['files']['codebase/code.py']['executed_lines'] = [6, 8]
+    other_json['files']['codebase/code.py']['missing_lines'] = [1, 2, 3, 5, 10, 11, 13, 14]
+    other_json['files']['codebase/other.py'] = copy.deepcopy(coverage_json['files']['codebase/code.py'])
+
+    result = merge.merge_coverages(
+        [coverage_module.extract_info(coverage_json), coverage_module.extract_info(other_json)]
+    )
+
+    assert result.meta.timestamp == datetime.datetime(2000, 1, 2)
+    assert list(result.files) == [pathlib.Path('codebase/code.py'), pathlib.Path('codebase/other.py')]
+    assert result.files[pathlib.Path('codebase/code.py')].executed_lines == [1, 2, 3, 5, 6, 8, 13, 14]
+    assert result.files[pathlib.Path('codebase/code.py')].missing_lines == [10, 11]
+    assert result.info.num_statements == 20
+    assert result.info.missing_lines == 6
+
+
+def test_merge_coverages_executor(coverage_json):
+    other_json = copy.deepcopy(coverage_json)
+    other_json['files']['codebase/code.py']['executed_lines'] = [6, 8]
+    other_json['files']['codebase/other.py'] = copy.deepcopy(coverage_json['files']['codebase/code.py'])
+    coverages = [coverage_module.extract_info(other_json), coverage_module.extract_info(coverage_json)]
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+        result = merge.merge_coverages(coverages, executor=executor, max_workers=2)
+
+    assert result == merge.merge_coverages(coverages)
+    assert list(result.files) == [pathlib.Path('codebase/code.py'), pathlib.Path('codebase/other.py')]
+
+
+def test_get_merged_coverage_info(coverage_json, tmp_path):
+    paths = []
+    for index in range(4):
+        shard_json = copy.deepcopy(coverage_json)
+        shard_json['files']['codebase/code.py']['executed_lines'] = [[1, 2], [3, 5], [6, 8], [13, 14]][index]
+        shard_json['files']['codebase/code.py']['missing_lines'] = [1, 2, 3, 5, 6, 8, 10, 11, 13, 14]
+        paths.append(tmp_path / f'coverage-{index}.json')
+        paths[-1].write_text(json.dumps(shard_json))
+
+    sequential = merge.get_merged_coverage_info(coverage_paths=paths + paths[:1], max_workers=1)
+    parallel = merge.get_merged_coverage_info(coverage_paths=paths, max_workers=2)
+
+    assert parallel == sequential
+    assert parallel.files[pathlib.Path('codebase/code.py')].executed_lines == [1, 2, 3, 5, 6, 8, 13, 14]
+    assert parallel.files[pathlib.Path('codebase/code.py')].missing_lines == [10, 11]
+    # 8 statements and 6 branches covered out of 10 and 10
+    assert parallel.info.percent_covered_display == '70'
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+
+import json
+import pathlib
+import sqlite3
+
+import pytest
+
+from codecov import coverage as coverage_module, coverage_cache, readers
+
+
+@pytest.mark.parametrize(
+    'name, content, expected',
+    [
+        ('coverage.json', '{}', 'coverage.py-json'),
+        ('coverage.txt', '  {"meta": {}}', 'coverage.py-json'),
+        ('lcov.info', '', 'lcov'),
+        ('report.LCOV', '', 'lcov'),
+        ('lcov.txt', 'TN:\nSF:a.js\n', 'lcov'),
+        ('coverage.xml', '', 'cobertura'),
+        ('cobertura.txt', '<?xml version="1.0" ?>\n<coverage version="1">', 'cobertura'),
+    ],
+)
+def test_get_reader(tmp_path, name, content, expected):
+    path = tmp_path / name
+    path.write_text(content)
+
+    assert readers.get_reader(path).name == expected
+
+
+def test_get_reader_coverage_database(tmp_path):
+    path = tmp_path / '.coverage'
+    sqlite3.connect(path).execute('CREATE TABLE meta (key text, value text)').connection.close()
+
+    assert readers.get_reader(path).name == 'coverage.py-sqlite'
+
+
+def test_get_reader_unknown(tmp_path):
+    path = tmp_path / 'report.txt'
+    path.write_text('Name    Stmts   Miss  Cover\n')
+
+    with pytest.raises(readers.UnknownReportFormat):
+        readers.get_reader(path)
+
+
+def test_read_report(tmp_path, coverage_json):
+    path = tmp_path / 'coverage.json'
+    path.write_text(json.dumps(coverage_json))
+
+    result = readers.read_report(coverage_path=path, loader='stream')
+
+    assert list(result.files) == [pathlib.Path('codebase/code.py')]
+
+
+def test_register_reader(tmp_path, monkeypatch):
+    monkeypatch.setattr(readers, 'READERS', dict(readers.READERS))
+    path = tmp_path / 'report.custom'
+    path.write_text('')
+    reader = readers.Reader(
+        name='custom', read=lambda path, loader, paths: None, sniff=lambda head: False, extensions=('.custom',)
+    )
+
+    readers.register_reader(reader)
+
+    assert readers.get_reader(path) is reader
+
+
+def test_read_report_cache(tmp_path, coverage_json):
+    path = tmp_path / 'coverage.json'
+    path.write_text(json.dumps(coverage_json))
+    cache = coverage_cache.CoverageCache(path=tmp_path / 'cache')
+
+    first = readers.read_report(coverage_path=path, cache=cache)
+    second = readers.read_report(coverage_path=path, cache=cache)
+
+    assert isinstance(second.files, coverage_module.LazyFiles)
+    assert second.files.decode is not first.files.decode
+    assert dict(second.files) == dict(first.files)
+    assert len(list((tmp_path / 'cache').iterdir())) == 1
+
+
+def test_read_report_cache_not_cacheable(tmp_path, monkeypatch, coverage_obj):
+    monkeypatch.setattr(readers, 'READERS', {})
+    path = tmp_path / 'report.custom'
+    path.write_text('')
+    readers.register_reader(
+        readers.Reader(
+            name='custom',
+            read=lambda path, loader, paths: coverage_obj,
+            sniff=bool,
+            extensions=('.custom',),
+            cacheable=False,
+        )
+    )
+    cache = coverage_cache.CoverageCache(path=tmp_path / 'cache')
+
+    assert readers.read_report(coverage_path=path, cache=cache) is coverage_obj
+    assert not list((tmp_path / 'cache').iterdir())
@@ -3,6 +3,7 @@ from __future__ import annotations
 
 import decimal
 import pathlib
+import sqlite3
 import tempfile
 
 import pytest
@@ -163,6 +164,28 @@ def test_config_clean_annotation_type_invalid():
         settings.Config.clean_annotation_type('foo')
 
 
+@pytest.mark.parametrize('loader', ['json', 'stream', 'mmap'])
+def test_config_clean_coverage_loader(loader):
+    value = settings.Config.clean_coverage_loader(loader)
+    assert value == loader
+
+
+def test_config_clean_coverage_loader_invalid():
+    with pytest.raises(settings.InvalidCoverageLoader):
+        settings.Config.clean_coverage_loader('foo')
+
+
+def test_config_clean_http_settings(tmp_path):
+    assert settings.Config.clean_http_max_connections('4') == 4
+    assert settings.Config.clean_http_keepalive_expiry('2.5') == 2.5
+    assert settings.Config.clean_http_connect_timeout('5') == 5.0
+    assert settings.Config.clean_http_read_timeout('30') == 30.0
+    assert settings.Config.clean_http2('true') is True
+    assert settings.Config.clean_http_compression('false') is False
+    assert settings.Config.clean_http_cache_dir(str(tmp_path / 'cache')) == tmp_path / 'cache'
+    assert settings.Config.clean_http_cache_max_size_mb('10') == 10
+
+
 def test_config_clean_github_pr_number():
     value = settings.Config.clean_github_pr_number('123')
     assert value == 123
@@ -194,3 +217,107 @@ def test_config_required_clean_env_var_error():
                     'GITHUB_PR_NUMBER': 'invalid',
                 }
             )
+
+
+def test_path_below_coverage_database(tmp_path):
+    path = tmp_path / '.coverage'
+    sqlite3.connect(path).execute('CREATE TABLE meta (key text, value text)').connection.close()
+    assert settings.path_below(path) == path.resolve()
+
+
+def test_config_clean_coverage_paths(tmp_path):
+    for name in ('coverage-1.json', 'coverage-2.json', 'other.json'):
+        (tmp_path / name).write_text('{}')
+
+    value = settings.Config.clean_coverage_paths(f'{tmp_path}/coverage-*.json,\n{tmp_path}/other.json\n')
+
+    assert value == [tmp_path / 'coverage-1.json', tmp_path / 'coverage-2.json', tmp_path / 'other.json']
+
+
+def test_config_clean_coverage_paths_no_match(tmp_path):
+    with pytest.raises(ValueError):
+        settings.Config.clean_coverage_paths(f'{tmp_path}/coverage-*.json')
+
+
+@pytest.mark.parametrize('name, content', [('lcov.info', 'SF:a.js\n'), ('coverage.xml', '<coverage/>')])
+def test_path_below_other_formats(tmp_path, name, content):
+    path = tmp_path / name
+    path.write_text(content)
+    assert settings.path_below(path) == path.resolve()
+
+
+def test_config_coverage_cache(tmp_path):
+    (tmp_path / 'coverage.json').write_text('{}')
+    config = settings.Config.from_environ(
+        {
+            'GITHUB_REPOSITORY': 'your_repository',
+            'GITHUB_TOKEN': 'your_token',
+            'COVERAGE_PATH': str(tmp_path / 'coverage.json'),
+            'GITHUB_PR_NUMBER': '123',
+            'COVERAGE_CACHE_DIR': str(tmp_path / 'cache'),
+            'COVERAGE_CACHE_MAX_SIZE_MB': '20',
+        }
+    )
+    assert config.COVERAGE_CACHE_DIR == tmp_path / 'cache'
+    assert config.COVERAGE_CACHE_MAX_SIZE_MB == 20
+
+
+def test_parse_subprojects(tmp_path):
+    (tmp_path / 'api.json').write_text('{}')
+    (tmp_path / 'web.json').write_text('{}')
+
+    subprojects = settings.parse_subprojects(
+        f'[{{"id": "api", "coverage_path": "{tmp_path}/api.json", "minimum_green": 90, "minimum_orange": 60.5}},'
+        f' {{"id": "web", "coverage_path": "{tmp_path}/web.json"}}]'
+    )
+
+    assert subprojects == [
+        settings.Subproject(
+            id='api',
+            coverage_path=tmp_path / 'api.json',
+            minimum_green=decimal.Decimal('90'),
+            minimum_orange=decimal.Decimal('60.5'),
+        ),
+        settings.Subproject(id='web', coverage_path=tmp_path / 'web.json'),
+    ]
+
+
+@pytest.mark.parametrize(
+    'value',
+    [
+        'not json',
+        '{"id": "api"}',
+        '[{"id": "api"}]',
+        '[{"id": "api", "coverage_path": "{path}", "minimum_green": "high"}]',
+        '[{"id": "api", "coverage_path": "{path}"}, {"id": "api", "coverage_path": "{path}"}]',
+    ],
+)
+def test_parse_subprojects_invalid(tmp_path, value):
+    (tmp_path / 'coverage.json').write_text('{}')
+    with pytest.raises(ValueError):
+        settings.parse_subprojects(value.replace('{path}', str(tmp_path / 'coverage.json')))
+
+
+def test_config_subprojects(tmp_path):
+    (tmp_path / 'api.json').write_text('{}')
+    (tmp_path / 'web.json').write_text('{}')
+    config = settings.Config.from_environ(
+        {
+            'GITHUB_REPOSITORY': 'your_repository',
+            'GITHUB_TOKEN': 'your_token',
+            'GITHUB_PR_NUMBER': '123',
+            'MINIMUM_GREEN': '80',
+            'SUBPROJECTS': (
+                f'[{{"id": "api", "coverage_path": "{tmp_path}/api.json", "minimum_green": 90}},'
+                f' {{"id": "web", "coverage_path": "{tmp_path}/web.json"}}]'
+            ),
+            'SUBPROJECT_WORKERS': '2',
+        }
+    )
+
+    assert config.COVERAGE_PATH == tmp_path / 'api.json'
+    assert config.SUBPROJECT_WORKERS == 2
+    api, web = config.get_subproject_configs()
+    assert (api.SUBPROJECT_ID, api.COVERAGE_PATH, api.MINIMUM_GREEN) == ('api', tmp_path / 'api.json', 90)
+    assert (web.SUBPROJECT_ID, web.COVERAGE_PATH, web.MINIMUM_GREEN) == ('web', tmp_path / 'web.json', 80)
+    assert api.SUBPROJECTS == web.SUBPROJECTS == []
@@ -2,6 +2,7 @@
 import decimal
 import hashlib
 import pathlib
+from unittest import mock
 
 import pytest
 
@@ -68,6 +69,137 @@ def test_get_marker(marker_id, result):
     assert template.get_marker(marker_id=marker_id) == result
 
 
+def test_get_environment_is_reused():
+    params = {
+        'repo_name': 'org/repo',
+        'pr_number': 1,
+        'base_ref': 'main',
+        'minimum_green': decimal.Decimal('100'),
+        'minimum_orange': decimal.Decimal('70'),
+    }
+
+    assert template.get_environment(**params) is template.get_environment(**params)
+    assert template.get_environment(**params) is not template.get_environment(**(params | {'pr_number': 2}))
+
+
+def test_get_string_template_skips_compilation_on_repeat():
+    env = template.get_environment(
+        repo_name='org/repo',
+        pr_number=1,
+        base_ref='main',
+        minimum_green=decimal.Decimal('100'),
+        minimum_orange=decimal.Decimal('70'),
+    )
+    source = '{{ 1 + 1 }} repeated'
+    first = template.get_string_template(env=env, source=source)
+
+    with mock.patch.object(env, 'compile', wraps=env.compile) as compile_mock:
+        second = template.get_string_template(env=env, source=source)
+
+    assert first is second
+    assert second.render() == '2 repeated'
+    compile_mock.assert_not_called()
+
+
+def test_get_string_template_uses_bytecode_cache(tmp_path):
+    params = {
+        'repo_name': 'org/repo',
+        'pr_number': 1,
+        'base_ref': 'main',
+        'minimum_green': decimal.Decimal('100'),
+        'minimum_orange': decimal.Decimal('70'),
+        'bytecode_cache_dir': tmp_path / 'templates',
+    }
+    env = template.get_environment(**params)
+    other_env = template.get_environment(**(params | {'pr_number': 2}))
+    source = '{{ 2 * 3 }} from bytecode'
+    template.get_string_template(env=env, source=source)
+
+    with mock.patch.object(other_env, 'compile', wraps=other_env.compile) as compile_mock:
+        result = template.get_string_template(env=other_env, source=source)
+
+    assert result.render() == '6 from bytecode'
+    compile_mock.assert_not_called()
+    assert list((tmp_path / 'templates').iterdir())
+
+
+def test_get_environment_without_bytecode_cache():
+    env = template.get_environment(
+        repo_name='org/repo',
+        pr_number=1,
+        base_ref='main',
+        minimum_green=decimal.Decimal('100'),
+        minimum_orange=decimal.Decimal('70'),
+    )
+
+    assert env.bytecode_cache is None
+
+
+def test_get_string_template_uses_packaged_template():
+    env = template.get_environment(
+        repo_name='org/repo',
+        pr_number=1,
+        base_ref='main',
+        minimum_green=decimal.Decimal('100'),
+        minimum_orange=decimal.Decimal('70'),
+    )
+
+    result = template.get_string_template(env=env, source=template.read_template_file('comment.md.j2'))
+
+    assert result.name == 'comment.md.j2'
+
+
+def test_compile_templates(tmp_path, coverage_obj, diff_coverage_obj):
+    template.compile_templates(target=tmp_path)
+    loader = template.get_compiled_templates_loader(path=tmp_path)
+    assert loader is not None
+
+    def render():
+        template.get_environment.cache_clear()
+        files, total, _ = template.select_changed_files(
+            coverage=coverage_obj, diff_coverage=diff_coverage_obj, max_files=25
+        )
+        return template.get_comment_markdown(
+            coverage=coverage_obj,
+            diff_coverage=diff_coverage_obj,
+            files=files,
+            count_files=total,
+            coverage_files=[],
+            count_coverage_files=0,
+            max_files=25,
+            minimum_green=decimal.Decimal('100'),
+            minimum_orange=decimal.Decimal('70'),
+            base_ref='main',
+            marker='<!-- foo -->',
+            repo_name='org/repo',
+            pr_number=1,
+            base_template=template.read_template_file('comment.md.j2'),
+            branch_coverage=True,
+        )
+
+    with mock.patch('codecov.template.get_compiled_templates_loader', return_value=None):
+        from_source = render()
+    with mock.patch('codecov.template.get_compiled_templates_loader', return_value=loader), mock.patch.object(
+        template.jinja2.PackageLoader, 'get_source', side_effect=AssertionError('loaded from source')
+    ):
+        from_bundle = render()
+    template.get_environment.cache_clear()
+
+    assert from_bundle == from_source
+
+
+def test_get_compiled_templates_loader_missing(tmp_path):
+    assert template.get_compiled_templates_loader(path=tmp_path) is None
+
+
+def test_get_compiled_templates_loader_outdated(tmp_path):
+    template.compile_templates(target=tmp_path)
+    manifest = tmp_path / template.COMPILED_TEMPLATES_MANIFEST
+    manifest.write_text(manifest.read_text().replace('comment.md.j2', 'old.md.j2'))
+
+    assert template.get_compiled_templates_loader(path=tmp_path) is None
+
+
 def test_template_no_marker(coverage_obj, diff_coverage_obj):
     with pytest.raises(template.MissingMarker):
         marker = '<!-- foobar -->'
@@ -651,3 +783,131 @@ def test_get_file_url_no_lines():
         template.get_file_url(filename, lines, repo_name=repo_name, pr_number=pr_number, base_ref=base_ref)
         == expected_url
     )
+
+
+def render_within_budget(coverage_obj, diff_coverage_obj, max_length, max_files=25):
+    return template.get_comment_markdown_within_budget(
+        coverage=coverage_obj,
+        diff_coverage=diff_coverage_obj,
+        max_files=max_files,
+        max_length=max_length,
+        minimum_green=decimal.Decimal('100'),
+        minimum_orange=decimal.Decimal('70'),
+        base_ref='main',
+        marker='<!-- foo -->',
+        repo_name='org/repo',
+        pr_number=1,
+        base_template=template.read_template_file('comment.md.j2'),
+        complete_project_report=True,
+    )
+
+
+def test_get_comment_markdown_within_budget_only_decodes_changed_files(coverage_json):
+    file_data = coverage_json['files']['codebase/code.py']
+    coverage_json['files'] = {f'codebase/file_{index}.py': dict(file_data) for index in range(30)}
+    coverage_obj = coverage.extract_info(coverage_json)
+    diff_coverage_obj = coverage.get_diff_coverage_info(
+        added_lines={pathlib.Path('codebase/file_7.py'): [5, 6, 7, 8]}, coverage=coverage_obj
+    )
+
+    result = template.get_comment_markdown_within_budget(
+        coverage=coverage_obj,
+        diff_coverage=diff_coverage_obj,
+        max_files=25,
+        max_length=65536,
+        minimum_green=decimal.Decimal('100'),
+        minimum_orange=decimal.Decimal('70'),
+        base_ref='main',
+        marker='<!-- foo -->',
+        repo_name='org/repo',
+        pr_number=1,
+        base_template=template.read_template_file('comment.md.j2'),
+    )
+
+    assert 'codebase/file_7.py' in result
+    assert list(coverage_obj.files.decoded) == [pathlib.Path('codebase/file_7.py')]  # type: ignore[attr-defined]
+
+
+def test_get_comment_markdown_within_budget_fits(coverage_obj, diff_coverage_obj):
+    files, total, changed_files = template.select_changed_files(
+        coverage=coverage_obj, diff_coverage=diff_coverage_obj, max_files=25
+    )
+    coverage_files, count_coverage_files = template.select_files(
+        coverage=coverage_obj, changed_files_info=changed_files, max_files=25 - total
+    )
+    expected = template.get_comment_markdown(
+        coverage=coverage_obj,
+        diff_coverage=diff_coverage_obj,
+        files=files,
+        count_files=total,
+        coverage_files=coverage_files,
+        count_coverage_files=count_coverage_files,
+        max_files=25,
+        minimum_green=decimal.Decimal('100'),
+        minimum_orange=decimal.Decimal('70'),
+        base_ref='main',
+        marker='<!-- foo -->',
+        repo_name='org/repo',
+        pr_number=1,
+        base_template=template.read_template_file('comment.md.j2'),
+        complete_project_report=True,
+    )
+
+    assert render_within_budget(coverage_obj, diff_coverage_obj, max_length=len(expected)) == expected
+
+
+def test_get_comment_markdown_within_budget_drops_rows(coverage_obj, diff_coverage_obj):
+    full = render_within_budget(coverage_obj, diff_coverage_obj, max_length=65536)
+    no_rows = render_within_budget(coverage_obj, diff_coverage_obj, max_length=65536, max_files=0)
+
+    result = render_within_budget(coverage_obj, diff_coverage_obj, max_length=len(full) - 1)
+
+    assert len(no_rows) <= len(result) < len(full)
+    assert 'codebase/code.py' not in result or 'codebase/main.py' not in result
+    assert '<!-- foo -->' in result
+
+
+def test_get_comment_markdown_within_budget_caps_links(coverage_obj, diff_coverage_obj):
+    no_rows = render_within_budget(coverage_obj, diff_coverage_obj, max_length=65536, max_files=0)
+    one_row = render_within_budget(coverage_obj, diff_coverage_obj, max_length=65536, max_files=1)
+
+    result = render_within_budget(coverage_obj, diff_coverage_obj, max_length=len(one_row) - 1)
+
+    assert len(no_rows) < len(result) < len(one_row)
+
+
+def test_get_comment_markdown_within_budget_too_large(coverage_obj, diff_coverage_obj):
+    no_rows = render_within_budget(coverage_obj, diff_coverage_obj, max_length=65536, max_files=0)
+
+    result = render_within_budget(coverage_obj, diff_coverage_obj, max_length=len(no_rows) - 1)
+
+    assert result == template.get_too_large_comment(
+        coverage=coverage_obj, diff_coverage=diff_coverage_obj, marker='<!-- foo -->'
+    )
+    assert 'too large' in result
+    assert result.endswith('<!-- foo -->')
+
+
+def test_get_comment_markdown_max_missing_links(coverage_obj, diff_coverage_obj):
+    files, total, _ = template.select_changed_files(
+        coverage=coverage_obj, diff_coverage=diff_coverage_obj, max_files=25
+    )
+    kwargs = dict(
+        coverage=coverage_obj,
+        diff_coverage=diff_coverage_obj,
+        files=files,
+        count_files=total,
+        coverage_files=[],
+        count_coverage_files=0,
+        max_files=25,
+        minimum_green=decimal.Decimal('100'),
+        minimum_orange=decimal.Decimal('70'),
+        base_ref='main',
+        marker='<!-- foo -->',
+        repo_name='org/repo',
+        pr_number=1,
+        base_template=template.read_template_file('comment.md.j2'),
+    )
+
+    assert 'R6-R8">6-8</a>' in template.get_comment_markdown(**kwargs)
+    assert 'R6-R8">6-8</a>' not in template.get_comment_markdown(max_missing_links=0, **kwargs)
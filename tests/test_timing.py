@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+
+import json
+from unittest import mock
+
+import pytest
+
+from codecov import timing
+
+
+@pytest.fixture
+def clock():
+    with mock.patch('codecov.timing.time.perf_counter') as perf_counter:
+        perf_counter.side_effect = [float(tick) for tick in range(100)]
+        yield perf_counter
+
+
+def test_phase(clock):
+    timer = timing.Timer()
+    with timer.phase('coverage load'):
+        pass
+    with timer.phase('coverage load'):
+        pass
+
+    assert timer.get_phase_totals() == {'coverage load': 2.0}
+
+
+def test_phase_exception(clock):
+    timer = timing.Timer()
+    with pytest.raises(ValueError):
+        with timer.phase('render'):
+            raise ValueError
+
+    assert timer.get_phase_totals() == {'render': 1.0}
+
+
+def test_iterate_excluded_from_phase(clock):
+    timer = timing.Timer()
+    with timer.phase('diff parse', exclude=['diff fetch']):
+        assert list(timer.iterate('diff fetch', ['a', 'b'])) == ['a', 'b']
+
+    # 2 chunks and the end of the iteration took 3 ticks, out of 7 for the phase
+    assert timer.get_phase_totals() == {'diff fetch': 3.0, 'diff parse': 4.0}
+
+
+def test_to_dict():
+    timer = timing.Timer()
+    timer.add('post', 0.5)
+    timer.record_request('get', '/user', status=200, duration=0.25)
+    timer.record_request('patch', '/repos/a/b/issues/comments/1', status=None, duration=0.5)
+
+    assert timer.to_dict() == {
+        'phases': {'post': 0.5},
+        'requests': [
+            {'method': 'GET', 'path': '/user', 'status': 200, 'duration': 0.25},
+            {'method': 'PATCH', 'path': '/repos/a/b/issues/comments/1', 'status': None, 'duration': 0.5},
+        ],
+        'requests_total': 0.75,
+    }
+
+
+def test_to_markdown():
+    timer = timing.Timer()
+    timer.add('render', 1.5)
+    timer.record_request('get', '/user', status=None, duration=0.25)
+
+    assert timer.to_markdown() == (
+        '### Coverage comment timings\n'
+        '\n'
+        '| Phase | Seconds |\n'
+        '| --- | ---: |\n'
+        '| render | 1.500 |\n'
+        '\n'
+        '| Request | Status | Seconds |\n'
+        '| --- | :---: | ---: |\n'
+        '| GET /user | error | 0.250 |\n'
+    )
+
+
+def test_write_reports(tmp_path):
+    timing.record_request('get', '/user', status=200, duration=0.25)
+    with timing.phase('post'):
+        pass
+    summary = tmp_path / 'summary.md'
+    summary.write_text('previous step\n')
+
+    timing.write_report(path=tmp_path / 'timings.json')
+    timing.write_step_summary(path=summary)
+
+    report = json.loads((tmp_path / 'timings.json').read_text())
+    assert list(report['phases']) == ['post']
+    assert report['requests'][0]['path'] == '/user'
+    assert summary.read_text().startswith('previous step\n### Coverage comment timings\n')
+
+
+def test_reset():
+    timing.record_request('get', '/user', status=200, duration=0.25)
+    timing.reset()
+
+    assert timing.timer.requests == []